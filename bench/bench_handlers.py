@@ -0,0 +1,301 @@
+"""
+SixSixBot 离线性能基准
+
+用桩 Context 和伪造的 AstrMessageEvent 直接驱动插件的处理函数，
+在可调规模的合成数据上测量热点路径的吞吐量与延迟：
+
+- passive_catchphrase_handler（普通聊天 / 口号 / 好想宝宝 / 好想XXX 混合流量）
+- cmd_checkin（/qd：新签到、重复签到、少数用户刷屏）
+- cmd_idol_info（/xox）
+- _list_catchphrase_logic（/list catchphrase）
+
+插件源码会被复制到临时目录中按 AstrBot 的目录结构加载，不会改动真实的 data/ 目录。
+未安装 AstrBot 时使用最小化的 astrbot.api 替身，只用于离线测量。
+
+用法：
+    python bench/bench_handlers.py --idols 200 --catchphrases 2000 --users 50000 --images 1000
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import asyncio
+import argparse
+import datetime
+import tempfile
+import importlib
+
+PLUGIN_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_NAME = "astrbot_plugin_xox"
+
+
+# ================= AstrBot 替身 =================
+
+def install_astrbot_stub():
+    """未安装 AstrBot 时注册最小化的 astrbot.api 模块"""
+    try:
+        import astrbot.api  # noqa: F401
+        return False
+    except ImportError:
+        pass
+
+    def passthrough(*args, **kwargs):
+        return lambda func: func
+
+    class _Enum:
+        def __getattr__(self, name):
+            return name
+
+    class Filter:
+        event_message_type = staticmethod(passthrough)
+        command = staticmethod(passthrough)
+        permission_type = staticmethod(passthrough)
+        EventMessageType = _Enum()
+        PermissionType = _Enum()
+
+    class Star:
+        def __init__(self, context, config=None, **kwargs):
+            self.context = context
+
+    class Component:
+        def __init__(self, *args, **kwargs):
+            self.args = args
+            self.kwargs = kwargs
+
+    class Image(Component):
+        @classmethod
+        def fromFileSystem(cls, path):
+            return cls(path)
+
+    class Logger:
+        def info(self, *args, **kwargs):
+            pass
+        warning = error = debug = info
+
+    api = types.ModuleType("astrbot.api")
+    api.logger = Logger()
+    event = types.ModuleType("astrbot.api.event")
+    event.filter = Filter()
+    event.AstrMessageEvent = object
+    star = types.ModuleType("astrbot.api.star")
+    star.Context = object
+    star.Star = Star
+    comps = types.ModuleType("astrbot.api.message_components")
+    comps.At = type("At", (Component,), {})
+    comps.Plain = type("Plain", (Component,), {})
+    comps.Image = Image
+    root = types.ModuleType("astrbot")
+    root.api = api
+    api.event, api.star, api.message_components = event, star, comps
+    sys.modules.update({
+        "astrbot": root,
+        "astrbot.api": api,
+        "astrbot.api.event": event,
+        "astrbot.api.star": star,
+        "astrbot.api.message_components": comps,
+    })
+    return True
+
+
+class FakeEvent:
+    """伪造的消息事件，只实现插件用到的接口"""
+
+    def __init__(self, message_str, sender_id, sender_name="bench", group_id="bench"):
+        self.message_str = message_str
+        self._sender_id = sender_id
+        self._sender_name = sender_name
+        self._group_id = group_id
+
+    def get_sender_id(self):
+        return self._sender_id
+
+    def get_sender_name(self):
+        return self._sender_name
+
+    def get_group_id(self):
+        return self._group_id
+
+    def plain_result(self, text):
+        return text
+
+    def chain_result(self, chain):
+        return chain
+
+
+# ================= 合成数据 =================
+
+HANZI = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+
+
+def rand_word(rng, lo, hi):
+    return "".join(rng.choice(HANZI) for _ in range(rng.randint(lo, hi)))
+
+
+def build_workload(root, args, rng):
+    """在临时目录中生成 AstrBot 目录结构和合成数据，返回插件目录"""
+    plugin_dir = os.path.join(root, "plugins", PLUGIN_NAME)
+    img_root = os.path.join(root, "plugin_data", PLUGIN_NAME)
+    data_dir = os.path.join(plugin_dir, "data")
+    os.makedirs(data_dir)
+    for name in os.listdir(PLUGIN_SRC):
+        if name.endswith(".py") or name == "_conf_schema.json":
+            shutil.copy(os.path.join(PLUGIN_SRC, name), plugin_dir)
+
+    idols = {}
+    names = []
+    while len(names) < args.idols:
+        name = rand_word(rng, 2, 3)
+        if name not in idols:
+            names.append(name)
+            idols[name] = {
+                "nicknames": [rand_word(rng, 2, 2) for _ in range(args.nicknames)],
+                "info": rand_word(rng, 10, 30),
+                "catchphrases": {}
+            }
+    for i in range(args.catchphrases):
+        idol = names[i % len(names)]
+        trigger = rand_word(rng, 3, 6)
+        idols[idol]["catchphrases"][trigger] = [f"{{name}}{rand_word(rng, 5, 10)}" for _ in range(3)]
+
+    # 历史签到用户分布在最近 30 天的按天分区中
+    today = datetime.date.today()
+    checkins = {}
+    for uid in range(args.users):
+        day = (today - datetime.timedelta(days=rng.randint(0, 29))).isoformat()
+        checkins.setdefault(day, {})[str(1000000 + uid)] = rng.choice(names)
+
+    with open(os.path.join(data_dir, "idols.json"), "w", encoding="utf-8") as f:
+        json.dump(idols, f, ensure_ascii=False)
+    with open(os.path.join(data_dir, "checkins.json"), "w", encoding="utf-8") as f:
+        json.dump(checkins, f, ensure_ascii=False)
+
+    for name in names:
+        folder = os.path.join(img_root, name, "img", "原创微博图片")
+        os.makedirs(folder)
+        for i in range(args.images):
+            open(os.path.join(folder, f"{i}.jpg"), "wb").close()
+    return plugin_dir, idols
+
+
+def load_plugin(plugin_dir):
+    """按包的方式加载临时目录中的插件（main.py 使用相对导入）"""
+    pkg = types.ModuleType(PLUGIN_NAME)
+    pkg.__path__ = [plugin_dir]
+    sys.modules[PLUGIN_NAME] = pkg
+    return importlib.import_module(f"{PLUGIN_NAME}.main")
+
+
+# ================= 测量 =================
+
+async def drain(gen):
+    async for _ in gen:
+        pass
+
+
+async def measure(label, make_call, ops):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        await drain(make_call(i))
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+
+    print(f"{label:<28} {ops / total:>12.0f} {pct(0.50):>10.1f} {pct(0.99):>10.1f}")
+
+
+def chat_messages(idols, rng, count, match_ratio):
+    """生成群聊消息：按比例混合普通聊天、口号、好想宝宝、好想XXX"""
+    triggers = [t for data in idols.values() for t in data["catchphrases"]]
+    nicks = [n for data in idols.values() for n in data["nicknames"]] or list(idols)
+    messages = []
+    for _ in range(count):
+        r = rng.random()
+        if r >= match_ratio:
+            messages.append(rand_word(rng, 5, 40))
+        elif r < match_ratio * 0.5 and triggers:
+            messages.append(rand_word(rng, 0, 5) + rng.choice(triggers) + rand_word(rng, 0, 5))
+        elif r < match_ratio * 0.75:
+            messages.append("好想宝宝")
+        else:
+            messages.append("好想" + rng.choice(nicks))
+    return messages
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    stubbed = install_astrbot_stub()
+    root = tempfile.mkdtemp(prefix="xox-bench-")
+    try:
+        t0 = time.perf_counter()
+        plugin_dir, idols = build_workload(root, args, rng)
+        print(f"workload: {args.idols} idols, {args.catchphrases} catchphrases, "
+              f"{args.users} users, {args.images} images/idol "
+              f"(generated in {time.perf_counter() - t0:.1f}s{', astrbot stub' if stubbed else ''})")
+
+        main = load_plugin(plugin_dir)
+        # 假图片文件不是有效图片，不生成缩略图
+        config = {"save_interval": args.save_interval, "image_resize_enabled": False,
+                  "storage_backend": args.storage, "flood_control": args.flood_control}
+        if args.storage == "sqlite":
+            # 先完成一次 JSON -> SQLite 迁移，冷启动只统计正常启动
+            main.SixSixBot(context=None, config=config).db.storage.close()
+        t0 = time.perf_counter()
+        bot = main.SixSixBot(context=None, config=config)
+        print(f"cold start: {(time.perf_counter() - t0) * 1000:.1f} ms")
+        t0 = time.perf_counter()
+        await drain(bot.cmd_checkin(FakeEvent("/qd", "1")))
+        print(f"first checkin: {(time.perf_counter() - t0) * 1000:.1f} ms")
+        await bot.initialize()
+
+        print(f"{'handler':<28} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10}")
+        messages = chat_messages(idols, rng, args.ops, args.match_ratio)
+        user_ids = [str(1000000 + rng.randrange(max(args.users, 1))) for _ in range(args.ops)]
+        await measure("passive_catchphrase_handler",
+                      lambda i: bot.passive_catchphrase_handler(FakeEvent(messages[i], user_ids[i])),
+                      args.ops)
+        await measure("cmd_checkin (new)",
+                      lambda i: bot.cmd_checkin(FakeEvent("/qd", str(9000000 + i))), args.ops)
+        await measure("cmd_checkin (repeat)",
+                      lambda i: bot.cmd_checkin(FakeEvent("/qd", str(9000000 + i))), args.ops)
+        # 少数用户反复签到（刷屏），命中回复缓存
+        await measure("cmd_checkin (spam)",
+                      lambda i: bot.cmd_checkin(FakeEvent("/qd", str(9000000 + i % 20))), args.ops)
+        names = list(idols)
+        await measure("cmd_idol_info",
+                      lambda i: bot.cmd_idol_info(FakeEvent(f"/xox {names[i % len(names)]}", "1")),
+                      args.ops)
+        await measure("_list_catchphrase_logic",
+                      lambda i: bot._list_catchphrase_logic(FakeEvent("/list catchphrase", "1")),
+                      max(1, args.ops // 100))
+        await bot.terminate()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SixSixBot 离线性能基准")
+    parser.add_argument("--idols", type=int, default=100, help="小偶像数量 N")
+    parser.add_argument("--nicknames", type=int, default=3, help="每个小偶像的昵称数量")
+    parser.add_argument("--catchphrases", type=int, default=1000, help="应援口号总数 M")
+    parser.add_argument("--users", type=int, default=10000, help="历史签到用户数量 K")
+    parser.add_argument("--images", type=int, default=200, help="每个小偶像的图片数量")
+    parser.add_argument("--ops", type=int, default=5000, help="每个处理函数的调用次数")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json", help="存储后端")
+    parser.add_argument("--flood-control", action="store_true",
+                        help="启用刷屏限流（与插件默认一致为关闭，测量处理函数本身的开销）")
+    parser.add_argument("--match-ratio", type=float, default=0.1, help="群聊消息中可能触发回复的比例")
+    parser.add_argument("--save-interval", type=float, default=3.0, help="插件的 save_interval 配置")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+SixSixBot 签到数据内存基准
+
+生成按天分区的合成签到数据（与 data/checkins.json 格式相同），分别测量：
+
+- 直接 json.loads 得到的普通字典（每条记录一个用户ID字符串和一个小偶像名字字符串）
+- 经 compact_checkins 压缩后的结构（历史分区为数组两列，小偶像名字统一编号 / 驻留）
+
+输出常驻内存、每条记录的字节数、压缩耗时，以及按用户查找的耗时。
+只加载插件的 compact_checkins 模块，不需要 AstrBot。
+
+用法：
+    python bench/bench_memory.py --users 300000 --days 30 --active 0.5
+"""
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import datetime
+import importlib
+import tracemalloc
+
+from bench_handlers import PLUGIN_SRC, PLUGIN_NAME, rand_word
+
+
+def load_module(name):
+    """按包的方式加载插件中的单个模块"""
+    if PLUGIN_NAME not in sys.modules:
+        pkg = types.ModuleType(PLUGIN_NAME)
+        pkg.__path__ = [PLUGIN_SRC]
+        sys.modules[PLUGIN_NAME] = pkg
+    return importlib.import_module(f"{PLUGIN_NAME}.{name}")
+
+
+def build_checkins_text(args, rng):
+    names = [rand_word(rng, 2, 3) for _ in range(args.idols)]
+    today = datetime.date.today()
+    checkins = {}
+    for day in range(args.days):
+        date = (today - datetime.timedelta(days=day)).isoformat()
+        part = checkins[date] = {}
+        for uid in rng.sample(range(args.users), int(args.users * args.active)):
+            part[str(100000000 + uid * 7)] = rng.choice(names)
+    return json.dumps(checkins, ensure_ascii=False), today.isoformat()
+
+
+def measure_memory(build):
+    """返回 (构建结果, 构建结果占用的字节数)"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def measure_lookups(checkins, uids, rounds=3):
+    """按用户在全部分区中查找签到记录，返回每次查找的平均微秒数"""
+    parts = list(checkins.values())
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for uid in uids:
+            for part in parts:
+                part.get(uid)
+        elapsed = (time.perf_counter() - t0) / (len(uids) * len(parts)) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SixSixBot 签到数据内存基准")
+    parser.add_argument("--users", type=int, default=300000, help="用户总数")
+    parser.add_argument("--days", type=int, default=30, help="保留的天数（分区数）")
+    parser.add_argument("--active", type=float, default=0.5, help="每天签到的用户比例")
+    parser.add_argument("--idols", type=int, default=200, help="小偶像数量")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    compact_module = load_module("compact_checkins")
+
+    text, today = build_checkins_text(args, rng)
+    plain, plain_bytes = measure_memory(lambda: json.loads(text))
+    records = sum(len(part) for part in plain.values())
+
+    def build_compact():
+        data = json.loads(text)
+        return compact_module.compact_checkins(data, today, compact_module.IdolCodes())
+
+    compact, compact_bytes = measure_memory(build_compact)
+    # 压缩耗时在不开启 tracemalloc 时单独测量
+    data = json.loads(text)
+    t0 = time.perf_counter()
+    compact_module.compact_checkins(data, today, compact_module.IdolCodes())
+    compact_seconds = time.perf_counter() - t0
+    # 与原始数据一致
+    assert all(dict(compact[d].items()) == plain[d] for d in plain)
+
+    print(f"workload: {args.days} days x {int(args.users * args.active)} checkins/day "
+          f"= {records} records, {args.idols} idols")
+    print(f"{'representation':<16} {'MiB':>10} {'bytes/rec':>10}")
+    for label, size in (("plain dict", plain_bytes), ("compact", compact_bytes)):
+        print(f"{label:<16} {size / 2**20:>10.1f} {size / records:>10.1f}")
+    print(f"reduction: {plain_bytes / compact_bytes:.1f}x, "
+          f"compact time: {compact_seconds * 1000:.0f} ms "
+          f"({compact_seconds / max(args.days - 1, 1) * 1000:.1f} ms per day partition)")
+
+    uids = [str(100000000 + rng.randrange(args.users) * 7) for _ in range(2000)]
+    print(f"lookup per partition: plain {measure_lookups(plain, uids):.2f} us, "
+          f"compact {measure_lookups(compact, uids):.2f} us")
+
+
+if __name__ == "__main__":
+    main()
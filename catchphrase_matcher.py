@@ -0,0 +1,185 @@
+"""
+应援口号匹配器模块
+
+负责：
+- 将所有小偶像的触发句编译为一个 Aho-Corasick 自动机
+- 一条消息只扫描一遍即可找出命中的触发句，与触发句数量无关
+- 增删口号时增量更新自动机，无需从头重建
+
+匹配顺序与原先"按小偶像顺序、再按口号顺序逐个 in 判断"的结果保持一致
+
+另外为每个触发句挑选一个"锚点字符"（尽量选较少见的字），
+消息中不含任何锚点字符时可以直接判定不命中，无需逐字扫描
+
+传入 normalize 时，触发句按归一化后的形式编入自动机，匹配时传入同样归一化过的消息；
+归一化后为空的触发句（如纯表情）仍按原文在原始消息中查找
+"""
+from collections import Counter, deque
+
+
+class CatchphraseMatcher:
+    """多模式触发句匹配器"""
+
+    def __init__(self, idols=None, normalize=None):
+        self._normalize = normalize
+        self._reset()
+        if idols:
+            self.rebuild(idols)
+
+    def _reset(self):
+        self._goto = [{}]       # 节点转移表：字符 -> 子节点
+        self._fail = [0]        # 失配指针
+        self._link = [0]        # 沿失配链最近的带输出节点
+        self._out = [set()]     # 以该节点结尾的 (小偶像, 触发句)
+        self._ranks = {}        # (小偶像, 触发句) -> (小偶像序号, 口号序号, 结束节点)
+        self._patterns = {}     # (小偶像, 触发句) -> 编入自动机的形式（归一化后的触发句）
+        self._literals = {}     # 归一化后为空、按原文查找的 (小偶像, 触发句)
+        self._idol_order = {}   # 小偶像 -> 序号（与 idols 字典插入顺序一致）
+        self._trigger_seq = {}  # 小偶像 -> 下一个口号序号
+        self._next_order = 0
+        self._dirty = False
+        self._char_freq = Counter()    # 字符 -> 包含该字符的触发句数量
+        self.anchor_chars = frozenset()
+
+    def rebuild(self, idols):
+        """根据完整的 idols 数据重新构建自动机"""
+        self._reset()
+        for idol_name, idol_data in idols.items():
+            self.add_idol(idol_name)
+            for trigger in idol_data.get("catchphrases", {}):
+                self.add(idol_name, trigger, select_anchor=False)
+        # 全部触发句加入后统一挑选锚点，使结果不受添加顺序影响
+        for pattern in self._patterns.values():
+            self._char_freq.update(set(pattern))
+        self._reselect_anchors()
+
+    def add_idol(self, idol_name):
+        """登记小偶像的顺序（新小偶像排在最后，与字典插入顺序一致）"""
+        if idol_name not in self._idol_order:
+            self._idol_order[idol_name] = self._next_order
+            self._trigger_seq[idol_name] = 0
+            self._next_order += 1
+
+    def add(self, idol_name, trigger, select_anchor=True):
+        """增量添加一个触发句；已存在的触发句只更新响应内容，顺序不变"""
+        key = (idol_name, trigger)
+        if not trigger or key in self._ranks:
+            return
+        self.add_idol(idol_name)
+        pattern = self._normalize(trigger) if self._normalize else trigger
+        if not pattern:
+            self._literals[key] = trigger
+            self._ranks[key] = (self._idol_order[idol_name], self._trigger_seq[idol_name], None)
+            self._trigger_seq[idol_name] += 1
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._out.append(set())
+            node = nxt
+        self._out[node].add(key)
+        self._patterns[key] = pattern
+        self._ranks[key] = (self._idol_order[idol_name], self._trigger_seq[idol_name], node)
+        self._trigger_seq[idol_name] += 1
+        self._dirty = True
+        if select_anchor:
+            self._add_anchor(key)
+
+    def remove_idol(self, idol_name):
+        """移除某个小偶像的全部触发句"""
+        removed = [k for k in self._ranks if k[0] == idol_name]
+        for key in removed:
+            node = self._ranks.pop(key)[2]
+            if node is None:
+                del self._literals[key]
+                continue
+            self._out[node].discard(key)
+            self._char_freq.subtract(set(self._patterns.pop(key)))
+        self._idol_order.pop(idol_name, None)
+        self._trigger_seq.pop(idol_name, None)
+        if removed:
+            self._reselect_anchors()
+
+    def _pick_anchor(self, pattern):
+        """取触发句中在所有触发句里出现次数最少的字作为锚点"""
+        return min(pattern, key=lambda ch: (self._char_freq[ch], ch))
+
+    def _add_anchor(self, key):
+        pattern = self._patterns[key]
+        self._char_freq.update(set(pattern))
+        anchor = self._pick_anchor(pattern)
+        if anchor not in self.anchor_chars:
+            self.anchor_chars = self.anchor_chars | {anchor}
+
+    def _reselect_anchors(self):
+        """整体重建或删除小偶像后，按最新字符频率重新挑选全部锚点"""
+        self._char_freq += Counter()  # 去掉计数为 0 的字符
+        self.anchor_chars = frozenset(self._pick_anchor(pattern) for pattern in self._patterns.values())
+
+    def may_match(self, text):
+        """快速预筛：消息中不含任何锚点字符时一定不会命中任何触发句（存在按原文查找的触发句时不预筛）"""
+        return bool(self._literals) or not self.anchor_chars.isdisjoint(text)
+
+    def idol_order(self, idol_name):
+        """返回小偶像的遍历序号，未登记的返回 None"""
+        return self._idol_order.get(idol_name)
+
+    def first_match(self, text, raw=None):
+        """
+        扫描消息，返回按原遍历顺序第一个命中的 (小偶像, 触发句)
+
+        Args:
+            text: 消息（使用 normalize 时传入归一化后的消息）
+            raw: 原始消息，用于查找归一化后为空的触发句；省略时与 text 相同
+
+        Returns:
+            (idol_name, trigger) 或 None
+        """
+        best = None
+        best_rank = None
+        if self._literals:
+            raw = text if raw is None else raw
+            for key, trigger in self._literals.items():
+                if trigger in raw and (best_rank is None or self._ranks[key] < best_rank):
+                    best, best_rank = key, self._ranks[key]
+        if not self._patterns or self.anchor_chars.isdisjoint(text):
+            return best
+        if self._dirty:
+            self._build_links()
+        goto, fail, link, out, ranks = self._goto, self._fail, self._link, self._out, self._ranks
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] else link[node]
+            while hit:
+                for key in out[hit]:
+                    rank = ranks[key]
+                    if best_rank is None or rank < best_rank:
+                        best, best_rank = key, rank
+                hit = link[hit]
+        return best
+
+    def _build_links(self):
+        """广度优先计算失配指针与输出链接"""
+        goto, out = self._goto, self._out
+        fail = [0] * len(goto)
+        link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            u = queue.popleft()
+            for ch, v in goto[u].items():
+                queue.append(v)
+                f = fail[u]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fv = goto[f].get(ch, 0)
+                fail[v] = fv
+                link[v] = fv if out[fv] else link[fv]
+        self._fail, self._link = fail, link
+        self._dirty = False
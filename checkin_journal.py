@@ -0,0 +1,184 @@
+"""
+签到日志模块
+
+负责：
+- 以 JSON Lines 形式追加记录签到 / 重置 / 过期事件，每次签到只写一行
+- 首次加载签到数据时在 checkins.json 快照上重放日志
+- 日志过长时把当前签到数据写成新快照并清空日志（压缩）
+
+签到数据按天分区：{"YYYY-MM-DD": {用户ID: 小偶像}}，
+重置当天只需丢弃当天的分区，过期的分区整体删除
+
+所有写操作都在专用的单线程中按提交顺序执行，保证日志顺序与事件顺序一致。
+多个进程共用同一个日志时，追加与压缩都在文件锁内进行；各进程记录已读到的位置，
+定期只读取新追加的部分（read_new）即可看到其他进程的签到
+"""
+import os
+import sys
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CheckinJournal:
+    """签到事件的追加日志"""
+
+    def __init__(self, path, lock=None):
+        self.path = path
+        self.entries = 0  # 自上次压缩以来的事件数
+        self.offset = 0   # 已经应用到内存中的日志字节数
+        self._lock = lock or threading.Lock()
+        self._file = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xox-journal")
+
+    # --- 事件 ---
+
+    @staticmethod
+    def checkin_event(user_id, date, idol_name):
+        return {"op": "checkin", "uid": user_id, "date": date, "idol": idol_name}
+
+    @staticmethod
+    def reset_event(date):
+        return {"op": "reset", "date": date}
+
+    @staticmethod
+    def expire_event(before):
+        return {"op": "expire", "before": before}
+
+    @staticmethod
+    def apply(checkins, event):
+        """把一条事件应用到按天分区的签到数据上"""
+        op = event.get("op")
+        if op == "checkin":
+            # 小偶像名字驻留：同一名字在所有签到记录中共用一个字符串对象
+            checkins.setdefault(event["date"], {})[event["uid"]] = sys.intern(event["idol"])
+        elif op == "reset":
+            checkins.pop(event["date"], None)
+        elif op == "expire":
+            for date in [d for d in checkins if d < event["before"]]:
+                del checkins[date]
+
+    def replay(self, checkins):
+        """在签到数据快照上重放整个日志，返回重放的事件数"""
+        events, self.offset = self._read_events(0)
+        for event in events:
+            self.apply(checkins, event)
+        self.entries = len(events)
+        return len(events)
+
+    def _read_events(self, start):
+        """从 start 处读取完整的行，返回 (事件列表, 读到的位置)"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], start
+        except (IOError, OSError) as e:
+            logging.error(f"读取签到日志 {self.path} 失败: {e}")
+            return [], start
+        # 只处理完整的行，其他进程写了一半的最后一行留到下次读取
+        end = data.rfind(b"\n") + 1
+        events = []
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                # 崩溃时可能留下写了一半的行，跳过即可
+                logging.warning(f"签到日志 {self.path} 中有无法解析的记录，已跳过")
+        return events, start + end
+
+    # --- 写入（在日志线程中执行） ---
+
+    def append(self, event):
+        """追加一条事件，返回 Future"""
+        self.entries += 1
+        return self._executor.submit(self._append_line, json.dumps(event, ensure_ascii=False))
+
+    def read_new(self):
+        """
+        读取上次读取之后追加的事件（包括其他进程的），返回 Future
+
+        日志已被压缩清空时结果为 None，需要重新加载快照
+        """
+        return self._executor.submit(self._read_new)
+
+    def submit(self, func, *args):
+        """在日志线程中执行 func，排在此前提交的写入之后，返回 Future"""
+        return self._executor.submit(func, *args)
+
+    def compact(self, load_snapshot, write_snapshot):
+        """
+        压缩日志：在文件锁内读取最新快照、重放整个日志并写入新快照，成功后清空日志，返回 Future
+
+        快照与日志都从磁盘读取，包含所有进程的签到；
+        即使在写入快照与清空日志之间崩溃，重放日志也只会得到相同的结果
+        """
+        self.entries = 0
+        return self._executor.submit(self._compact, load_snapshot, write_snapshot)
+
+    def close(self):
+        """等待所有写入完成并关闭日志文件"""
+        self._executor.shutdown(wait=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append_line(self, line):
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line + "\n")
+                self._file.flush()
+        except (IOError, OSError) as e:
+            logging.error(f"写入签到日志 {self.path} 失败: {e}")
+
+    def _read_new(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size < self.offset:
+            return None
+        events, self.offset = self._read_events(self.offset)
+        return events
+
+    def _compact(self, load_snapshot, write_snapshot):
+        with self._lock:
+            checkins = load_snapshot()
+            for event in self._read_events(0)[0]:
+                self.apply(checkins, event)
+            if not write_snapshot(checkins):
+                return False
+            try:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                open(self.path, 'w', encoding='utf-8').close()
+                self.offset = 0
+            except (IOError, OSError) as e:
+                logging.error(f"清空签到日志 {self.path} 失败: {e}")
+            return True
+
+
+def checkins_from_users(users):
+    """
+    把旧版本保存在用户记录中的 last_checkin / today_idol 拆分为按天分区的签到数据
+
+    会从 users 中移除这两个字段，移除后为空的用户记录直接删除
+    """
+    checkins = {}
+    for uid in list(users):
+        record = users[uid]
+        date = record.pop("last_checkin", None)
+        idol = record.pop("today_idol", None)
+        if date:
+            checkins.setdefault(date, {})[uid] = idol
+        if not record:
+            del users[uid]
+    return checkins
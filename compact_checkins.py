@@ -0,0 +1,168 @@
+"""
+签到历史的紧凑存储模块
+
+负责：
+- 把已经过去的某一天的签到分区（{用户ID: 小偶像}）压缩为两列数组：
+  按数值排序的用户ID（array('Q')）和小偶像编号（array('I')），每条记录约 12 字节
+- 小偶像名字统一登记在编号表中，各分区只保存编号；当天分区仍是普通字典，但小偶像名字也做驻留
+- 压缩后的分区仍是 {用户ID: 小偶像} 映射，序列化为 JSON / 写入 SQLite 的结果不变
+
+每天只有当天的分区会频繁写入，历史分区只在重置、过期或同步其他进程的签到时偶尔修改，
+用有序数组换取内存，按用户查找为二分查找
+"""
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+
+# 能放进 array('Q') 的最长十进制用户ID
+_MAX_DIGITS = 19
+
+
+def _as_number(uid):
+    """纯数字且无前导零的用户ID（QQ 号等）返回整数，其余返回 None"""
+    if (isinstance(uid, str) and uid.isascii() and uid.isdigit()
+            and len(uid) <= _MAX_DIGITS and (uid[0] != "0" or uid == "0")):
+        return int(uid)
+    return None
+
+
+def _parse_uids(uids):
+    """用户ID全部能按 _as_number 转换时批量转换为整数列表，否则返回 None"""
+    try:
+        nums = list(map(int, uids))
+    except (TypeError, ValueError):
+        return None
+    if nums and (min(nums) < 0 or max(nums) >= 10 ** _MAX_DIGITS):
+        return None
+    # int() 也接受前导零、空白、下划线和非 ASCII 数字，这些ID转换回字符串后都会与原值不同，
+    # 而每个ID转换回字符串都不会变长，所以拼接结果一致即逐个一致
+    if "".join(map(str, nums)) != "".join(uids):
+        return None
+    return nums
+
+
+class IdolCodes:
+    """小偶像名字 <-> 编号 对照表（只增不减，多个线程可同时压缩分区）"""
+
+    def __init__(self):
+        self._names = []
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    code = len(self._names)
+                    self._names.append(sys.intern(name) if isinstance(name, str) else name)
+                    self._codes[name] = code
+        return code
+
+    def name(self, code):
+        return self._names[code]
+
+
+class FrozenPartition(MutableMapping):
+    """某一天的签到：用户ID与小偶像编号分两列存放；非数字的用户ID放在附加字典中"""
+
+    __slots__ = ("_uids", "_codes", "_others", "_table")
+
+    def __init__(self, part, table):
+        uids = list(part)
+        nums = _parse_uids(uids)
+        others = None
+        if nums is None:
+            # 含有非数字的用户ID：逐个区分（很少见）
+            others = {uid: part[uid] for uid in uids if _as_number(uid) is None}
+            uids = [uid for uid in uids if uid not in others]
+            nums = list(map(int, uids))
+        codes = list(map(table.code, map(part.__getitem__, uids)))
+        # 批量转换后只对下标排序，比逐条构造 (用户ID, 编号) 元组再排序快得多
+        order = sorted(range(len(nums)), key=nums.__getitem__)
+        self._uids = array("Q", [nums[i] for i in order])
+        self._codes = array("I", [codes[i] for i in order])
+        self._others = others or None
+        self._table = table
+
+    def _find(self, n):
+        """返回用户在数组中的位置及是否存在"""
+        i = bisect_left(self._uids, n)
+        return i, i < len(self._uids) and self._uids[i] == n
+
+    def __getitem__(self, uid):
+        n = _as_number(uid)
+        if n is None:
+            if self._others is not None and uid in self._others:
+                return self._others[uid]
+            raise KeyError(uid)
+        i, found = self._find(n)
+        if not found:
+            raise KeyError(uid)
+        return self._table.name(self._codes[i])
+
+    def __setitem__(self, uid, idol):
+        n = _as_number(uid)
+        if n is None:
+            if self._others is None:
+                self._others = {}
+            self._others[uid] = idol
+            return
+        code = self._table.code(idol)
+        i, found = self._find(n)
+        if found:
+            self._codes[i] = code
+        else:
+            self._uids.insert(i, n)
+            self._codes.insert(i, code)
+
+    def __delitem__(self, uid):
+        n = _as_number(uid)
+        if n is None:
+            if self._others is None or uid not in self._others:
+                raise KeyError(uid)
+            del self._others[uid]
+            return
+        i, found = self._find(n)
+        if not found:
+            raise KeyError(uid)
+        del self._uids[i]
+        del self._codes[i]
+
+    def __iter__(self):
+        for n in self._uids:
+            yield str(n)
+        if self._others:
+            yield from self._others
+
+    def __len__(self):
+        return len(self._uids) + (len(self._others) if self._others else 0)
+
+    def items(self):
+        """一次性解码全部 (用户ID, 小偶像)，序列化时不必逐个二分查找"""
+        name = self._table.name
+        pairs = [(str(n), name(c)) for n, c in zip(self._uids, self._codes)]
+        if self._others:
+            pairs.extend(self._others.items())
+        return pairs
+
+
+def compact_checkins(checkins, today, table):
+    """
+    原地压缩签到数据：早于 today 的分区转为 FrozenPartition，其余分区中的小偶像名字做驻留
+
+    已经压缩过的分区直接跳过，可以反复调用（跨天时只会压缩前一天的分区）
+    """
+    for date, part in list(checkins.items()):
+        if isinstance(part, FrozenPartition):
+            continue
+        if date < today:
+            checkins[date] = FrozenPartition(part, table)
+        else:
+            for uid, idol in part.items():
+                if isinstance(idol, str):
+                    part[uid] = sys.intern(idol)
+    return checkins
@@ -4,20 +4,51 @@
 负责：
 - 小偶像信息、昵称、简介的存储
 - 应援口号的存储
-- 用户签到记录的存储
+- 用户签到记录的存储（按天分区，过期分区按保留天数归档）
 - 管理员列表的存储
+- 群组配置的存储（配置过的群使用独立的小偶像名单、应援口号开关和签到分区）
 - 图片文件的随机获取
 
-所有数据文件存储在 data 目录下，确保插件更新时数据不丢失
+所有数据文件存储在 data 目录下，确保插件更新时数据不丢失。
+多个 Bot 进程可以共用同一个 data 目录：写入时比较版本戳，被其他进程修改过则先三方合并再写入；
+后台同步任务每隔 sync_interval 秒检查一次版本戳和签到日志，只重新读取有变化的部分
 """
 import os
+import re
 import json
-import random
 import logging
+import datetime
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .idol_index import FORM_NAME, IdolIndex, new_idol_record, validate_idols
+from .idol_sampler import idol_weight
+from .group_scope import GroupScope, partition_key, validate_group
+from .idol_bundle import export_bundle, merge_bundle
+from .image_manifest import ImageManifestCache
+from .image_derivatives import ImageDerivativeCache
+from .checkin_journal import CheckinJournal, checkins_from_users
+from .compact_checkins import FrozenPartition, IdolCodes, compact_checkins
+from .storage import EMPTY, StaleVersion, atomic_write_text, create_storage, json_default, merge_changes
+from .lazy_datasets import LazyDatasets
+from .metrics import Metrics
+from .text_normalize import normalize
+
+# 归一化后名字开头的团队名（如 "gnz48刘欣媛" 中的 "gnz48"）
+TEAM_PREFIX = re.compile(r"^[a-z]+\d+")
+# 归档文件每行的开头：{"date": "分区键", ...}
+ARCHIVE_KEY = re.compile(rb'\{"date": ("(?:[^"\\]|\\.)*")')
+# 图片清单预热时输出进度日志的间隔（秒）
+PREWARM_REPORT_INTERVAL = 5.0
+
 
 class DataManager:
     """数据管理器，负责所有持久化数据的读写"""
-    def __init__(self, plugin_dir, plugin_data_dir=None, config=None):
+    def __init__(self, plugin_dir, plugin_data_dir=None, config=None, metrics=None):
+        # 运行指标（图片查找、保存耗时等）
+        self.metrics = metrics or Metrics()
         # 设置数据目录
         self.data_dir = os.path.join(plugin_dir, "data")
         os.makedirs(self.data_dir, exist_ok=True)
@@ -38,107 +69,1043 @@ class DataManager:
         
         # 获取图片格式配置，默认为常见格式
         self.image_formats = self.config.get("image_formats", [".png", ".jpg", ".jpeg", ".gif", ".bmp"])
+        # 图片清单缓存：目录 mtime 不变时不再重复 listdir
+        self.image_cache = ImageManifestCache(
+            self.image_formats,
+            self.config.get("image_cache_check_interval", 5.0)
+        )
+        # 启动后在后台扫描所有小偶像的图片目录，第一次请求不必等待 listdir
+        self.image_prewarm = bool(self.config.get("image_prewarm", True))
+        self._prewarm_task = None
+        # 发送用的缩略图缓存：大图先缩放压缩再发送，未生成时发送原图
+        self.derivatives = None
+        if self.config.get("image_resize_enabled", True):
+            self.derivatives = ImageDerivativeCache(
+                os.path.join(self.img_dir, ".xox_cache"),
+                max_side=int(self.config.get("image_max_side", 1280)),
+                quality=int(self.config.get("image_quality", 85)),
+                max_bytes=int(self.config.get("image_cache_max_mb", 512)) * 1024 * 1024
+            )
 
         # 文件路径
         self.files = {
             "idols": os.path.join(self.data_dir, "idols.json"),         # 小偶像名单、昵称、简介、应援口号
-            "users": os.path.join(self.data_dir, "users.json"),         # 签到记录
-            "groups": os.path.join(self.data_dir, "groups.json"),       # 群组信息 (占位)
+            "users": os.path.join(self.data_dir, "users.json"),         # 用户记录
+            "checkins": os.path.join(self.data_dir, "checkins.json"),   # 签到记录（按天分区）
+            "groups": os.path.join(self.data_dir, "groups.json"),       # 群组配置（小偶像名单、应援口号开关）
             "admins": os.path.join(self.data_dir, "admins.json")        # 授权管理员
         }
+        # 存储后端：json（默认，每个数据集一个文件）或 sqlite（WAL 模式的单个数据库）
+        self.storage = create_storage(self.config.get("storage_backend", "json"), self.data_dir, self.files)
+
+        # 延迟写入：save 只标记脏数据，由后台任务每隔 save_interval 秒统一落盘
+        # save_interval 为 0 时退化为每次 save 立即写入
+        self.save_interval = float(self.config.get("save_interval", 3.0))
+        self._dirty = set()
+        self._flush_task = None
+        # 阻塞的文件 I/O 放到有界线程池中执行，避免卡住事件循环
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=int(self.config.get("io_workers", 4)),
+            thread_name_prefix="xox-io"
+        )
+        self._save_locks = {}
+        self._pending_saves = set()
+        # 多进程同步：各数据集最后一次读取 / 写入时的版本戳，以及当时内容的 JSON 文本（合并时的共同祖先）
+        self.sync_interval = float(self.config.get("sync_interval", 2.0))
+        self._sync_task = None
+        self._versions = {}
+        self._bases = {}
+        self._reload_events = None  # 重新加载签到数据期间本进程产生的事件
+
+        # 签到日志：签到 / 重置只追加一行，不再重写整个 checkins.json
+        # （沿用旧版本的文件名，升级时未压缩的日志仍会被重放）
+        self.journal = None
+        self.journal_compact_threshold = int(self.config.get("journal_compact_threshold", 1000))
+        if self.config.get("checkin_journal", True) and not self.storage.supports_events:
+            self.journal = CheckinJournal(os.path.join(self.data_dir, "users.journal.jsonl"),
+                                          self.storage.lock)
+        # 签到分区保留天数（0 表示永久保留），过期分区追加到归档文件后从签到数据中删除
+        self.checkin_retention_days = int(self.config.get("checkin_retention_days", 30))
+        self.checkin_archive = bool(self.config.get("checkin_archive", True))
+        self.archive_file = os.path.join(self.data_dir, "checkins.archive.jsonl")
+        # 历史签到分区压缩为数组存储，小偶像名字统一编号
+        self._idol_codes = IdolCodes()
+        self._compact_task = None
+        self._expire_task = None
+
+        # 数据集按需加载：启动时只读取小偶像名单，users 等在第一次访问时才读取
+        self._preload_task = None
+        self.data = LazyDatasets(self.files, self._load_dataset)
 
-        self.data = {}
-        self.load_all()
+        # idols 及其派生索引（口号自动机、回复模板、昵称索引）的快照，热重载时整体替换
+        self.index = IdolIndex(self.data.get("idols", {}), self.config.get("reply_templates"))
+        # idols 的版本号：管理命令修改或替换快照时加一；热重载构建索引期间有修改时重新构建，回复缓存也以它为键
+        self._idols_rev = 0
+        # 当天各签到分区的 小偶像 -> 签到用户ID集合 索引（分区键 -> 索引），跨天自动切换
+        self._today = None
+        self._taken = {}
+        # 各群的作用域（按群筛选后的口号自动机、抽取表），idols 或群配置变化后按需重新构建
+        self._scopes = {}
+        self._scope_key = None
+        self._groups_rev = 0
+        # 同一个群当天尽量分配不同的小偶像：未配置的群号 -> 本轮已分配的小偶像（只在内存中，跨天清空）；
+        # 配置过的群有自己的分区，直接按分区中的签到结果排除
+        self.checkin_distinct = bool(self.config.get("checkin_distinct_idols", False))
+        self._group_taken = {}
+        self._group_taken_day = None
+
+    def _load_dataset(self, key):
+        """
+        首次访问数据集时加载；不存在或已损坏时初始化为空结构
+
+        读取文件（签到还可能要压缩日志）耗时较长，事件循环中的代码应先 await aload(key)，
+        由线程池加载；idols 在构造时加载，除此之外在事件循环中同步加载时记录警告
+        """
+        t0 = time.perf_counter()
+        if key != "idols" and self._on_event_loop():
+            self.metrics.incr("load.on_loop")
+            logging.warning(f"在事件循环中同步加载数据集 {key}，处理函数应先 await aload({key!r})")
+        data, version = self.storage.load_versioned(key)
+        if data is None and key == "checkins":
+            # 旧版本的签到保存在用户记录中：拆分为按天分区，并把精简后的 users 写回
+            users = self.data["users"]
+            data = checkins_from_users(users)
+            data, version = self._init_dataset(key, data, version)
+            self._write("users")
+        elif data is None:
+            data, version = self._init_dataset(key, EMPTY[key](), version)
+        self._versions[key] = version
+        if self._tracks_base(key):
+            self._bases[key] = json.dumps(data, ensure_ascii=False)
+        if key == "checkins" and self.journal is not None and self.journal.replay(data):
+            # 把重放结果折叠进快照
+            self.journal.compact(self._load_checkins_snapshot, self._write_checkins).result()
+        if key == "checkins":
+            compact_checkins(data, datetime.date.today().isoformat(), self._idol_codes)
+        self.metrics.observe(f"load.{key}", time.perf_counter() - t0)
+        return data
+
+    def _init_dataset(self, key, data, version):
+        """写入初始数据；其他进程抢先初始化时改用它写入的内容"""
+        try:
+            return data, self.storage.write_versioned(key, self.storage.snapshot(key, data), version)[1]
+        except StaleVersion:
+            theirs, version = self.storage.load_versioned(key)
+            return (theirs if theirs is not None else data), version
+
+    def _tracks_base(self, key):
+        """通过 save 整体写入的数据集需要保存共同祖先；签到按事件写入时不需要"""
+        if key == "checkins":
+            return self.journal is None and not self.storage.supports_events
+        return True
 
     def load_all(self):
-        for key, path in self.files.items():
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        self.data[key] = json.load(f)
-                except json.JSONDecodeError:
-                    # 如果文件损坏，重置为空
-                    self.data[key] = {} if key not in ["admins"] else []
-                    self.save(key)
-            else:
-                # 初始化空结构
-                self.data[key] = {} if key not in ["admins"] else []
-                self.save(key)
+        """立即加载全部数据集"""
+        self.data.preload()
+
+    async def aload(self, *keys):
+        """
+        确保数据集已经加载，处理函数在访问 data[key] 之前调用
+
+        都已加载时直接返回；后台预加载进行中时等待它完成，否则在线程池中加载，不阻塞事件循环
+        """
+        if all(self.data.is_loaded(key) for key in keys):
+            return
+        task = self._preload_task
+        if task is not None and not task.done():
+            await asyncio.wait({task})
+        missing = [key for key in keys if not self.data.is_loaded(key)]
+        if missing:
+            await self.run_io(self.data.preload, missing)
+
+    @staticmethod
+    def _on_event_loop():
+        """当前线程是否正在运行事件循环"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def start_preload(self):
+        """在事件循环中启动后台预加载，首个签到请求不必等待读取签到数据"""
+        if self._preload_task is None:
+            self._preload_task = asyncio.get_running_loop().create_task(self.run_io(self.load_all))
 
     def save(self, key):
-        """保存数据到文件，带异常处理"""
+        """
+        保存数据：启用延迟写入时只标记为脏数据；
+        在事件循环中调用时交给线程池异步写入；否则立即写入
+        """
+        if self._flush_task is not None:
+            self._dirty.add(key)
+            return
         try:
-            os.makedirs(os.path.dirname(self.files[key]), exist_ok=True)
-            with open(self.files[key], 'w', encoding='utf-8') as f:
-                json.dump(self.data[key], f, ensure_ascii=False, indent=2)
-        except (IOError, OSError) as e:
-            # 记录错误但不抛出异常，避免影响主流程
-            logging.error(f"保存文件 {self.files[key]} 失败: {e}")
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(key)
+            return
+        task = loop.create_task(self.asave(key))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    def flush(self):
+        """立即写入所有脏数据（同步版本，供事件循环之外使用）"""
+        while self._dirty:
+            self._write(self._dirty.pop())
+
+    def _dump(self, key):
+        """在事件循环中拷贝数据集的快照，供后台写入"""
+        return self.storage.snapshot(key, self.data[key])
+
+    def _base_text(self, key, snapshot):
+        """快照对应的 JSON 文本，写入成功后作为下次合并的共同祖先"""
+        if not self._tracks_base(key):
+            return None
+        return snapshot if isinstance(snapshot, str) else json.dumps(self.data[key], ensure_ascii=False)
+
+    def _write(self, key):
+        t0 = time.perf_counter()
+        while True:
+            snapshot = self._dump(key)
+            base = self._base_text(key, snapshot)
+            try:
+                written, version = self.storage.write_versioned(key, snapshot, self._versions.get(key))
+                break
+            except StaleVersion:
+                self._merge_external(key, *self.storage.load_versioned(key))
+        self._committed(key, written, version, base)
+        self._record_save(key, t0, written)
+        return written
+
+    def _committed(self, key, written, version, base):
+        if written:
+            self._versions[key] = version
+            self._bases[key] = base
+
+    def _record_save(self, key, t0, written):
+        self.metrics.observe(f"save.{key}", time.perf_counter() - t0)
+        self.metrics.incr(f"save.{key}.written", written)
+
+    def _load_checkins_snapshot(self):
+        return self.storage.load("checkins") or {}
+
+    def _write_checkins(self, checkins):
+        return self.storage.write("checkins", self.storage.snapshot("checkins", checkins))
+
+    # --- idols 快照 ---
+
+    @property
+    def matcher(self):
+        return self.index.matcher
+
+    @property
+    def templates(self):
+        return self.index.templates
+
+    @property
+    def nick_index(self):
+        return self.index.nick_index
+
+    @property
+    def idols_version(self):
+        """idols 数据的版本号，任何修改（管理命令、导入、热重载、其他进程同步）后都会改变"""
+        return self._idols_rev
+
+    def _swap_idols(self, index):
+        """原子替换 idols 快照：两次赋值之间没有 await，处理函数不会看到新旧混合的状态"""
+        self.data["idols"] = index.idols
+        self.index = index
+        self._idols_rev += 1
+
+    def _read_idols(self):
+        """在线程池中读取并校验 idols（热重载），返回 (数据, 版本戳, 错误信息)"""
+        version = self.storage.version("idols")
+        try:
+            idols, version = self.storage.load_versioned("idols", repair=False)
+            if idols is not None:
+                validate_idols(idols)
+        except ValueError as e:
+            return None, version, str(e)
+        return idols, version, None
+
+    async def _reload_idols(self):
+        """热重载 idols：读取、校验、合并后在线程池中构建新快照，完成后一次性替换"""
+        async with self._save_locks.setdefault("idols", asyncio.Lock()):
+            theirs, version, error = await self.run_io(self._read_idols)
+            if error is not None:
+                # 记下版本戳，同一份错误的文件只报告一次；本进程之后的保存会覆盖它
+                logging.error(f"idols 数据格式错误，继续使用当前数据: {error}")
+                self._versions["idols"] = version
+                self.metrics.incr("sync.idols.invalid")
+                return
+            if theirs is None:
+                self._versions["idols"] = version
+                return
+            config_templates = self.config.get("reply_templates")
+            while True:
+                rev = self._idols_rev
+                # 拷贝一份，构建期间管理命令对当前快照的原地修改不会影响新快照
+                merged = self._merge_idols(json.loads(json.dumps(self.data["idols"], ensure_ascii=False)), theirs)
+                index = await self.run_io(IdolIndex, merged, config_templates)
+                if rev == self._idols_rev:
+                    break
+            self._swap_idols(index)
+            self._versions["idols"] = version
+            self._bases["idols"] = json.dumps(theirs, ensure_ascii=False)
+            self.metrics.incr("sync.idols")
+
+    def _merge_idols(self, current, theirs):
+        base_text = self._bases.get("idols")
+        base = json.loads(base_text) if base_text is not None else None
+        return merge_changes(base, current, theirs)
+
+    def _idols_changed(self):
+        """管理命令原地修改了当前 idols 快照"""
+        self._idols_rev += 1
+        self.save("idols")
+
+    # --- 多进程同步 ---
+
+    def _merge_external(self, key, theirs, version):
+        """把其他进程写入的内容合并进内存：本进程尚未保存的修改保留，其余采用对方的内容
+
+        对方的文件不存在（被删除或损坏后已备份）时保留内存中的数据，下次保存时重新写出
+        """
+        if theirs is not None:
+            base_text = self._bases.get(key)
+            base = json.loads(base_text) if base_text is not None else None
+            current = self.data[key]
+            if key == "idols":
+                # 保存冲突时在事件循环中直接构建新快照（只在多进程同时修改时发生）
+                self._swap_idols(IdolIndex(merge_changes(base, current, theirs),
+                                           self.config.get("reply_templates")))
+            else:
+                self._replace_data(current, merge_changes(base, current, theirs))
+            if self._tracks_base(key):
+                self._bases[key] = json.dumps(theirs, ensure_ascii=False)
+            self._on_external_change(key)
+        self._versions[key] = version
+        self.metrics.incr(f"sync.{key}")
+
+    @staticmethod
+    def _replace_data(current, new):
+        """原地替换数据集内容，处理函数持有的引用仍然有效"""
+        if isinstance(current, list):
+            current[:] = new
+        else:
+            current.clear()
+            current.update(new)
+
+    def _on_external_change(self, key):
+        """其他进程修改了数据后，重建依赖它的索引（idols 的索引随快照一起替换）"""
+        if key == "checkins":
+            self._today = None  # 下次访问时由当天分区重建索引
+        elif key == "groups":
+            self._groups_rev += 1
+
+    async def sync(self):
+        """检查其他进程的修改：签到只读取新增的日志，其余数据集在版本戳变化时合并"""
+        for key in self.files:
+            if not self.data.is_loaded(key):
+                continue
+            if key == "checkins" and not self._tracks_base(key):
+                await self._sync_checkins()
+                continue
+            version = await self.run_io(self.storage.version, key)
+            if version == self._versions.get(key):
+                continue
+            if key == "idols":
+                # 其他进程或管理员手工编辑了 idols.json
+                await self._reload_idols()
+                continue
+            async with self._save_locks.setdefault(key, asyncio.Lock()):
+                theirs, version = await self.run_io(self.storage.load_versioned, key)
+                self._merge_external(key, theirs, version)
+
+    async def _sync_checkins(self):
+        version = await self.run_io(self.storage.version, "checkins")
+        if version == self._versions.get("checkins"):
+            if self.journal is None:
+                return
+            events = await asyncio.wrap_future(self.journal.read_new())
+            if events is not None:
+                checkins = self.data["checkins"]
+                for event in events:
+                    CheckinJournal.apply(checkins, event)
+                if events:
+                    self._today = None
+                return
+        # 签到快照被替换（日志被压缩过）或 SQLite 中有其他进程的签到：重新加载，
+        # 排在本进程已提交的写入之后；加载期间产生的本进程事件随后再应用一次
+        self._reload_events = []
+        try:
+            if self.journal is not None:
+                future = self.journal.submit(self._load_checkins_replayed)
+            else:
+                future = self.storage.submit_load("checkins")
+            checkins, version = await asyncio.wrap_future(future)
+            checkins = await self.run_io(compact_checkins, checkins or {},
+                                         datetime.date.today().isoformat(), self._idol_codes)
+            for event in self._reload_events:
+                CheckinJournal.apply(checkins, event)
+        finally:
+            self._reload_events = None
+        self._replace_data(self.data["checkins"], checkins)
+        self._versions["checkins"] = version
+        self._today = None
+        self.metrics.incr("sync.checkins")
+
+    def _load_checkins_replayed(self):
+        """在日志线程中读取签到快照并重放整个日志"""
+        checkins, version = self.storage.load_versioned("checkins")
+        checkins = checkins or {}
+        self.journal.replay(checkins)
+        return checkins, version
+
+    def _note_checkin_version(self, future):
+        """本进程的按行写入使签到版本号加一；期间有其他进程写入时保留旧值，下次同步时重新加载"""
+        version = future.result()
+        if version is not None and version == (self._versions.get("checkins") or 0) + 1:
+            self._versions["checkins"] = version
+
+    def start_sync(self):
+        """在事件循环中启动多进程同步任务（sync_interval 为 0 时不启动）"""
+        if self.sync_interval > 0 and self._sync_task is None:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logging.error(f"同步其他进程的数据失败: {e}")
+
+    # --- 异步接口（I/O 在线程池中执行） ---
+
+    async def run_io(self, func, *args):
+        """在 I/O 线程池中执行阻塞函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_pool, functools.partial(func, *args))
+
+    async def asave(self, key):
+        """异步保存：在事件循环中序列化快照，在线程池中写文件"""
+        if self._flush_task is not None:
+            self._dirty.add(key)
+            return
+        await self._awrite(key)
+
+    async def _awrite(self, key):
+        # 同一文件的写入按顺序进行，避免旧快照覆盖新快照
+        lock = self._save_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            self._dirty.discard(key)
+            t0 = time.perf_counter()
+            while True:
+                snapshot = self._dump(key)
+                base = self._base_text(key, snapshot)
+                expected = self._versions.get(key)
+                try:
+                    if self.storage.supports_events:
+                        # 与按行写入的事件排在同一队列，避免旧快照覆盖之后的签到
+                        written, version = await asyncio.wrap_future(
+                            self.storage.submit_write(key, snapshot, expected))
+                    else:
+                        written, version = await self.run_io(
+                            self.storage.write_versioned, key, snapshot, expected)
+                    break
+                except StaleVersion:
+                    # 其他进程写入过：合并后用新的版本戳重试
+                    theirs, version = await self.run_io(self.storage.load_versioned, key)
+                    self._merge_external(key, theirs, version)
+            self._committed(key, written, version, base)
+            self._record_save(key, t0, written)
+
+    async def aflush(self):
+        """异步写入所有脏数据"""
+        while self._dirty:
+            await self._awrite(next(iter(self._dirty)))
+
+    async def arandom_image(self, idol_name):
+        """异步版本的 get_random_image_path"""
+        return await self.run_io(self.get_random_image_path, idol_name)
+
+    def resolve_send_image(self, img_path):
+        """返回实际发送的图片路径（优先缩略图），图片不存在时返回 None"""
+        if self.derivatives is not None:
+            return self.derivatives.resolve(img_path)
+        return img_path if os.path.exists(img_path) else None
+
+    def send_image_settled(self, img_path):
+        """img_path 对应的发送路径是否已经确定（缩略图已生成或不需要），可以缓存"""
+        return self.derivatives is None or self.derivatives.settled(img_path)
+
+    async def aresolve_send_image(self, img_path):
+        """异步版本的 resolve_send_image"""
+        return await self.run_io(self.resolve_send_image, img_path)
+
+    async def apath_exists(self, path):
+        """异步版本的 os.path.exists"""
+        return await self.run_io(os.path.exists, path)
+
+    async def aadd_idol(self, name):
+        """异步版本的 add_idol：内存中登记后，在线程池中创建图片文件夹"""
+        folder_path = self._register_idol(name)
+        if folder_path:
+            await self.run_io(os.makedirs, folder_path, 0o777, True)
+            self.image_cache.invalidate(folder_path)
+
+    def start_flusher(self):
+        """在事件循环中启动后台落盘任务（save_interval 为 0 时不启动）"""
+        if self.save_interval > 0 and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def start_prewarm(self):
+        """在事件循环中启动图片清单预热（image_prewarm 关闭时不启动），不等待其完成"""
+        if self.image_prewarm and self._prewarm_task is None:
+            self._prewarm_task = asyncio.get_running_loop().create_task(self._prewarm_images())
+
+    async def _prewarm_images(self):
+        """
+        并发扫描所有小偶像的图片目录并建立图片清单，同时预先建立缩略图缓存的索引；
+        同时扫描的目录数不超过线程池的一半，留出线程处理正常请求。进度定期写入日志
+        """
+        folders = [self.get_image_folder(name) for name in list(self.data["idols"])]
+        total = len(folders)
+        t0 = last_report = time.perf_counter()
+        limit = asyncio.Semaphore(max(1, int(self.config.get("io_workers", 4)) // 2))
+        done = images = empty = 0
+
+        async def scan(folder):
+            nonlocal done, images, empty, last_report
+            async with limit:
+                paths = await self.run_io(self.image_cache.get, folder)
+            done += 1
+            images += len(paths)
+            empty += not paths
+            self.metrics.incr("image.prewarm.folders")
+            now = time.perf_counter()
+            if done < total and now - last_report >= PREWARM_REPORT_INTERVAL:
+                last_report = now
+                logging.info(f"图片清单预热中：{done}/{total} 位小偶像，已找到 {images} 张图片")
+
+        jobs = [scan(folder) for folder in folders]
+        if self.derivatives is not None:
+            jobs.append(self.run_io(self.derivatives.prewarm))
+        try:
+            await asyncio.gather(*jobs)
+        except Exception as e:
+            logging.error(f"图片清单预热失败: {e}")
+            return
+        elapsed = time.perf_counter() - t0
+        self.metrics.observe("image.prewarm", elapsed)
+        logging.info(f"图片清单预热完成：{total} 位小偶像，{images} 张图片"
+                     f"（{empty} 位没有图片），耗时 {elapsed:.1f} 秒")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.aflush()
+            except Exception as e:
+                logging.error(f"后台落盘失败: {e}")
+
+    async def close(self):
+        """停止后台落盘任务，写入剩余的脏数据并关闭线程池"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        if self._preload_task is not None:
+            await asyncio.gather(self._preload_task, return_exceptions=True)
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            await asyncio.gather(self._prewarm_task, return_exceptions=True)
+        if self._compact_task is not None:
+            await asyncio.gather(self._compact_task, return_exceptions=True)
+        if self._expire_task is not None:
+            await asyncio.gather(self._expire_task, return_exceptions=True)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+        await self.aflush()
+        if self.journal is not None:
+            await self.run_io(self.journal.close)
+        await self.run_io(self.storage.close)
+        if self.derivatives is not None:
+            self.derivatives.close()
+        self._io_pool.shutdown(wait=False)
 
     # --- 小偶像相关 ---
     
-    def get_real_name(self, name_or_nick):
-        """通过昵称查找真名，并对微博常见前缀做兜底匹配"""
-        idols = self.data.get("idols", {})
-        if name_or_nick in idols:
+    def _index_nickname(self, real_name, nickname):
+        """登记单个昵称；与原先线性查找一致，冲突时保留排序靠前的小偶像"""
+        owner = self.nick_index.get(nickname)
+        if owner is None or owner == real_name:
+            self.nick_index[nickname] = real_name
+            return
+        owner_order = self.matcher.idol_order(owner)
+        new_order = self.matcher.idol_order(real_name)
+        if owner_order is None or (new_order is not None and new_order < owner_order):
+            self.nick_index[nickname] = real_name
+
+    def _lookup_name(self, name_or_nick):
+        """精确查找：真名或已登记的昵称"""
+        if name_or_nick in self.data.get("idols", {}):
             return name_or_nick
-        for name, info in idols.items():
-            if name_or_nick in info.get("nicknames", []):
-                return name
+        return self.nick_index.get(name_or_nick)
+
+    def get_real_name(self, name_or_nick):
+        """通过昵称查找真名，并对微博常见前缀做兜底匹配（只做精确匹配，管理命令使用）"""
+        real_name = self._lookup_name(name_or_nick)
+        if real_name:
+            return real_name
         # 兜底：去掉可能的团队前缀（如 "gnz48-刘欣媛" -> "刘欣媛"）
         if "-" in name_or_nick:
             stripped = name_or_nick.split("-")[-1].strip()
-            if stripped in idols:
-                return stripped
-            for name, info in idols.items():
-                if stripped in info.get("nicknames", []):
-                    return name
+            return self._lookup_name(stripped)
         return None
 
-    def add_idol(self, name):
-        """注册一个小偶像并创建图片文件夹"""
+    def find_idol_fuzzy(self, name_or_nick, group_id=None):
+        """
+        模糊查找真名：精确查找失败后按归一化形式（全角、繁体、大小写、表情、拼音缩写）查找，
+        并去掉开头的团队名（如 "好想GNZ48 刘欣媛"）。只用于被动回复和 /xox 等只读场景；
+        给出群号时，不在该群小偶像名单中的视为找不到
+        """
+        real_name = self.get_real_name(name_or_nick) or self.index.lookup(name_or_nick)
+        if not real_name:
+            # 归一化后连字符已被去掉：去掉开头的团队名再查找
+            key = normalize(name_or_nick)
+            stripped = TEAM_PREFIX.sub("", key, count=1)
+            if stripped and stripped != key:
+                real_name = self._lookup_name(stripped) or self.index.lookup(stripped)
+        if real_name and group_id:
+            scope = self.group_scope(group_id)
+            if scope is not None and not scope.contains(real_name):
+                return None
+        return real_name
+
+    def _register_idol(self, name):
+        """在内存中登记小偶像，返回需要创建的图片文件夹；已存在或名称为空时返回 None"""
         if not name or not name.strip():
-            return  # 忽略空名称
+            return None  # 忽略空名称
         name = name.strip()
         idols = self.data.setdefault("idols", {})
-        if name not in idols:
-            # 默认信息字段，供 /xox 使用
-            idols[name] = {
-                "nicknames": [],
-                "info": "这个人很神秘，目前还没有公开资料，等待管理员补充。",
-                "catchphrases": {}  # 应援口号：{"触发句": "响应内容"}
-            }
-            self.save("idols")
-            # 自动创建图片文件夹：<name>/img/原创微博图片/
-            os.makedirs(os.path.join(self.img_dir, name, "img", "原创微博图片"), exist_ok=True)
-
-    def get_random_idol(self):
-        """随机获取一个已注册的小偶像名字"""
-        idols = list(self.data.get("idols", {}).keys())
-        return random.choice(idols) if idols else None
+        if name in idols:
+            return None
+        idols[name] = new_idol_record()
+        self.matcher.add_idol(name)
+        self.index.sampler.add(name, idol_weight(idols[name]))
+        self.index.add_name_forms(name, [name], FORM_NAME)
+        self._idols_changed()
+        # 图片文件夹：<name>/img/原创微博图片/
+        return self.get_image_folder(name)
+
+    def add_idol(self, name):
+        """注册一个小偶像并创建图片文件夹"""
+        folder_path = self._register_idol(name)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+            self.image_cache.invalidate(folder_path)
+
+    def add_nickname(self, real_name, nickname):
+        """为小偶像添加昵称，返回是否为新增"""
+        nicknames = self.data["idols"][real_name].setdefault("nicknames", [])
+        if nickname in nicknames:
+            return False
+        nicknames.append(nickname)
+        self._index_nickname(real_name, nickname)
+        self.index.add_name_forms(real_name, [nickname])
+        self._idols_changed()
+        return True
+
+    def add_catchphrase(self, real_name, trigger, response):
+        """为小偶像设置应援口号，并同步更新口号自动机"""
+        idols = self.data.setdefault("idols", {})
+        idols[real_name].setdefault("catchphrases", {})[trigger] = response
+        self.matcher.add(real_name, trigger)
+        self.templates.invalidate(real_name, trigger)
+        self._idols_changed()
+
+    def remove_idol(self, real_name):
+        """删除小偶像记录（不删除图片目录），并同步更新口号自动机"""
+        idols = self.data.get("idols", {})
+        if real_name not in idols:
+            return False
+        removed = idols.pop(real_name)
+        self.matcher.remove_idol(real_name)
+        self.index.sampler.remove(real_name)
+        self.templates.invalidate(real_name)
+        # 被删除小偶像的昵称可能仍属于其他小偶像，按原顺序重新找归属
+        for nick in removed.get("nicknames", []):
+            if self.nick_index.get(nick) != real_name:
+                continue
+            del self.nick_index[nick]
+            for name, info in idols.items():
+                if nick in info.get("nicknames", []):
+                    self.nick_index[nick] = name
+                    break
+        self.index.remove_name_forms(real_name)
+        self._idols_changed()
+        return True
+
+    def _apply_bundle(self, bundle):
+        """
+        在内存中应用导入的数据包：先在副本上合并并整体校验，通过后一次性替换 idols 快照并只保存一次
+        返回 (统计, 需要创建的图片文件夹)；校验失败时抛出 ValueError，当前数据不受影响
+        """
+        merged, summary = merge_bundle(self.data["idols"], bundle)
+        validate_idols(merged)
+        self._swap_idols(IdolIndex(merged, self.config.get("reply_templates")))
+        self._idols_changed()
+        return summary, [self.get_image_folder(name) for name in summary["added"]]
+
+    def _make_image_folders(self, folders):
+        for folder in folders:
+            os.makedirs(folder, exist_ok=True)
+
+    def import_idols(self, bundle):
+        """批量导入小偶像、昵称和应援口号，返回统计"""
+        summary, folders = self._apply_bundle(bundle)
+        self._make_image_folders(folders)
+        for folder in folders:
+            self.image_cache.invalidate(folder)
+        return summary
+
+    async def aimport_idols(self, bundle):
+        """异步版本的 import_idols：图片文件夹在线程池中一次性创建"""
+        summary, folders = self._apply_bundle(bundle)
+        await self.run_io(self._make_image_folders, folders)
+        for folder in folders:
+            self.image_cache.invalidate(folder)
+        return summary
+
+    async def aexport_idols(self, path, fmt="json"):
+        """把当前 idols 导出为 JSON / CSV 文件，返回导出的小偶像数"""
+        idols = self.data["idols"]
+        text = export_bundle(idols, fmt)
+        await self.run_io(self._write_export, path, text)
+        return len(idols)
+
+    @staticmethod
+    def _write_export(path, text):
+        if not atomic_write_text(os.path.abspath(path), text):
+            raise OSError(f"无法写入 {path}")
+
+    def get_random_idol(self, group_id=None):
+        """
+        按权重随机抽取一个已注册的小偶像名字，没有小偶像时返回 None
+
+        配置过的群只在本群的小偶像名单中抽取。
+        开启 checkin_distinct_idols 时尽量不与今天已分配的重复：
+        配置过的群和私聊按今天所在分区的签到结果计算（持久化，重启后不变），分完后允许重复；
+        未配置的群与其他群共用全局分区，按内存中记录的本群分配情况计算，全部分完后开始新一轮
+        """
+        scope = self.group_scope(group_id)
+        sampler = self.index.sampler if scope is None else scope.sampler
+        if not self.checkin_distinct:
+            return sampler.draw()
+        if not group_id or scope is not None:
+            taken = self._taken_for(self._partition_key(group_id))
+            return sampler.draw(exclude=taken) or sampler.draw()
+        taken = self._group_allocation(group_id)
+        idol = sampler.draw(exclude=taken)
+        if idol is None:
+            taken.clear()  # 本群已分完，开始新一轮
+            idol = sampler.draw()
+        return idol
+
+    def _group_allocation(self, group_id):
+        """未配置的群今天本轮已分配的小偶像集合，跨天时清空"""
+        today = self._roll_day()
+        if self._group_taken_day != today:
+            self._group_taken = {}
+            self._group_taken_day = today
+        return self._group_taken.setdefault(group_id, set())
+
+    # --- 群组相关 ---
+
+    def group_scope(self, group_id):
+        """群的作用域；私聊和没有配置的群返回 None，使用全局的小偶像名单和签到分区"""
+        if not group_id:
+            return None
+        key = (self.index, self._idols_rev, self._groups_rev)
+        if key != self._scope_key:
+            # idols 快照被替换、被管理命令修改或群配置变化：各群在下次使用时重新构建
+            self._scopes = {}
+            self._scope_key = key
+        try:
+            return self._scopes[group_id]
+        except KeyError:
+            pass
+        conf = self.data["groups"].get(group_id)
+        scope = self._scopes[group_id] = GroupScope(group_id, conf, self.index) if isinstance(conf, dict) else None
+        return scope
+
+    def get_group(self, group_id):
+        """群的配置，没有配置时返回 None"""
+        return self.data["groups"].get(group_id)
+
+    def set_group(self, group_id, conf):
+        """保存群的配置；conf 为 None 时删除配置（该群恢复使用全局名单和签到分区），返回是否有修改"""
+        groups = self.data["groups"]
+        if conf is None:
+            if groups.pop(group_id, None) is None:
+                return False
+        else:
+            validate_group(conf)
+            groups[group_id] = conf
+        self._groups_rev += 1
+        self.save("groups")
+        return True
+
+    def group_checkin_count(self, group_id=None):
+        """今天在该群（没有配置的群为全局）签到的人数"""
+        return len(self.data["checkins"].get(self._partition_key(group_id), {}))
+
+    # --- 签到相关 ---
+
+    def _roll_day(self):
+        """返回当天日期；跨天时切换到新一天的分区并清理过期分区"""
+        today = datetime.date.today().isoformat()
+        if self._today == today:
+            return today
+        self._compact_history(today)
+        # 当天分区通常很小，各分区的索引在第一次访问时由分区重建
+        self._taken = {}
+        self._today = today
+        self._expire_partitions(today)
+        return today
+
+    def _partition_key(self, group_id=None):
+        """当天签到分区的键：配置过的群使用独立分区，其余使用全局分区"""
+        today = self._roll_day()
+        if group_id and self.group_scope(group_id) is not None:
+            return partition_key(today, group_id)
+        return today
+
+    def today_partition(self, group_id=None):
+        """当天签到分区的键（与签到记录使用同一个日期，跨天时先切换分区），可用于组合按天缓存的键"""
+        return self._partition_key(group_id)
+
+    def _taken_for(self, key):
+        """分区的 小偶像 -> 签到用户ID集合 索引；没有用户的小偶像不出现在索引中"""
+        taken = self._taken.get(key)
+        if taken is None:
+            taken = self._taken[key] = {}
+            for uid, idol in self.data["checkins"].get(key, {}).items():
+                taken.setdefault(idol, set()).add(uid)
+        return taken
+
+    def _compact_history(self, today):
+        """压缩变成历史的分区（通常只有前一天的）：在事件循环中时交给线程池，否则立即压缩"""
+        checkins = self.data["checkins"]
+        pending = [(date, part) for date, part in checkins.items()
+                   if date < today and not isinstance(part, FrozenPartition)]
+        if not pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            compact_checkins(checkins, today, self._idol_codes)
+            return
+        if self._compact_task is None or self._compact_task.done():
+            self._compact_task = loop.create_task(self._acompact_partitions(pending))
+
+    async def _acompact_partitions(self, pending):
+        for date, part in pending:
+            snapshot = dict(part)
+            frozen = await self.run_io(FrozenPartition, snapshot, self._idol_codes)
+            checkins = self.data["checkins"]
+            # 压缩期间分区被修改或整体替换时放弃，下次跨天或重新加载时再压缩
+            if checkins.get(date) is part and part == snapshot:
+                checkins[date] = frozen
+
+    def _expire_partitions(self, today):
+        """删除超出保留天数的分区（每天最多执行一次），启用归档时先追加到归档文件（归档失败时保留分区，下次跨天再试）"""
+        if self.checkin_retention_days <= 0:
+            return
+        cutoff = (datetime.date.fromisoformat(today)
+                  - datetime.timedelta(days=self.checkin_retention_days)).isoformat()
+        checkins = self.data["checkins"]
+        expired = [(d, checkins[d]) for d in sorted(d for d in checkins if d < cutoff)]
+        if not expired:
+            return
+        if not self.checkin_archive:
+            self._drop_partitions(expired, cutoff)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._archive_partitions(expired):
+                self._drop_partitions(expired, cutoff)
+            return
+        # 在事件循环中时，序列化和追加写入交给线程池，写入成功后再删除分区
+        if self._expire_task is None or self._expire_task.done():
+            self._expire_task = loop.create_task(self._aexpire_partitions(expired, cutoff))
+
+    async def _aexpire_partitions(self, expired, cutoff):
+        if await self.run_io(self._archive_partitions, expired):
+            self._drop_partitions(expired, cutoff)
+
+    def _drop_partitions(self, expired, cutoff):
+        """删除已归档的过期分区并记录过期事件；归档期间分区被替换（同步了其他进程的数据）时放弃，之后重试"""
+        checkins = self.data["checkins"]
+        if any(checkins.get(date) is not part for date, part in expired):
+            return
+        for date, _ in expired:
+            del checkins[date]
+        self._record_checkin_event(CheckinJournal.expire_event(cutoff))
+
+    def _archive_partitions(self, partitions):
+        """
+        把分区（按分区键排序）按行追加到归档文件，返回是否成功（在事件循环中运行时由线程池调用）
+
+        多个进程共用 data 目录时，各进程跨天时都会发现同一批过期分区：
+        在存储锁内先读取归档文件末尾，已经由其他进程归档的分区不再重复写入
+        """
+        try:
+            with self.storage.lock:
+                archived = self._archived_keys(partitions[0][0])
+                with open(self.archive_file, 'a', encoding='utf-8') as f:
+                    for date, part in partitions:
+                        if date in archived:
+                            continue
+                        f.write(json.dumps({"date": date, "checkins": part}, ensure_ascii=False,
+                                           default=json_default) + "\n")
+            return True
+        except (IOError, OSError) as e:
+            logging.error(f"归档签到记录失败: {e}")
+            return False
+
+    def _archived_keys(self, since):
+        """
+        归档文件末尾分区键不早于 since 的分区键集合
+
+        过期分区按分区键顺序追加，从文件末尾逐行向前读取行首，遇到更早的分区即停止，
+        不需要读取整个归档文件
+        """
+        keys = set()
+        try:
+            f = open(self.archive_file, 'rb')
+        except FileNotFoundError:
+            return keys
+        with f:
+            for start in self._line_starts_backwards(f):
+                f.seek(start)
+                match = ARCHIVE_KEY.match(f.read(256))
+                if match is None:
+                    continue
+                key = json.loads(match.group(1))
+                if key < since:
+                    break
+                keys.add(key)
+        return keys
+
+    @staticmethod
+    def _line_starts_backwards(f, block=1 << 16):
+        """从文件末尾向前依次返回各个非空行的起始位置"""
+        pos = line_end = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            size = min(block, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size)
+            i = len(chunk)
+            while True:
+                i = chunk.rfind(b"\n", 0, i)
+                if i < 0:
+                    break
+                if pos + i + 1 < line_end:
+                    yield pos + i + 1
+                line_end = pos + i
+        if line_end > 0:
+            yield 0
+
+    def has_checked_in(self, user_id, group_id=None):
+        """用户今天是否已经签到（配置过的群只看本群的签到）"""
+        return user_id in self.data["checkins"].get(self._partition_key(group_id), {})
+
+    def get_today_idol(self, user_id, group_id=None):
+        """获取用户今天签到分配的小偶像，未签到返回 None"""
+        return self.data["checkins"].get(self._partition_key(group_id), {}).get(user_id)
+
+    def checkin(self, user_id, idol_name, group_id=None):
+        """记录用户今天的签到结果；未配置的群同时记入该群本轮已分配的小偶像"""
+        key = self._partition_key(group_id)
+        partition = self.data["checkins"].setdefault(key, {})
+        taken = self._taken_for(key)
+        if user_id in partition:
+            self._untake(taken, partition[user_id], user_id)
+        partition[user_id] = idol_name
+        taken.setdefault(idol_name, set()).add(user_id)
+        if group_id and self.checkin_distinct and key == self._today:  # 未配置的群（使用全局分区）
+            self._group_allocation(group_id).add(idol_name)
+        self._record_checkin_event(CheckinJournal.checkin_event(user_id, key, idol_name))
+
+    def _record_checkin_event(self, event):
+        """持久化一次签到数据变更：SQLite 按行写入；JSON 写入签到日志，未启用日志时保存整个 checkins"""
+        self.metrics.incr(f"checkins.{event['op']}")
+        if self._reload_events is not None:
+            self._reload_events.append(event)
+        if self.storage.supports_events:
+            self.storage.apply_event(event).add_done_callback(self._note_checkin_version)
+            return
+        if self.journal is None:
+            self.save("checkins")
+            return
+        self.journal.append(event)
+        if self.journal.entries >= self.journal_compact_threshold:
+            # 在后台把日志折叠进快照
+            self.journal.compact(self._load_checkins_snapshot, self._write_checkins)
+
+    @staticmethod
+    def _untake(taken, idol_name, user_id):
+        """从分区索引中移除一次签到；没有用户时删除该项，索引的键即为今天已被签到的小偶像"""
+        holders = taken.get(idol_name)
+        if holders is not None:
+            holders.discard(user_id)
+            if not holders:
+                del taken[idol_name]
+
+    def is_idol_taken(self, idol_name, exclude_user=None, group_id=None):
+        """检查小偶像今天是否已被（除 exclude_user 外的）其他用户签到（配置过的群只看本群的签到）"""
+        holders = self._taken_for(self._partition_key(group_id)).get(idol_name)
+        if not holders:
+            return False
+        return len(holders) > 1 or exclude_user not in holders
+
+    def reset_today(self, group_id=None):
+        """
+        清除今天所有用户的签到记录（直接丢弃当天分区），返回被清除的用户数量；
+        配置过的群只清除本群的分区，其余清除全局分区
+        """
+        key = self._partition_key(group_id)
+        partition = self.data["checkins"].pop(key, {})
+        self._taken.pop(key, None)
+        if key == self._today:
+            self._group_taken = {}  # 未配置的群共用全局分区，分配情况一起清空
+        self._record_checkin_event(CheckinJournal.reset_event(key))
+        return len(partition)
 
     # --- 图片相关 ---
 
+    def get_image_folder(self, idol_name):
+        """小偶像图片目录：<img_dir>/<idol_name>/img/原创微博图片/"""
+        return os.path.join(self.img_dir, idol_name, "img", "原创微博图片")
+
     def get_random_image_path(self, idol_name):
         """
         从 plugin_data/astrbot_plugin_xox/<idol_name>/img/原创微博图片/ 目录下随机获取一张图片路径
         """
-        folder_path = os.path.join(self.img_dir, idol_name, "img", "原创微博图片")
-        
-        if not os.path.exists(folder_path):
-            return None
-        
-        try:
-            # 筛选图片文件，使用配置的图片格式
-            images = [f for f in os.listdir(folder_path) 
-                     if any(f.lower().endswith(fmt.lower()) for fmt in self.image_formats)]
-            
-            if not images:
-                return None
-                
-            return os.path.join(folder_path, random.choice(images))
-        except (OSError, PermissionError) as e:
-            # 处理权限错误或目录访问错误
-            logging.error(f"访问图片目录 {folder_path} 失败: {e}")
-            return None
-    
\ No newline at end of file
+        t0 = time.perf_counter()
+        img_path = self.image_cache.pick(self.get_image_folder(idol_name))
+        self.metrics.observe("image.pick", time.perf_counter() - t0)
+        return img_path
@@ -0,0 +1,85 @@
+"""
+刷屏限流模块
+
+负责：
+- 对被动触发（应援口号、好想宝宝、好想XXX）的回复按用户、按群分别限流
+- 超出频率的触发直接丢弃，不再查找图片、上传图片，发送队列不会被刷屏拖垮
+
+每个键的令牌桶只保存一个浮点数：桶"重新装满"的时刻（GCRA 算法，与令牌桶等价），
+时刻已过的键即为满桶，可以随时删除；按最近使用顺序保存，清理时只需检查最旧的几个键
+"""
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """按键限流的令牌桶：平均每秒 rate 次，最多连续 burst 次"""
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.interval = 1.0 / rate        # 每个令牌的补充时间
+        self.capacity = burst * self.interval
+        self.max_keys = max_keys
+        self._full_at = OrderedDict()     # 键 -> 桶重新装满的时刻，按最近使用排序
+
+    def __len__(self):
+        return len(self._full_at)
+
+    def check(self, key, now):
+        """是否还有令牌（不消耗）"""
+        return self._full_at.get(key, now) - now + self.interval <= self.capacity + 1e-9
+
+    def consume(self, key, now):
+        """消耗一个令牌（调用前应先 check）"""
+        full_at = self._full_at.pop(key, now)
+        self._full_at[key] = max(full_at, now) + self.interval
+        self._expire(now)
+
+    def allow(self, key, now=None):
+        """有令牌时消耗一个并返回 True，否则返回 False"""
+        now = time.monotonic() if now is None else now
+        if not self.check(key, now):
+            return False
+        self.consume(key, now)
+        return True
+
+    def _expire(self, now):
+        """删除已经装满（长时间空闲）的键；键过多时淘汰最久未使用的键"""
+        buckets = self._full_at
+        while buckets:
+            full_at = next(iter(buckets.values()))
+            if full_at > now and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+
+class FloodControl:
+    """按用户、按群两级限流：两者都有令牌时才放行，并同时消耗"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        # 默认关闭：开启后繁忙群里的部分被动回复会被丢弃，需要管理员主动选择
+        self.enabled = bool(config.get("flood_control", False))
+        self.users = self._limiter(config.get("flood_user_per_minute", 6), config.get("flood_user_burst", 3))
+        self.groups = self._limiter(config.get("flood_group_per_minute", 20), config.get("flood_group_burst", 5))
+
+    @staticmethod
+    def _limiter(per_minute, burst):
+        """每分钟次数不大于 0 时不限制这一级"""
+        per_minute = float(per_minute)
+        if per_minute <= 0:
+            return None
+        return TokenBucketLimiter(per_minute / 60, max(int(burst), 1))
+
+    def allow(self, user_id, group_id=None):
+        if not self.enabled:
+            return True
+        now = time.monotonic()
+        levels = [(self.users, user_id)]
+        if group_id:
+            levels.append((self.groups, group_id))
+        levels = [(limiter, key) for limiter, key in levels if limiter is not None]
+        if not all(limiter.check(key, now) for limiter, key in levels):
+            return False
+        for limiter, key in levels:
+            limiter.consume(key, now)
+        return True
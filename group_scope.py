@@ -0,0 +1,56 @@
+"""
+群组作用域模块
+
+负责：
+- 解析 groups.json 中各群的配置：{"群号": {"idols": [小偶像名字...], "catchphrase": true}}
+  - idols：本群的小偶像名单（签到只抽取名单内的小偶像，只响应名单内小偶像的应援口号），缺省为全部小偶像
+  - catchphrase：本群是否响应应援口号、好想宝宝等被动回复，缺省为 true
+- 为配置过的群构建独立的查找结构（应援口号自动机、签到抽取表），一条消息只与本群的触发句匹配
+- 配置过的群的签到保存在独立的分区 "YYYY-MM-DD@群号" 中，与全局分区一样按天压缩、过期和归档
+
+没有配置的群和私聊仍使用全局的小偶像名单和签到分区
+"""
+from .catchphrase_matcher import CatchphraseMatcher
+from .idol_sampler import IdolSampler
+from .text_normalize import normalize
+
+
+def partition_key(date, group_id=None):
+    """签到分区的键：全局分区为日期，配置过的群为 "日期@群号"（按字符串比较时与日期的先后顺序一致）"""
+    return f"{date}@{group_id}" if group_id else date
+
+
+def validate_group(conf):
+    """检查单个群的配置，不合法时抛出 ValueError"""
+    if not isinstance(conf, dict):
+        raise ValueError("群配置必须是对象")
+    idols = conf.get("idols")
+    if idols is not None and (not isinstance(idols, list) or not all(isinstance(n, str) for n in idols)):
+        raise ValueError("idols 必须是小偶像名字数组")
+    if not isinstance(conf.get("catchphrase", True), bool):
+        raise ValueError("catchphrase 必须是 true 或 false")
+
+
+class GroupScope:
+    """某个群在某一版本的 idols 数据下的作用域"""
+
+    def __init__(self, group_id, conf, index):
+        self.group_id = group_id
+        self.catchphrase = conf.get("catchphrase", True) is not False
+        pool = conf.get("idols")
+        if not pool or not isinstance(pool, list):
+            # 不限名单：直接共用全局快照中的结构，管理命令对它们的增量更新也同时生效
+            self.names = None
+            self.matcher = index.matcher
+            self.sampler = index.sampler
+            return
+        # 按全局 idols 的顺序取子集，应援口号的优先顺序与全局一致；已删除的小偶像自动忽略
+        wanted = set(pool)
+        idols = {name: info for name, info in index.idols.items() if name in wanted}
+        self.names = frozenset(idols)
+        self.matcher = CatchphraseMatcher(idols, normalize)
+        self.sampler = IdolSampler(idols)
+
+    def contains(self, idol_name):
+        """小偶像是否在本群的名单中"""
+        return self.names is None or idol_name in self.names
@@ -0,0 +1,248 @@
+"""
+小偶像批量导入 / 导出模块
+
+负责：
+- 解析 JSON 或 CSV 格式的小偶像数据包（名字、昵称、简介、签到权重、应援口号、思念回复模板）
+- 把数据包合并进 idols 数据（在副本上合并，由 DataManager 校验后整体替换并只写入一次）
+- 把 idols 数据导出为同样的格式
+- 命令行入口：在插件目录的上一级执行
+    python -m astrbot_plugin_xox.idol_bundle import 新成员.csv
+    python -m astrbot_plugin_xox.idol_bundle export idols.csv
+
+JSON 数据包与 data/idols.json 格式相同；CSV 数据包第一行为表头 name,field,key,value，之后每行一项：
+- name：小偶像名字
+- field：nickname / info / weight / catchphrase / miss / miss_today / miss_other，留空表示只登记小偶像
+- key：catchphrase 的触发句，其余类型留空
+- value：昵称 / 简介 / 签到权重 / 回复内容；同一触发句（或同一类思念回复）的多行组成回复模板数组
+"""
+import os
+import io
+import csv
+import json
+import asyncio
+import argparse
+
+from .idol_index import new_idol_record, validate_idols
+
+CSV_FIELDS = ["name", "field", "key", "value"]
+MISS_FIELDS = ("miss", "miss_today", "miss_other")
+
+
+def detect_format(text, path=None):
+    """按扩展名或内容判断数据包格式"""
+    if path:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".json", ".csv"):
+            return ext[1:]
+    return "json" if text.lstrip().startswith("{") else "csv"
+
+
+def parse_bundle(text, fmt=None):
+    """解析数据包文本为 {名字: 记录}，格式不合法时抛出 ValueError"""
+    fmt = fmt or detect_format(text)
+    if fmt == "json":
+        bundle = json.loads(text)
+    elif fmt == "csv":
+        bundle = _parse_csv(text)
+    else:
+        raise ValueError(f"不支持的格式：{fmt}")
+    validate_idols(bundle)
+    if not bundle:
+        raise ValueError("数据包中没有小偶像")
+    return bundle
+
+
+def load_bundle(path):
+    """读取并解析数据包文件（在线程池中调用）"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    return parse_bundle(text, detect_format(text, path))
+
+
+def _parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or [f.strip() for f in reader.fieldnames] != CSV_FIELDS:
+        raise ValueError(f"CSV 表头必须是 {','.join(CSV_FIELDS)}")
+    bundle = {}
+    for row in reader:
+        line = reader.line_num
+        name = (row["name"] or "").strip()
+        field = (row["field"] or "").strip().lower()
+        key = (row["key"] or "").strip()
+        value = (row["value"] or "").strip()
+        if not name:
+            raise ValueError(f"第 {line} 行：name 不能为空")
+        record = bundle.setdefault(name, {})
+        if not field:
+            continue
+        if field != "catchphrase" and key:
+            raise ValueError(f"第 {line} 行：只有 catchphrase 需要填写 key")
+        if not value:
+            raise ValueError(f"第 {line} 行：value 不能为空")
+        if field == "nickname":
+            nicknames = record.setdefault("nicknames", [])
+            if value not in nicknames:
+                nicknames.append(value)
+        elif field == "info":
+            record["info"] = value
+        elif field == "weight":
+            try:
+                record["weight"] = float(value)
+            except ValueError:
+                raise ValueError(f"第 {line} 行：weight 必须是数字") from None
+        elif field == "catchphrase":
+            if not key:
+                raise ValueError(f"第 {line} 行：catchphrase 的 key（触发句）不能为空")
+            catchphrases = record.setdefault("catchphrases", {})
+            _append_template(catchphrases, key, value)
+        elif field in MISS_FIELDS:
+            if field == "miss":
+                templates = record.setdefault("miss_templates", [])
+                if not isinstance(templates, list):
+                    raise ValueError(f"第 {line} 行：miss 不能与 miss_today / miss_other 混用")
+                templates.append(value)
+            else:
+                templates = record.setdefault("miss_templates", {})
+                if not isinstance(templates, dict):
+                    raise ValueError(f"第 {line} 行：miss 不能与 miss_today / miss_other 混用")
+                templates.setdefault(field, []).append(value)
+        else:
+            raise ValueError(f"第 {line} 行：未知的 field：{field}")
+    return bundle
+
+
+def _append_template(catchphrases, trigger, response):
+    """同一触发句出现多次时，回复由字符串变为模板数组"""
+    current = catchphrases.get(trigger)
+    if current is None:
+        catchphrases[trigger] = response
+    elif isinstance(current, list):
+        current.append(response)
+    else:
+        catchphrases[trigger] = [current, response]
+
+
+def merge_bundle(idols, bundle):
+    """
+    把数据包合并进 idols 的副本，返回 (新的 idols, 统计)；不修改传入的 idols
+
+    已有的小偶像：追加新昵称，覆盖数据包中给出的简介、签到权重、应援口号（按触发句）和思念回复模板；
+    新的小偶像按默认记录登记后再合并
+    """
+    merged = json.loads(json.dumps(idols, ensure_ascii=False))
+    summary = {"added": [], "nicknames": 0, "catchphrases": 0}
+    for name, record in bundle.items():
+        name = name.strip()
+        info = merged.get(name)
+        if info is None:
+            info = merged[name] = new_idol_record()
+            summary["added"].append(name)
+        nicknames = info.setdefault("nicknames", [])
+        for nick in record.get("nicknames", []):
+            if nick not in nicknames:
+                nicknames.append(nick)
+                summary["nicknames"] += 1
+        if "info" in record:
+            info["info"] = record["info"]
+        if "weight" in record:
+            info["weight"] = record["weight"]
+        catchphrases = record.get("catchphrases", {})
+        info.setdefault("catchphrases", {}).update(catchphrases)
+        summary["catchphrases"] += len(catchphrases)
+        if "miss_templates" in record:
+            info["miss_templates"] = record["miss_templates"]
+    return merged, summary
+
+
+def export_bundle(idols, fmt="json"):
+    """把 idols 数据导出为数据包文本"""
+    if fmt == "json":
+        return json.dumps(idols, ensure_ascii=False, indent=2)
+    if fmt != "csv":
+        raise ValueError(f"不支持的格式：{fmt}")
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(CSV_FIELDS)
+    for name, info in idols.items():
+        rows = [("nickname", "", nick) for nick in info.get("nicknames", [])]
+        if info.get("info"):
+            rows.append(("info", "", info["info"]))
+        if "weight" in info:
+            rows.append(("weight", "", f"{info['weight']:g}"))
+        for trigger, response in info.get("catchphrases", {}).items():
+            for template in (response if isinstance(response, list) else [response]):
+                rows.append(("catchphrase", trigger, template))
+        miss_templates = info.get("miss_templates")
+        if isinstance(miss_templates, list):
+            rows.extend(("miss", "", t) for t in miss_templates)
+        elif isinstance(miss_templates, dict):
+            for field in ("miss_today", "miss_other"):
+                rows.extend((field, "", t) for t in miss_templates.get(field, []))
+        if not rows:
+            rows.append(("", "", ""))
+        for field, key, value in rows:
+            writer.writerow([name, field, key, value])
+    return out.getvalue()
+
+
+# --- 命令行入口 ---
+
+def _default_paths():
+    """与 main.py 相同的目录约定：返回 (插件目录, 图片目录, AstrBot 保存的插件配置文件)"""
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    plugin_name = os.path.basename(plugin_dir)
+    data_dir = os.path.dirname(os.path.dirname(plugin_dir))
+    return (plugin_dir,
+            os.path.join(data_dir, "plugin_data", plugin_name),
+            os.path.join(data_dir, "config", f"{plugin_name}_config.json"))
+
+
+async def _run_cli(args):
+    from .data_manager import DataManager
+
+    plugin_dir, img_dir, config_path = _default_paths()
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8-sig') as f:
+            config = json.load(f)
+    if args.storage:
+        config["storage_backend"] = args.storage
+    config.update(image_resize_enabled=False, save_interval=0)
+    db = DataManager(args.plugin_dir or plugin_dir, args.img_dir or img_dir, config)
+    try:
+        if args.action == "import":
+            bundle = await db.run_io(load_bundle, args.path)
+            summary = await db.aimport_idols(bundle)
+            print(format_summary(summary))
+        else:
+            fmt = "csv" if args.path.lower().endswith(".csv") else "json"
+            count = await db.aexport_idols(args.path, fmt)
+            print(f"已导出 {count} 位小偶像到 {args.path}")
+    finally:
+        await db.close()
+
+
+def format_summary(summary):
+    added = summary["added"]
+    msg = f"新增小偶像 {len(added)} 位，新增昵称 {summary['nicknames']} 个，设置应援口号 {summary['catchphrases']} 条"
+    if added:
+        msg += "\n新增：" + "、".join(added)
+    return msg
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入 / 导出小偶像数据（JSON 或 CSV）")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path", help="数据包文件路径；导出时按扩展名选择格式")
+    parser.add_argument("--storage", choices=["json", "sqlite"], help="存储后端，默认读取插件配置")
+    parser.add_argument("--plugin-dir", help="插件目录（其中的 data/ 为数据目录）")
+    parser.add_argument("--img-dir", help="图片目录，默认为 AstrBot 的 plugin_data/<插件名>")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_run_cli(args))
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"失败：{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+小偶像索引快照模块
+
+负责：
+- 把 idols 数据与由它派生的查找结构（应援口号自动机、回复模板、昵称反向索引、归一化名字索引、签到抽取表）打包为一个快照
+- 热重载时在线程池中校验新数据并构建新快照，构建完成后由 DataManager 一次性替换，
+  处理函数在任意时刻看到的都是同一版本的数据与索引
+
+快照替换后不会再被重载流程修改；管理命令（/add、/del_idol 等）仍在事件循环中原地增量更新当前快照
+"""
+from bisect import insort
+
+from .catchphrase_matcher import CatchphraseMatcher
+from .idol_sampler import IdolSampler
+from .reply_templates import ReplyTemplates
+from .text_normalize import normalize, pinyin_keys
+
+# 模糊查找时各类形式的优先级：真名 > 昵称 > 拼音
+FORM_NAME, FORM_NICKNAME, FORM_PINYIN = 0, 1, 2
+
+# 新登记的小偶像的默认简介，供 /xox 使用
+DEFAULT_IDOL_INFO = "这个人很神秘，目前还没有公开资料，等待管理员补充。"
+
+
+def new_idol_record():
+    """新小偶像的默认记录"""
+    return {
+        "nicknames": [],
+        "info": DEFAULT_IDOL_INFO,
+        "catchphrases": {}  # 应援口号：{"触发句": "响应内容"}
+    }
+
+
+def validate_idols(idols):
+    """检查 idols 数据的结构，不合法时抛出 ValueError（说明具体是哪一项）"""
+    if not isinstance(idols, dict):
+        raise ValueError("顶层必须是以小偶像名字为键的对象")
+    for name, info in idols.items():
+        if not name.strip():
+            raise ValueError("小偶像名字不能为空")
+        if not isinstance(info, dict):
+            raise ValueError(f"{name}: 必须是对象")
+        nicknames = info.get("nicknames", [])
+        if not isinstance(nicknames, list) or not all(isinstance(n, str) for n in nicknames):
+            raise ValueError(f"{name}: nicknames 必须是字符串数组")
+        if not isinstance(info.get("info", ""), str):
+            raise ValueError(f"{name}: info 必须是字符串")
+        catchphrases = info.get("catchphrases", {})
+        if not isinstance(catchphrases, dict):
+            raise ValueError(f"{name}: catchphrases 必须是对象")
+        for trigger, response in catchphrases.items():
+            if not trigger:
+                raise ValueError(f"{name}: 应援口号的触发句不能为空")
+            if isinstance(response, list):
+                if not all(isinstance(r, str) for r in response):
+                    raise ValueError(f"{name}: 应援口号 '{trigger}' 的回复模板必须是字符串")
+            elif not isinstance(response, str):
+                raise ValueError(f"{name}: 应援口号 '{trigger}' 的回复必须是字符串或字符串数组")
+        weight = info.get("weight", 1)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not 0 <= weight < float("inf"):
+            raise ValueError(f"{name}: weight 必须是非负数")
+        miss_templates = info.get("miss_templates")
+        if miss_templates is not None and not isinstance(miss_templates, (list, dict)):
+            raise ValueError(f"{name}: miss_templates 必须是数组或对象")
+
+
+class IdolIndex:
+    """某一版本的 idols 数据及其派生查找结构"""
+
+    def __init__(self, idols, config_templates=None):
+        self.idols = idols
+        # 应援口号自动机（按归一化后的触发句匹配），随 idols 的增删增量更新
+        self.matcher = CatchphraseMatcher(idols, normalize)
+        # 预编译的回复模板，响应内容变化时按条失效
+        self.templates = ReplyTemplates(config_templates)
+        self.templates.rebuild(idols)
+        # 昵称 -> 真名 反向索引（同一昵称归属排在前面的小偶像）
+        self.nick_index = {}
+        for name, info in idols.items():
+            for nick in info.get("nicknames", []):
+                self.nick_index.setdefault(nick, name)
+        self.rebuild_name_index()
+        # 签到抽取：按 weight 加权的别名表，随 idols 的增删增量更新
+        self.sampler = IdolSampler(idols)
+
+    def rebuild_name_index(self):
+        """
+        构建 归一化名字 -> 真名 索引，供精确查找失败后的模糊查找：
+        真名优先于昵称，昵称优先于拼音全拼和首字母；同类形式归属排序靠前的小偶像
+        """
+        idols = self.idols
+        self.name_index = {}
+        self._name_owners = {}  # 形式 -> 拥有该形式的 (类别, 小偶像序号, 小偶像)，有序，第一个即 name_index 中的归属
+        self._name_forms = {}   # 小偶像 -> 它的全部形式
+        for name, info in idols.items():
+            self.add_name_forms(name, [name], FORM_NAME)
+            self.add_name_forms(name, info.get("nicknames", []), FORM_NICKNAME)
+
+    def _add_form(self, key, name, kind):
+        if not key:
+            return
+        forms = self._name_forms.setdefault(name, set())
+        if key in forms:
+            return
+        forms.add(key)
+        order = self.matcher.idol_order(name)
+        owners = self._name_owners.setdefault(key, [])
+        insort(owners, (kind, len(self.idols) if order is None else order, name))
+        self.name_index[key] = owners[0][2]
+
+    def add_name_forms(self, name, texts, kind=FORM_NICKNAME):
+        """增量登记小偶像的名字（FORM_NAME）或昵称的归一化形式及拼音形式，只处理传入的文本"""
+        for text in texts:
+            self._add_form(normalize(text), name, kind)
+            for key in pinyin_keys(text):
+                self._add_form(key, name, FORM_PINYIN)
+
+    def remove_name_forms(self, name):
+        """删除小偶像的全部形式，原先归属它的形式改归下一个拥有该形式的小偶像"""
+        for key in self._name_forms.pop(name, ()):
+            owners = [owner for owner in self._name_owners[key] if owner[2] != name]
+            if owners:
+                self._name_owners[key] = owners
+                self.name_index[key] = owners[0][2]
+            else:
+                del self._name_owners[key]
+                del self.name_index[key]
+
+    def lookup(self, text):
+        """按归一化形式（全角、繁体、大小写、表情、拼音缩写）查找真名，找不到返回 None"""
+        key = normalize(text)
+        return self.name_index.get(key) if key else None
@@ -0,0 +1,131 @@
+"""
+签到抽取模块
+
+负责：
+- 按 idols.json 中各小偶像的 weight（权重，默认 1）随机抽取签到的小偶像
+- 用别名表（Walker / Vose alias method）抽样：构建 O(N)，每次抽取 O(1)，只需一次随机数
+- 支持排除已经分配出去的小偶像（同一个群内不重复分配），排除较多时退化为对剩余小偶像按权重抽取
+
+小偶像的增删只修改名字 / 权重列表（O(1)），别名表在下一次抽取时才重新构建，
+连续增删多个小偶像也只重建一次
+"""
+import random
+
+# 默认权重：没有填写 weight 的小偶像
+DEFAULT_WEIGHT = 1.0
+# 排除已分配的小偶像时，先按别名表重试的次数；都命中已分配的小偶像后改为在剩余小偶像中抽取
+_MAX_REJECTIONS = 8
+
+
+def idol_weight(info):
+    """小偶像记录中的权重，缺省为 DEFAULT_WEIGHT"""
+    return float(info.get("weight", DEFAULT_WEIGHT))
+
+
+class AliasTable:
+    """按权重抽取下标的别名表；权重全为 0 时按均匀分布抽取"""
+
+    __slots__ = ("_prob", "_alias")
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if total <= 0:
+            weights, total = [1.0] * n, float(n)
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            # 大的一列把自己的一部分借给小的一列，剩余部分重新归类
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # 剩下的列（包括浮点误差留下的）概率视为 1
+        self._prob = prob
+        self._alias = alias
+
+    def sample(self, rng=random):
+        """抽取一个下标：整数部分选列，小数部分决定取本列还是别名"""
+        r = rng.random() * len(self._prob)
+        i = int(r)
+        return i if r - i < self._prob[i] else self._alias[i]
+
+
+class IdolSampler:
+    """按权重抽取小偶像名字，随 idols 的增删增量更新"""
+
+    def __init__(self, idols=None, rng=random):
+        self._names = []
+        self._weights = []
+        self._pos = {}  # 名字 -> 在 _names 中的下标
+        self._table = None  # 别名表缓存，名单或权重变化时失效
+        self._rng = rng
+        for name, info in (idols or {}).items():
+            self.add(name, idol_weight(info))
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name, weight=DEFAULT_WEIGHT):
+        """登记小偶像（已存在时更新权重）"""
+        i = self._pos.get(name)
+        if i is None:
+            self._pos[name] = len(self._names)
+            self._names.append(name)
+            self._weights.append(weight)
+        elif self._weights[i] == weight:
+            return
+        else:
+            self._weights[i] = weight
+        self._table = None
+
+    def remove(self, name):
+        """移除小偶像：把最后一个移到它的位置，不移动其余元素"""
+        i = self._pos.pop(name, None)
+        if i is None:
+            return
+        last_name = self._names.pop()
+        last_weight = self._weights.pop()
+        if i < len(self._names):
+            self._names[i] = last_name
+            self._weights[i] = last_weight
+            self._pos[last_name] = i
+        self._table = None
+
+    def _alias_table(self):
+        table = self._table
+        if table is None:
+            table = self._table = AliasTable(self._weights)
+        return table
+
+    def draw(self, exclude=None):
+        """
+        按权重抽取一个小偶像；没有小偶像时返回 None
+
+        exclude 为不应再抽到的小偶像（支持 in 判断即可）；
+        除权重为 0 的小偶像外都已被排除时返回 None，由调用方决定是否允许重复
+        """
+        names = self._names
+        if not names:
+            return None
+        table = self._alias_table()
+        if not exclude:
+            return names[table.sample(self._rng)]
+        for _ in range(_MAX_REJECTIONS):
+            name = names[table.sample(self._rng)]
+            if name not in exclude:
+                return name
+        # 大部分权重已被排除：在剩余小偶像中按权重抽取（O(N)，每个群每天只在快分完时发生）
+        remaining = [(name, w) for name, w in zip(names, self._weights) if name not in exclude]
+        if any(w > 0 for w in self._weights):
+            remaining = [(name, w) for name, w in remaining if w > 0]
+        else:
+            remaining = [(name, 1.0) for name, _ in remaining]  # 权重全为 0 时与别名表一致，均匀抽取
+        if not remaining:
+            return None
+        return self._rng.choices([name for name, _ in remaining], [w for _, w in remaining])[0]
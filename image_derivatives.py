@@ -0,0 +1,185 @@
+"""
+图片衍生缓存模块
+
+负责：
+- 为发送的原图生成缩小、重新压缩后的衍生图，减少每次回复的上传体积
+- 衍生图以 "原图路径 + mtime + 尺寸 + 压缩参数" 为键存放在磁盘缓存目录中
+- 衍生图在后台线程池中生成，尚未生成时先发送原图
+- 缓存目录按总大小限制，超出时淘汰最久未使用的衍生图
+
+依赖 Pillow（AstrBot 自带）；未安装 Pillow 时自动停用，始终发送原图
+"""
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+# 不做处理、直接发送原图的格式（动图缩放会丢帧）
+PASSTHROUGH_SUFFIXES = (".gif", ".svg")
+
+
+class ImageDerivativeCache:
+    """缩放 / 重新压缩后的图片缓存"""
+
+    def __init__(self, cache_dir, max_side=1280, quality=85, max_bytes=512 * 1024 * 1024, workers=2):
+        self.cache_dir = cache_dir
+        self.max_side = max_side
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.enabled = Image is not None
+        self._lock = threading.Lock()
+        self._entries = None        # 衍生图路径 -> 文件大小（按最近使用排序）
+        self._total_bytes = 0
+        self._sources = {}          # 原图路径 -> (mtime_ns, 衍生图路径或 None 表示直接用原图)
+        self._pending = set()       # 正在生成的衍生图路径
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xox-thumb")
+
+    def resolve(self, src_path):
+        """
+        返回应当发送的图片路径：已生成衍生图时返回衍生图，否则返回原图；
+        原图不存在时返回 None。衍生图缺失时会在后台开始生成
+
+        会访问磁盘，应在线程池中调用
+        """
+        try:
+            st = os.stat(src_path)
+        except OSError:
+            return None
+        if not self.enabled or src_path.lower().endswith(PASSTHROUGH_SUFFIXES):
+            return src_path
+
+        with self._lock:
+            self._ensure_index()
+            cached = self._sources.get(src_path)
+            if cached is not None and cached[0] == st.st_mtime_ns:
+                derived = cached[1]
+                if derived is None:
+                    return src_path
+                if derived in self._entries:
+                    self._entries.move_to_end(derived)
+                    return derived
+            derived = self._derived_path(src_path, st)
+            if derived in self._entries:
+                self._sources[src_path] = (st.st_mtime_ns, derived)
+                self._entries.move_to_end(derived)
+                return derived
+            if derived not in self._pending:
+                self._pending.add(derived)
+                self._executor.submit(self._generate, src_path, st.st_mtime_ns, derived)
+        return src_path
+
+    def prewarm(self):
+        """预先扫描缓存目录建立索引，之后第一次发送图片不必等待扫描（会访问磁盘，应在线程池中调用）"""
+        with self._lock:
+            self._ensure_index()
+
+    def settled(self, src_path):
+        """resolve 的结果是否已经确定：衍生图已生成，或已确定直接发送原图（原图修改前不会再变化）"""
+        if not self.enabled or src_path.lower().endswith(PASSTHROUGH_SUFFIXES):
+            return True
+        return src_path in self._sources
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- 内部实现 ---
+
+    def _derived_path(self, src_path, st):
+        key = f"{src_path}|{st.st_mtime_ns}|{st.st_size}|{self.max_side}|{self.quality}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".jpg")
+
+    def _ensure_index(self):
+        """首次使用时扫描缓存目录，按修改时间恢复最近使用顺序（需持有锁）"""
+        if self._entries is not None:
+            return
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name.endswith(".tmp"):
+                        # 上次停止时未写完的衍生图：不计入容量，直接删除
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in found)
+        self._total_bytes = sum(self._entries.values())
+
+    def _generate(self, src_path, mtime_ns, derived):
+        """在后台线程中生成衍生图"""
+        try:
+            size = self._render(src_path, derived)
+        except Exception as e:
+            logging.warning(f"生成缩略图失败 {src_path}: {e}")
+            size = None
+        with self._lock:
+            self._pending.discard(derived)
+            if size is None:
+                # 原图已经足够小或无法处理：以后直接发送原图
+                self._sources[src_path] = (mtime_ns, None)
+                return
+            self._entries[derived] = size
+            self._total_bytes += size
+            self._sources[src_path] = (mtime_ns, derived)
+            self._evict()
+
+    def _render(self, src_path, derived):
+        """缩放并重新压缩为 JPEG，返回文件大小；无需处理时返回 None"""
+        with Image.open(src_path) as img:
+            if getattr(img, "is_animated", False):
+                return None
+            if max(img.size) <= self.max_side and os.path.getsize(src_path) <= 512 * 1024:
+                return None
+            # 按 EXIF 方向转正（缩放和转存 JPEG 会丢掉方向标记）
+            img = ImageOps.exif_transpose(img)
+            img = self._flatten(img)
+            img.thumbnail((self.max_side, self.max_side))
+            os.makedirs(os.path.dirname(derived), exist_ok=True)
+            tmp_path = derived + ".tmp"
+            img.save(tmp_path, "JPEG", quality=self.quality, optimize=True)
+        if os.path.getsize(tmp_path) >= os.path.getsize(src_path):
+            # 重新压缩后反而更大，直接用原图
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, derived)
+        return os.path.getsize(derived)
+
+    @staticmethod
+    def _flatten(img):
+        """转换为 RGB；带透明通道的图片先铺在白色背景上，避免透明部分变黑"""
+        if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            return background
+        return img.convert("RGB")
+
+    def _evict(self):
+        """超出容量时淘汰最久未使用的衍生图（需持有锁）"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if len(self._sources) > 4 * len(self._entries) + 1024:
+            # 清理指向已淘汰衍生图的映射，避免无限增长
+            self._sources = {src: v for src, v in self._sources.items()
+                             if v[1] is None or v[1] in self._entries}
@@ -0,0 +1,82 @@
+"""
+图片清单缓存模块
+
+负责：
+- 为每个小偶像的图片目录缓存一份已筛选的图片清单
+- 通过目录 mtime 判断清单是否过期，目录未变化时不再 listdir
+- 随机取图只需在缓存列表中按下标取值
+
+为了避免在网络挂载目录上频繁 stat，同一目录在 check_interval 秒内只检查一次 mtime
+"""
+import os
+import time
+import random
+import logging
+
+
+class ImageManifest:
+    """单个图片目录的清单"""
+    __slots__ = ("mtime_ns", "paths", "checked_at")
+
+    def __init__(self, mtime_ns, paths, checked_at):
+        self.mtime_ns = mtime_ns    # 目录 mtime，目录不存在时为 None
+        self.paths = paths          # 图片完整路径列表
+        self.checked_at = checked_at
+
+
+class ImageManifestCache:
+    """按目录缓存图片清单，目录 mtime 变化时自动重建"""
+
+    def __init__(self, image_formats, check_interval=5.0):
+        self.suffixes = tuple(fmt.lower() for fmt in image_formats)
+        self.check_interval = check_interval
+        self._manifests = {}
+
+    def get(self, folder_path):
+        """获取目录下的图片路径列表（可能为空列表）"""
+        now = time.monotonic()
+        manifest = self._manifests.get(folder_path)
+        if manifest is not None and now - manifest.checked_at < self.check_interval:
+            return manifest.paths
+
+        try:
+            mtime_ns = os.stat(folder_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        except (OSError, PermissionError) as e:
+            logging.error(f"访问图片目录 {folder_path} 失败: {e}")
+            mtime_ns = None
+
+        if manifest is not None and manifest.mtime_ns == mtime_ns:
+            manifest.checked_at = now
+            return manifest.paths
+
+        paths = self._scan(folder_path) if mtime_ns is not None else []
+        if paths is None:
+            # 扫描失败时不缓存 mtime，下次检查时重试
+            paths, mtime_ns = [], None
+        self._manifests[folder_path] = ImageManifest(mtime_ns, paths, now)
+        return paths
+
+    def pick(self, folder_path):
+        """从目录清单中随机取一张图片，没有图片时返回 None"""
+        paths = self.get(folder_path)
+        return random.choice(paths) if paths else None
+
+    def invalidate(self, folder_path=None):
+        """使某个目录（或全部目录）的清单失效"""
+        if folder_path is None:
+            self._manifests.clear()
+        else:
+            self._manifests.pop(folder_path, None)
+
+    def _scan(self, folder_path):
+        """筛选图片文件，使用配置的图片格式"""
+        try:
+            suffixes = self.suffixes
+            return [os.path.join(folder_path, f) for f in os.listdir(folder_path)
+                    if f.lower().endswith(suffixes)]
+        except (OSError, PermissionError) as e:
+            # 处理权限错误或目录访问错误
+            logging.error(f"访问图片目录 {folder_path} 失败: {e}")
+            return None
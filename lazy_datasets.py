@@ -0,0 +1,65 @@
+"""
+按需加载的数据集模块
+
+负责：
+- LazyDatasets：各数据集（idols / users / checkins / groups / admins）在第一次访问时才从存储后端读取，
+  启动时只需加载小偶像名单，不再随历史签到用户数变慢
+
+实现 MutableMapping 接口，DataManager 与处理函数中的 data.get / setdefault / in 等用法保持不变
+"""
+import threading
+from collections.abc import MutableMapping
+
+
+class LazyDatasets(MutableMapping):
+    """数据集名 -> 数据，首次访问时调用 loader(key) 加载"""
+
+    def __init__(self, keys, loader):
+        self._keys = tuple(keys)
+        self._loader = loader
+        self._loaded = {}
+        # 后台预加载与事件循环中的首次访问可能同时发生，同一数据集只加载一次；
+        # 加载一个数据集时可能需要读取另一个（如从旧版 users 迁移签到），因此使用可重入锁
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            if key not in self._loaded:
+                self._loaded[key] = self._loader(key)
+            return self._loaded[key]
+
+    def __setitem__(self, key, value):
+        if key in self._loaded:
+            # 替换已加载的数据集（如热重载 idols）：不必等待后台正在加载的其他数据集
+            self._loaded[key] = value
+            return
+        with self._lock:
+            self._loaded[key] = value
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._loaded[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def is_loaded(self, key):
+        return key in self._loaded
+
+    def preload(self, keys=None):
+        """加载尚未加载的数据集（在线程池中调用）"""
+        for key in keys or self._keys:
+            self[key]
+
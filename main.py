@@ -12,13 +12,19 @@ SixSixBot 插件 - 小偶像互动与签到系统
 - 图片资源存储在 plugin_data 目录下
 """
 import os
-import datetime
+import time
+import asyncio
 import random
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star
 import astrbot.api.message_components as Comp
 from astrbot.api import logger
 from .data_manager import DataManager
+from .metrics import Metrics, tracked
+from .flood_control import FloodControl
+from .idol_bundle import format_summary, load_bundle, parse_bundle
+from .reply_cache import ReplyCache
+from .text_normalize import normalize
 
 class SixSixBot(Star):
     """SixSixBot 插件主类"""
@@ -38,13 +44,41 @@ class SixSixBot(Star):
         self.plugin_data_dir = os.path.join(data_dir, "plugin_data", plugin_name)
         # 读取配置
         self.config = config or {}
+        # 运行指标：各处理函数耗时、图片查找与保存耗时等，通过 /stats 查看
+        self.metrics = Metrics()
+        self._stats_task = None
+        # 被动回复的刷屏限流（按用户、按群的令牌桶）
+        self.flood = FloodControl(self.config)
         # 初始化数据管理器（数据存储在 data 目录下，防止更新插件时丢失）
-        self.db = DataManager(self.plugin_dir, self.plugin_data_dir, self.config)
+        self.db = DataManager(self.plugin_dir, self.plugin_data_dir, self.config, self.metrics)
+        # 渲染好的回复（重复签到、/xox 查询）的 LRU 缓存，键中包含 idols 版本号，数据变化后自动失效
+        self.replies = ReplyCache(
+            int(self.config.get("reply_cache_size", 1024)),
+            float(self.config.get("reply_cache_ttl", 60.0)),
+            self.metrics
+        )
 
     async def initialize(self):
+        # 启动后台落盘任务（延迟写入）
+        self.db.start_flusher()
+        # 在后台读取 users 等按需加载的数据集
+        self.db.start_preload()
+        # 在后台扫描所有小偶像的图片目录，重启后第一次请求不必等待 listdir（不阻塞插件就绪）
+        self.db.start_prewarm()
+        # 定期检查共用 data 目录的其他 Bot 进程写入的数据
+        self.db.start_sync()
+        # 定期把运行统计写入日志（stats_log_interval 为 0 时不启动）
+        interval = float(self.config.get("stats_log_interval", 0))
+        if interval > 0:
+            self._stats_task = asyncio.get_running_loop().create_task(self._stats_log_loop(interval))
         logger.info("SixSixBot 插件初始化完成。")
+
+    async def _stats_log_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            logger.info(self.metrics.report())
     
-    def _build_reply_chain(self, event: AstrMessageEvent, user_id: str, text: str, img_path: str = None):
+    async def _build_reply_chain(self, event: AstrMessageEvent, user_id: str, text: str, img_path: str = None):
         """
         构建回复消息链：@用户 + 换行 + 文字 + 图片
         
@@ -57,6 +91,12 @@ class SixSixBot(Star):
         Returns:
             消息链列表
         """
+        # 优先发送缩放压缩后的缩略图
+        send_path = await self.db.aresolve_send_image(img_path) if img_path else None
+        return self._compose_reply_chain(user_id, text, send_path)
+
+    def _compose_reply_chain(self, user_id: str, text: str, send_path: str = None):
+        """由已确定的发送路径构建消息链（不访问磁盘），send_path 为 None 时附上没有图片的提示"""
         chain = []
         
         # @用户
@@ -65,8 +105,8 @@ class SixSixBot(Star):
         chain.append(Comp.Plain(f"\u200b\n{text}\u200b"))
         
         # 添加图片或提示
-        if img_path and os.path.exists(img_path):
-            chain.append(Comp.Image.fromFileSystem(img_path))
+        if send_path:
+            chain.append(Comp.Image.fromFileSystem(send_path))
         else:
             no_image_msg = self.config.get("default_messages", {}).get("no_image", "暂时还没有解锁这位小偶像哦。")
             if no_image_msg:
@@ -77,6 +117,7 @@ class SixSixBot(Star):
     # ================= 核心消息监听 (用于处理口号触发) =================
     
     @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE)
+    @tracked("passive_catchphrase_handler")
     async def passive_catchphrase_handler(self, event: AstrMessageEvent):
         """检查非指令消息中是否包含应援口号触发句"""
         # 检查是否启用口号触发功能
@@ -88,27 +129,39 @@ class SixSixBot(Star):
         if msg_str.startswith("/"):
             return
 
+        # 配置过的群：可以单独关闭被动回复，且只与本群小偶像的触发句匹配
+        await self.db.aload("groups")
+        group_id = self._group_id(event)
+        scope = self.db.group_scope(group_id)
+        if scope is not None and not scope.catchphrase:
+            return
+        matcher = self.db.matcher if scope is None else scope.matcher
+
+        # 消息只归一化一次（全角转半角、繁体转简体、去掉空白、标点和表情），
+        # 之后的匹配都使用归一化后的文本，与预先归一化的名字、昵称和触发句比较
+        msg_key = normalize(msg_str)
+
+        # 快速预筛：所有分支都要求消息含"想"或命中某个触发句的锚点字符，
+        # 两者都没有的普通聊天直接跳过
+        if "想" not in msg_key and not matcher.may_match(msg_key):
+            self.metrics.incr("passive.prefilter_rejected")
+            return
+
         user_id = str(event.get_sender_id())
-        today = datetime.date.today().isoformat()
-        user_record = self.db.data.get("users", {}).get(user_id, {})
-        today_idol = user_record.get("today_idol") if user_record.get("last_checkin") == today else None
+        await self.db.aload("checkins")
+        today_idol = self.db.get_today_idol(user_id, group_id)
 
         # 处理"好想宝宝"的特殊情况（优先匹配，避免被"好想XXX"逻辑匹配）
-        # 支持多种表达：好想宝宝、想宝宝、好想 宝宝、想 宝宝 等
-        msg_normalized = msg_str.replace(" ", "").replace("，", "").replace(",", "")
-        if "好想宝宝" in msg_normalized or "想宝宝" in msg_normalized:
+        # 支持多种表达：好想宝宝、想宝宝、好想 宝宝、想 寶寶 等
+        if "想宝宝" in msg_key:
             if today_idol:
-                # 生成思念回复模板（5个随机选择）
-                miss_templates = [
-                    f"{today_idol}正在数着星星，每一颗都是对你的思念~！",
-                    f"{today_idol}在月光下许愿，希望你能感受到她的想念~",
-                    f"{today_idol}对着夜空轻声说：好想你呀，每一秒都在想你~",
-                    f"{today_idol}在梦里遇见了你，醒来后更加思念~",
-                    f"{today_idol}把对你的思念写成了诗，每一句都是爱意~"
-                ]
-                response_txt = random.choice(miss_templates)
-                img_path = self.db.get_random_image_path(today_idol)
-                chain = self._build_reply_chain(event, user_id, response_txt, img_path)
+                # 思念回复（预编译模板，随机选择）
+                idol_data = self.db.data.get("idols", {}).get(today_idol)
+                response_txt = self.db.templates.miss("miss_today", today_idol, idol_data).render(name=today_idol)
+                if not self._allow_passive_reply(event, user_id):
+                    return
+                img_path = await self.db.arandom_image(today_idol)
+                chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
                 # 尝试使用reply方法引用原消息，如果没有则使用chain_result
                 if hasattr(event, 'reply'):
                     yield event.reply(chain)
@@ -117,7 +170,9 @@ class SixSixBot(Star):
                 return
             else:
                 # 用户今天还没签到，提示先签到
-                chain = self._build_reply_chain(event, user_id, "你还没有签到呢~先使用 /qd 签到领取今天的宝宝吧！")
+                if not self._allow_passive_reply(event, user_id):
+                    return
+                chain = await self._build_reply_chain(event, user_id, "你还没有签到呢~先使用 /qd 签到领取今天的宝宝吧！")
                 if hasattr(event, 'reply'):
                     yield event.reply(chain)
                 else:
@@ -125,34 +180,26 @@ class SixSixBot(Star):
                 return
 
         # 处理"好想XXX"的情况（XXX不是"宝宝"）
-        if (msg_str.startswith("好想") or msg_str.startswith("想")) and "宝宝" not in msg_str:
+        if msg_key.startswith(("好想", "想")) and "宝宝" not in msg_key:
             # 提取想的人名
-            target_name = msg_str.replace("好想", "").replace("想", "").strip()
+            target_name = msg_key.replace("好想", "").replace("想", "")
             if target_name:
                 # 检查目标名字是否存在于系统中（支持真实姓名和昵称）
-                real_name = self.db.get_real_name(target_name)
+                real_name = self.db.find_idol_fuzzy(target_name, group_id)
                 
                 if real_name:
                     # 检查这个XXX是否今天已经被其他用户签到过
-                    users_data = self.db.data.get("users", {})
-                    today = datetime.date.today().isoformat()
-                    is_taken_by_others = False
-                    
-                    # 遍历所有用户，检查是否有其他用户今天签到了这个XXX
-                    for uid, user_record in users_data.items():
-                        if uid != user_id:  # 排除当前用户
-                            if user_record.get("last_checkin") == today:
-                                if user_record.get("today_idol") == real_name:
-                                    is_taken_by_others = True
-                                    break
+                    is_taken_by_others = self.db.is_idol_taken(real_name, exclude_user=user_id, group_id=group_id)
                     
                     # 如果XXX已经被其他用户签到过
                     if is_taken_by_others:
                         if today_idol:
                             # 用户今天已签到，提示关心自己的宝宝
                             response_txt = f"这不是你的宝宝哦，这是别人的宝宝。请多多关心{today_idol}吧！"
-                            img_path = self.db.get_random_image_path(today_idol)
-                            chain = self._build_reply_chain(event, user_id, response_txt, img_path)
+                            if not self._allow_passive_reply(event, user_id):
+                                return
+                            img_path = await self.db.arandom_image(today_idol)
+                            chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
                             if hasattr(event, 'reply'):
                                 yield event.reply(chain)
                             else:
@@ -160,7 +207,9 @@ class SixSixBot(Star):
                             return
                         else:
                             # 用户今天还没签到，提示先签到
-                            chain = self._build_reply_chain(event, user_id, "这不是你的宝宝哦，这是别人的宝宝。先使用 /qd 签到领取今天的宝宝吧！")
+                            if not self._allow_passive_reply(event, user_id):
+                                return
+                            chain = await self._build_reply_chain(event, user_id, "这不是你的宝宝哦，这是别人的宝宝。先使用 /qd 签到领取今天的宝宝吧！")
                             if hasattr(event, 'reply'):
                                 yield event.reply(chain)
                             else:
@@ -169,150 +218,141 @@ class SixSixBot(Star):
                     # 如果XXX没有被任何人签到过，继续正常的应援口号处理流程（不return，让代码继续执行）
                 # 如果找不到这个XXX，也继续正常的应援口号处理流程
 
-        # 遍历所有小偶像的应援口号
+        # 查找命中的应援口号（一次扫描匹配全部触发句）
         idols = self.db.data.get("idols", {})
         catchphrase_matched = False
         
         # 如果消息是"好想XXX"格式，先提取目标名字
         target_name_for_match = None
-        if (msg_str.startswith("好想") or msg_str.startswith("想")) and "宝宝" not in msg_str:
-            target_name_for_match = msg_str.replace("好想", "").replace("想", "").strip()
-        
-        for idol_name, idol_data in idols.items():
-            catchphrases = idol_data.get("catchphrases", {})
-            # 获取该小偶像的所有昵称（包括自定义添加的昵称）
-            nicknames = idol_data.get("nicknames", [])
-            all_names = [idol_name] + nicknames  # 真实姓名 + 所有昵称（包括自定义昵称）
+        if msg_key.startswith(("好想", "想")) and "宝宝" not in msg_key:
+            target_name_for_match = msg_key.replace("好想", "").replace("想", "")
+        
+        # 检查目标名字是否是某个有应援口号的小偶像的名字或昵称（包括自定义昵称）
+        target_idol = None
+        if target_name_for_match:
+            real_name = self.db.find_idol_fuzzy(target_name_for_match, group_id)
+            if real_name and idols.get(real_name, {}).get("catchphrases"):
+                target_idol = real_name
+        
+        match = matcher.first_match(msg_key, msg_str)
+        # 保持原有顺序：按小偶像顺序，先检查该小偶像的触发句，再检查"好想XXX"
+        if match and target_idol is not None:
+            if matcher.idol_order(target_idol) < matcher.idol_order(match[0]):
+                match = None
+        
+        if match:
+            idol_name, trigger_txt = match
+            response_data = idols[idol_name]["catchphrases"][trigger_txt]
+            catchphrase_matched = True
+            # 支持单个回复字符串或回复模板数组（随机选择），{name} 替换为小偶像名字
+            response_txt = self.db.templates.catchphrase(idol_name, trigger_txt, response_data).render(name=idol_name)
             
-            # 检查目标名字是否是该小偶像的名字或昵称（包括自定义昵称）
-            is_target_idol = False
-            if target_name_for_match:
-                # 使用 get_real_name 确保能匹配到自定义昵称
-                real_name = self.db.get_real_name(target_name_for_match)
-                if real_name == idol_name:
-                    is_target_idol = True
+            if not self._allow_passive_reply(event, user_id):
+                return
+            img_path = await self.db.arandom_image(idol_name)
+            chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
+            if hasattr(event, 'reply'):
+                yield event.reply(chain)
+            else:
+                yield event.chain_result(chain)
+            return
+        
+        # 额外检查：如果消息是"好想XXX"格式，且XXX是该小偶像的名字或昵称（包括自定义昵称），也触发应援口号
+        if target_idol:
+            idol_name = target_idol
+            catchphrases = idols[idol_name]["catchphrases"]
+            # 查找"好想XXX"相关的应援口号
+            matched_templates = []
+            for trigger, response_data in catchphrases.items():
+                if target_name_for_match in trigger or "好想" in trigger or "想" in trigger:
+                    matched_templates.extend(self.db.templates.catchphrase(idol_name, trigger, response_data).templates)
             
-            for trigger_txt, response_data in catchphrases.items():
-                # 检查触发句是否匹配消息
-                if trigger_txt in msg_str:
-                    catchphrase_matched = True
-                    # 支持单个回复字符串或回复模板数组
-                    if isinstance(response_data, list):
-                        # 如果是数组，随机选择一个回复模板
-                        template = random.choice(response_data)
-                    else:
-                        # 如果是字符串，直接使用
-                        template = response_data
-                    
-                    # 如果模板中包含 {name} 占位符，替换为小偶像名字
-                    # 如果没有占位符，直接使用模板
-                    if "{name}" in template:
-                        response_txt = template.replace("{name}", idol_name)
-                    else:
-                        response_txt = template
-                    
-                    img_path = self.db.get_random_image_path(idol_name)
-                    chain = self._build_reply_chain(event, user_id, response_txt, img_path)
-                    if hasattr(event, 'reply'):
-                        yield event.reply(chain)
-                    else:
-                        yield event.chain_result(chain)
-                    return
+            if matched_templates:
+                # 随机选择一个回复模板
+                response_txt = random.choice(matched_templates).render({"name": idol_name})
+            else:
+                # 如果没有找到匹配的，使用第一个应援口号
+                first_trigger, first_catchphrase = next(iter(catchphrases.items()))
+                response_txt = self.db.templates.catchphrase(idol_name, first_trigger, first_catchphrase).render(name=idol_name)
             
-            # 额外检查：如果消息是"好想XXX"格式，且XXX是该小偶像的名字或昵称（包括自定义昵称），也触发应援口号
-            if target_name_for_match and is_target_idol and catchphrases:
-                # 查找"好想XXX"相关的应援口号
-                matched_responses = []
-                for trigger, response_data in catchphrases.items():
-                    if target_name_for_match in trigger or "好想" in trigger or "想" in trigger:
-                        if isinstance(response_data, list):
-                            matched_responses.extend(response_data)
-                        else:
-                            matched_responses.append(response_data)
-                
-                if matched_responses:
-                    # 随机选择一个回复模板
-                    template = random.choice(matched_responses)
-                else:
-                    # 如果没有找到匹配的，使用第一个应援口号
-                    first_catchphrase = next(iter(catchphrases.values()))
-                    if isinstance(first_catchphrase, list):
-                        template = random.choice(first_catchphrase)
-                    else:
-                        template = first_catchphrase
-                
-                # 如果模板中包含 {name} 占位符，替换为小偶像名字
-                if "{name}" in template:
-                    response_txt = template.replace("{name}", idol_name)
-                else:
-                    response_txt = template
-                
-                catchphrase_matched = True
-                img_path = self.db.get_random_image_path(idol_name)
-                chain = self._build_reply_chain(event, user_id, response_txt, img_path)
-                if hasattr(event, 'reply'):
-                    yield event.reply(chain)
-                else:
-                    yield event.chain_result(chain)
+            catchphrase_matched = True
+            if not self._allow_passive_reply(event, user_id):
                 return
+            img_path = await self.db.arandom_image(idol_name)
+            chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
+            if hasattr(event, 'reply'):
+                yield event.reply(chain)
+            else:
+                yield event.chain_result(chain)
+            return
         
         # 如果"好想XXX"但没有匹配到应援口号，且XXX没有被签到过，提供默认回复
-        if (msg_str.startswith("好想") or msg_str.startswith("想")) and "宝宝" not in msg_str and not catchphrase_matched:
-            target_name = msg_str.replace("好想", "").replace("想", "").strip()
+        if msg_key.startswith(("好想", "想")) and "宝宝" not in msg_key and not catchphrase_matched:
+            target_name = msg_key.replace("好想", "").replace("想", "")
             if target_name:
-                real_name = self.db.get_real_name(target_name)
+                real_name = self.db.find_idol_fuzzy(target_name, group_id)
                 if real_name:
                     # 检查是否被签到过
-                    users_data = self.db.data.get("users", {})
-                    today = datetime.date.today().isoformat()
-                    is_taken = False
-                    for uid, user_record in users_data.items():
-                        if user_record.get("last_checkin") == today:
-                            if user_record.get("today_idol") == real_name:
-                                is_taken = True
-                                break
+                    is_taken = self.db.is_idol_taken(real_name, group_id=group_id)
                     
-                    # 如果没有被签到过，提供默认回复（5个不同风格的模板）
+                    # 如果没有被签到过，提供默认回复（预编译模板，随机选择）
                     if not is_taken:
-                        miss_templates = [
-                            f"{real_name}也很想你~今天也要加油哦！",
-                            f"{real_name}感受到了你的思念，我的心也暖暖的~",
-                            f"{real_name}听到你的呼唤，我也在想你呢！",
-                            f"{real_name}也想和你见面呢，期待我们的下一次相遇~",
-                            f"{real_name}收到你的思念了，每一秒都在想你哦~",
-                            f"猜猜是谁在天天看你的微博？是{real_name}啦！！",
-                            f"{real_name}正在数着星星，每一颗都是对你的思念~",
-                            f"{real_name}在月光下许愿，希望你能感受到她的想念~",
-                            f"{real_name}对着夜空轻声说：好想你呀，每一秒都在想你~",
-                            f"{real_name}把对你的思念写成了诗，每一句都是爱意~"
-                        ]
-                        response_txt = random.choice(miss_templates)
-                        img_path = self.db.get_random_image_path(real_name)
-                        chain = self._build_reply_chain(event, user_id, response_txt, img_path)
+                        idol_data = self.db.data.get("idols", {}).get(real_name)
+                        response_txt = self.db.templates.miss("miss_other", real_name, idol_data).render(name=real_name)
+                        if not self._allow_passive_reply(event, user_id):
+                            return
+                        img_path = await self.db.arandom_image(real_name)
+                        chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
                         if hasattr(event, 'reply'):
                             yield event.reply(chain)
                         else:
                             yield event.chain_result(chain)
                         return 
 
+    def _allow_passive_reply(self, event, user_id):
+        """被动回复的刷屏限流：按用户、按群超出频率时丢弃本次触发"""
+        if self.flood.allow(user_id, self._group_id(event)):
+            return True
+        self.metrics.incr("passive.throttled")
+        return False
+
+    @staticmethod
+    def _group_id(event):
+        """消息所在的群号，私聊返回 None"""
+        group_id = event.get_group_id() if hasattr(event, "get_group_id") else None
+        return str(group_id) if group_id else None
+
     # ================= 签到系统 =================
     
     @filter.command("qd")
+    @tracked("cmd_checkin")
     async def cmd_checkin(self, event: AstrMessageEvent):
         """签到领取今天的宝宝"""
         user_id = str(event.get_sender_id())
         user_name = event.get_sender_name()
-        today = datetime.date.today().isoformat()
+        # 配置过的群有独立的小偶像名单和签到记录
+        group_id = self._group_id(event)
+        # 签到数据在线程池中加载（或等待后台预加载），不在事件循环中读取文件
+        await self.db.aload("groups", "checkins")
         
-        user_record = self.db.data.get("users", {}).get(user_id, {})
-        if user_record.get("last_checkin") == today:
+        if self.db.has_checked_in(user_id, group_id):
             # 重复签到：显示今天已分配的小偶像和图片
-            today_idol = user_record.get("today_idol")
+            today_idol = self.db.get_today_idol(user_id, group_id)
             if today_idol:
-                already_msg = self.config.get("default_messages", {}).get("already_checkin", "你今天已经签到过了哦~")
-                response_txt = f"{already_msg}\n你的宝宝是：{today_idol}"
-                img_path = self.db.get_random_image_path(today_idol)
-                chain = self._build_reply_chain(event, user_id, response_txt, img_path)
+                # 当天重复签到的回复（文字和图片）缓存一段时间，刷屏时不再重复查找图片
+                # 日期取自签到分区的键，与签到记录按同一个时钟跨天
+                key = ("qd", user_id, self.db.today_partition(group_id), today_idol, self.db.idols_version)
+                reply = self.replies.get(key)
+                if reply is None:
+                    already_msg = self.config.get("default_messages", {}).get("already_checkin", "你今天已经签到过了哦~")
+                    response_txt = f"{already_msg}\n你的宝宝是：{today_idol}"
+                    img_path = await self.db.arandom_image(today_idol)
+                    send_path = await self.db.aresolve_send_image(img_path) if img_path else None
+                    reply = (response_txt, send_path)
+                    # 缩略图还在生成时不缓存，生成后的重复签到发送缩略图
+                    if not img_path or self.db.send_image_settled(img_path):
+                        self.replies.put(key, reply)
+                chain = self._compose_reply_chain(user_id, *reply)
                 if hasattr(event, 'reply'):
                     yield event.reply(chain)
                 else:
@@ -320,30 +360,26 @@ class SixSixBot(Star):
             else:
                 # 如果没有保存今天分配的小偶像（可能是旧数据），只显示文字
                 already_msg = self.config.get("default_messages", {}).get("already_checkin", "你今天已经签到过了哦~")
-                chain = self._build_reply_chain(event, user_id, already_msg)
+                chain = await self._build_reply_chain(event, user_id, already_msg)
                 if hasattr(event, 'reply'):
                     yield event.reply(chain)
                 else:
                     yield event.chain_result(chain)
             return
 
-        lucky_idol = self.db.get_random_idol()
+        lucky_idol = self.db.get_random_idol(group_id)
         if not lucky_idol:
             no_idol_msg = self.config.get("default_messages", {}).get("no_idol", "还没有添加任何小偶像，无法签到！请先用 /add 添加。")
             yield event.plain_result(no_idol_msg)
             return
 
-        img_path = self.db.get_random_image_path(lucky_idol)
-        
-        # 保存签到记录，包括今天分配的小偶像
-        self.db.data.setdefault("users", {})[user_id] = {
-            "last_checkin": today,
-            "today_idol": lucky_idol
-        }
-        self.db.save("users")
+        # 保存签到记录，包括今天分配的小偶像（在等待图片之前记录，同一个群同时签到的人不会分到同一个）
+        self.db.checkin(user_id, lucky_idol, group_id)
+
+        img_path = await self.db.arandom_image(lucky_idol)
 
         response_txt = f"签到成功！\n今天你的宝宝是：{lucky_idol}"
-        chain = self._build_reply_chain(event, user_id, response_txt, img_path)
+        chain = await self._build_reply_chain(event, user_id, response_txt, img_path)
         if hasattr(event, 'reply'):
             yield event.reply(chain)
         else:
@@ -352,6 +388,7 @@ class SixSixBot(Star):
     # ================= 小偶像信息查询与管理 =================
     
     @filter.command("xox")
+    @tracked("cmd_idol_info")
     async def cmd_idol_info(self, event: AstrMessageEvent):
         """/xox <姓名或昵称> - 查询小偶像信息"""
         args = event.message_str.split()[1:]
@@ -364,29 +401,37 @@ class SixSixBot(Star):
             yield event.plain_result("请输入要查询的姓名或昵称。")
             return
             
-        real_name = self.db.get_real_name(target)
+        # 档案文字按查询词缓存，idols 变化（版本号改变）后重新生成
+        key = ("xox", target, self.db.idols_version)
+        msg = self.replies.get(key)
+        if msg is None:
+            msg = self._render_idol_info(target)
+            self.replies.put(key, msg)
+        yield event.plain_result(msg)
+
+    def _render_idol_info(self, target):
+        """生成 /xox 的回复文字（只读查询，允许模糊匹配名字）"""
+        real_name = self.db.find_idol_fuzzy(target)
         
         if not real_name:
-            yield event.plain_result(f"未找到关于 '{target}' 的信息。")
-            return
+            return f"未找到关于 '{target}' 的信息。"
             
         # 小偶像档案格式化
         info = self.db.data.get("idols", {}).get(real_name, {})
         nicks = info.get("nicknames", [])
         idol_info = info.get("info", "这个人很神秘，目前还没有公开资料，等待管理员补充。")
         
-        msg = (
+        return (
             f"🌟 {real_name} 档案 🌟\n"
             "-------------------------\n"
             f"昵称：{', '.join(nicks) if nicks else '无'}\n"
             f"简介：{idol_info}\n"
             "-------------------------"
         )
-            
-        yield event.plain_result(msg)
 
 
     @filter.command("add")
+    @tracked("cmd_add")
     async def cmd_add(self, event: AstrMessageEvent):
         """/add <姓名> <昵称> 或 /add catchphrase -i -t -r"""
         msg_parts = event.message_str.split()
@@ -414,7 +459,7 @@ class SixSixBot(Star):
             yield event.plain_result("姓名和昵称不能为空。")
             return
         
-        self.db.add_idol(real_name)  # 注册小偶像并创建文件夹
+        await self.db.aadd_idol(real_name)  # 注册小偶像并创建文件夹
         
         # add_idol 已经创建了记录，直接访问即可
         idols = self.db.data.get("idols", {})
@@ -426,10 +471,8 @@ class SixSixBot(Star):
                 "catchphrases": {}
             }
         
-        nicknames = idols[real_name].get("nicknames", [])
-        if nickname not in nicknames:
-            nicknames.append(nickname)
-            self.db.save("idols")
+        # 添加昵称（同步更新昵称索引）
+        if self.db.add_nickname(real_name, nickname):
             yield event.plain_result(f"已为 {real_name} 添加昵称：{nickname}")
         else:
             yield event.plain_result(f"{nickname} 已经是 {real_name} 的昵称了。")
@@ -473,19 +516,18 @@ class SixSixBot(Star):
             else:
                 # 如果不存在，自动创建新小偶像
                 real_name = idol_input
-                self.db.add_idol(real_name)
+                await self.db.aadd_idol(real_name)
                 was_auto_created = True
                 # 重新获取数据（add_idol 会保存）
                 idols = self.db.data.get("idols", {})
 
         # 确保小偶像记录存在
         if real_name not in idols:
-            self.db.add_idol(real_name)
+            await self.db.aadd_idol(real_name)
             idols = self.db.data.get("idols", {})
         
-        # 添加应援口号到对应小偶像的 catchphrases 中
-        idols[real_name].setdefault("catchphrases", {})[trigger] = resp
-        self.db.save("idols")
+        # 添加应援口号到对应小偶像的 catchphrases 中（同步更新口号自动机）
+        self.db.add_catchphrase(real_name, trigger, resp)
         
         # 格式化回复内容显示
         if isinstance(resp, list):
@@ -501,6 +543,7 @@ class SixSixBot(Star):
     # ================= 列表查询 =================
 
     @filter.command("list")
+    @tracked("cmd_list")
     async def cmd_list(self, event: AstrMessageEvent):
         """/list <姓名> 或 /list catchphrase"""
         args = event.message_str.split()[1:]
@@ -559,6 +602,7 @@ class SixSixBot(Star):
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("auth")
+    @tracked("cmd_auth")
     async def cmd_auth(self, event: AstrMessageEvent):
         """/auth <QQ ID> - 添加授权用户"""
         user_id = str(event.get_sender_id())
@@ -573,16 +617,18 @@ class SixSixBot(Star):
             yield event.plain_result("QQ ID 不能为空。")
             return
             
+        await self.db.aload("admins")
         admins = self.db.data.setdefault("admins", [])
         if target_id not in admins:
             admins.append(target_id)
-            self.db.save("admins")
+            await self.db.asave("admins")
             yield event.plain_result(f"已授权用户：{target_id}")
         else:
             yield event.plain_result(f"用户 {target_id} 已经是管理员了。")
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("rauth")
+    @tracked("cmd_rauth")
     async def cmd_rauth(self, event: AstrMessageEvent):
         """/rauth <QQ ID> - 移除授权用户"""
         user_id = str(event.get_sender_id())
@@ -597,16 +643,18 @@ class SixSixBot(Star):
             yield event.plain_result("QQ ID 不能为空。")
             return
             
+        await self.db.aload("admins")
         admins = self.db.data.get("admins", [])
         if target_id in admins:
             admins.remove(target_id)
-            self.db.save("admins")
+            await self.db.asave("admins")
             yield event.plain_result(f"已移除授权用户：{target_id}")
         else:
             yield event.plain_result(f"用户 {target_id} 不是管理员。")
             
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("add_idol")
+    @tracked("cmd_add_idol")
     async def cmd_add_idol(self, event: AstrMessageEvent):
         """/add_idol <名字> - 添加新的小偶像（仅管理员）"""
         args = event.message_str.split()[1:]
@@ -627,11 +675,12 @@ class SixSixBot(Star):
             return
         
         # 添加小偶像
-        self.db.add_idol(idol_name)
+        await self.db.aadd_idol(idol_name)
         yield event.plain_result(f"✅ 已成功添加小偶像：{idol_name}\n图片目录已创建！\n请记得添加昵称和应援口号哦~")
         
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("del_idol")
+    @tracked("cmd_del_idol")
     async def cmd_del_idol(self, event: AstrMessageEvent):
         """/del_idol <名字> - 删除小偶像（仅管理员）"""
         args = event.message_str.split()[1:]
@@ -653,61 +702,197 @@ class SixSixBot(Star):
             yield event.plain_result(f"未找到小偶像：{idol_name}")
             return
         
-        # 删除小偶像
-        del idols[real_name]
-        self.db.save("idols")
+        # 删除小偶像（同步更新口号自动机）
+        self.db.remove_idol(real_name)
         
         # 提示图片目录（不自动删除，让用户手动处理）
         img_dir = os.path.join(self.db.img_dir, real_name)
         msg = f"✅ 已成功删除小偶像：{real_name}\n"
-        if os.path.exists(img_dir):
+        if await self.db.apath_exists(img_dir):
             msg += f"⚠️ 图片目录仍存在：{img_dir}\n如需删除图片，请手动删除该目录。"
         
         yield event.plain_result(msg)
             
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("import")
+    @tracked("cmd_import")
+    async def cmd_import(self, event: AstrMessageEvent):
+        """/import <文件名 | JSON/CSV 内容> - 批量导入小偶像（仅管理员）"""
+        parts = event.message_str.split(maxsplit=1)
+        if len(parts) < 2:
+            yield event.plain_result(
+                "格式：/import <文件名>（相对于插件的 data 目录）\n"
+                "或在 /import 后换行粘贴 JSON / CSV 内容\n"
+                "CSV 表头为 name,field,key,value，格式说明见 README")
+            return
+
+        payload = parts[1].strip()
+        try:
+            if payload.startswith("{") or "\n" in payload:
+                bundle = parse_bundle(payload)
+            else:
+                path = payload if os.path.isabs(payload) else os.path.join(self.db.data_dir, payload)
+                bundle = await self.db.run_io(load_bundle, path)
+            # 整体校验通过后一次性替换并只写入一次；失败时数据不做任何修改
+            summary = await self.db.aimport_idols(bundle)
+        except (OSError, ValueError) as e:
+            yield event.plain_result(f"❌ 导入失败，数据未做任何修改：{e}")
+            return
+        yield event.plain_result("✅ 导入完成！\n" + format_summary(summary))
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("export")
+    @tracked("cmd_export")
+    async def cmd_export(self, event: AstrMessageEvent):
+        """/export [json|csv] - 导出所有小偶像数据（仅管理员）"""
+        args = event.message_str.split()[1:]
+        fmt = args[0].lower() if args else "json"
+        if fmt not in ("json", "csv"):
+            yield event.plain_result("格式：/export [json|csv]")
+            return
+
+        path = os.path.join(self.db.data_dir, "exports", f"idols_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}")
+        try:
+            count = await self.db.aexport_idols(path, fmt)
+        except OSError as e:
+            yield event.plain_result(f"❌ 导出失败：{e}")
+            return
+        yield event.plain_result(f"✅ 已导出 {count} 位小偶像：\n{path}")
+
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("reset_today")
+    @tracked("cmd_reset_today")
     async def cmd_reset_today(self, event: AstrMessageEvent):
-        """/reset_today - 重置今天所有用户的签到记录（仅管理员）"""
-        today = datetime.date.today().isoformat()
-        users_data = self.db.data.get("users", {})
-        
-        # 统计今天签到的用户数量，并收集需要删除的用户ID
-        reset_count = 0
-        users_to_delete = []
-        
-        # 先遍历收集需要处理的数据
-        for user_id, user_record in users_data.items():
-            if user_record.get("last_checkin") == today:
-                reset_count += 1
-                # 清除今天的签到记录
-                user_record.pop("last_checkin", None)
-                user_record.pop("today_idol", None)
-                # 如果用户记录为空，标记为需要删除
-                if not user_record:
-                    users_to_delete.append(user_id)
-        
-        # 遍历完成后再删除空记录
-        for user_id in users_to_delete:
-            users_data.pop(user_id, None)
-        
-        # 保存数据
-        self.db.save("users")
+        """/reset_today - 重置今天所有用户的签到记录（仅管理员；在配置过的群中只重置本群）"""
+        # 清除今天的签到记录，并统计清除的用户数量
+        group_id = self._group_id(event)
+        await self.db.aload("groups", "checkins")
+        scoped = self.db.group_scope(group_id) is not None
+        reset_count = self.db.reset_today(group_id)
         
         if reset_count > 0:
-            yield event.plain_result(f"✅ 已重置今天所有签到记录！\n共清除了 {reset_count} 位用户的签到记录。")
+            scope_txt = "本群" if scoped else "所有"
+            yield event.plain_result(f"✅ 已重置今天{scope_txt}签到记录！\n共清除了 {reset_count} 位用户的签到记录。")
         else:
             yield event.plain_result("ℹ️ 今天还没有用户签到，无需重置。")
             
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("group")
+    @tracked("cmd_group_manage")
     async def cmd_group_manage(self, event: AstrMessageEvent):
-        """群组管理命令占位"""
-        yield event.plain_result("群组管理功能已识别。请根据具体需求实现子命令逻辑（add/update/info/list）。")
+        """/group <add|update|info|list|del> - 管理本群的独立配置（仅管理员）"""
+        args = event.message_str.split()[1:]
+        sub_cmd = args[0].lower() if args else "info"
+        usage = (
+            "格式：\n"
+            "/group add - 本群启用独立配置（独立的签到记录，默认全部小偶像）\n"
+            "/group update idols <名字...> - 设置本群的小偶像名单（all 表示全部）\n"
+            "/group update catchphrase on|off - 开启 / 关闭本群的应援口号和思念回复\n"
+            "/group info - 查看本群配置\n"
+            "/group list - 列出所有配置过的群\n"
+            "/group del - 删除本群配置，恢复使用全局名单和签到记录"
+        )
+        await self.db.aload("groups", "checkins")
+
+        if sub_cmd == "list":
+            groups = self.db.data.get("groups", {})
+            if not groups:
+                yield event.plain_result("还没有配置过的群，所有群共用全局名单和签到记录。")
+                return
+            lines = [f"• {gid}：{self._describe_group(conf)}" for gid, conf in groups.items()]
+            yield event.plain_result("👥 已配置的群：\n" + "\n".join(lines))
+            return
+
+        group_id = self._group_id(event)
+        if not group_id:
+            yield event.plain_result("请在需要配置的群聊中使用此命令（/group list 除外）。")
+            return
+        conf = self.db.get_group(group_id)
+
+        if sub_cmd == "info":
+            if conf is None:
+                yield event.plain_result("本群没有独立配置，使用全局名单和签到记录。\n使用 /group add 启用独立配置。")
+                return
+            yield event.plain_result(
+                f"👥 群 {group_id} 的配置：\n{self._describe_group(conf)}\n"
+                f"今天已签到：{self.db.group_checkin_count(group_id)} 人")
+            return
+
+        if sub_cmd == "add":
+            if conf is not None:
+                yield event.plain_result("本群已经启用了独立配置，使用 /group info 查看。")
+                return
+            self.db.set_group(group_id, {"catchphrase": True})
+            yield event.plain_result("✅ 本群已启用独立配置：签到记录与其他群分开，默认可以抽到全部小偶像。")
+            return
+
+        if sub_cmd == "del":
+            if not self.db.set_group(group_id, None):
+                yield event.plain_result("本群没有独立配置。")
+                return
+            yield event.plain_result("✅ 已删除本群配置，恢复使用全局名单和签到记录。")
+            return
+
+        if sub_cmd != "update" or len(args) < 3:
+            yield event.plain_result(usage)
+            return
+        if conf is None:
+            yield event.plain_result("本群还没有独立配置，请先使用 /group add。")
+            return
+
+        conf = dict(conf)
+        field = args[1].lower()
+        if field == "idols":
+            if args[2].lower() == "all":
+                conf.pop("idols", None)
+                msg = "✅ 本群恢复为全部小偶像。"
+            else:
+                names, missing = [], []
+                for name in args[2:]:
+                    real_name = self.db.get_real_name(name)
+                    if not real_name:
+                        missing.append(name)
+                    elif real_name not in names:
+                        names.append(real_name)
+                if not names:
+                    yield event.plain_result(f"未找到小偶像：{'、'.join(missing)}")
+                    return
+                conf["idols"] = names
+                msg = f"✅ 本群的小偶像名单已设置为：{'、'.join(names)}"
+                if missing:
+                    msg += f"\n⚠️ 未找到：{'、'.join(missing)}"
+        elif field == "catchphrase" and args[2].lower() in ("on", "off"):
+            conf["catchphrase"] = args[2].lower() == "on"
+            msg = f"✅ 本群已{'开启' if conf['catchphrase'] else '关闭'}应援口号和思念回复。"
+        else:
+            yield event.plain_result(usage)
+            return
+        self.db.set_group(group_id, conf)
+        yield event.plain_result(msg)
+
+    @staticmethod
+    def _describe_group(conf):
+        idols = conf.get("idols")
+        pool = "、".join(idols) if idols else "全部"
+        catchphrase = "开启" if conf.get("catchphrase", True) else "关闭"
+        return f"小偶像名单：{pool}；应援口号：{catchphrase}"
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("stats")
+    @tracked("cmd_stats")
+    async def cmd_stats(self, event: AstrMessageEvent):
+        """/stats [reset] - 查看插件运行统计（仅管理员）"""
+        args = event.message_str.split()[1:]
+        if args and args[0].lower() == "reset":
+            self.metrics.reset()
+            yield event.plain_result("✅ 运行统计已清零。")
+            return
+        yield event.plain_result(self.metrics.report())
 
     # ================= 基础帮助 =================
     
     @filter.command("help")
+    @tracked("cmd_help")
     async def cmd_help(self, event: AstrMessageEvent):
         """显示此帮助信息"""
         help_text = (
@@ -732,10 +917,17 @@ class SixSixBot(Star):
             "/rauth <QQ ID> - 移除授权用户\n"
             "/add_idol <名字> - 添加新的小偶像\n"
             "/del_idol <名字> - 删除小偶像（支持名字或昵称）\n"
-            "/reset_today - 重置今天所有用户的签到记录\n"
-            "/group <sub_cmd> - 群组管理\n"
+            "/import <文件名/内容> - 批量导入小偶像（JSON / CSV）\n"
+            "/export [json|csv] - 导出所有小偶像数据\n"
+            "/reset_today - 重置今天所有用户的签到记录（配置过的群只重置本群）\n"
+            "/group <add|update|info|list|del> - 管理本群的小偶像名单、应援口号开关和独立签到\n"
+            "/stats [reset] - 查看 / 清零插件运行统计\n"
         )
         yield event.plain_result(help_text)
 
     async def terminate(self):
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+        # 写入尚未落盘的数据
+        await self.db.close()
         logger.info("SixSixBot 插件已销毁。")
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+运行指标模块
+
+负责：
+- 统计各处理函数的调用次数、回复次数与耗时分布
+- 统计图片查找、数据保存等内部操作的耗时与写入量
+- 生成 /stats 命令与定期日志使用的文本报告
+
+耗时使用以 2 为底的对数分桶直方图记录，每次记录只需常数次整数运算，
+可以在群聊全量流量下常开
+"""
+import time
+import functools
+
+# 直方图桶数：第 i 个桶记录 [2^(i-1), 2^i) 微秒，最后一个桶兜底
+BUCKETS = 26
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图"""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, p):
+        """返回 p 分位所在桶的上界（秒）"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+
+class Metrics:
+    """插件运行指标"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.timers = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = LatencyHistogram()
+        timer.observe(seconds)
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.__init__()
+
+    def report(self):
+        """生成文本报告"""
+        uptime = int(time.time() - self.started_at)
+        lines = [f"📊 SixSixBot 运行统计（{uptime // 3600}时{uptime % 3600 // 60}分）"]
+        if self.timers:
+            lines.append("耗时（次数 / 平均 / p50 / p99 / 最大，毫秒）：")
+            for name in sorted(self.timers):
+                t = self.timers[name]
+                avg = t.total / t.count if t.count else 0.0
+                lines.append(
+                    f"• {name}: {t.count} / {avg * 1e3:.2f} / {t.percentile(0.5) * 1e3:.2f}"
+                    f" / {t.percentile(0.99) * 1e3:.2f} / {t.max * 1e3:.2f}"
+                )
+        if self.counters:
+            lines.append("计数：")
+            for name in sorted(self.counters):
+                lines.append(f"• {name}: {self.counters[name]}")
+        # 各处理函数的回复率
+        ratios = []
+        for name, t in sorted(self.timers.items()):
+            replied = self.counters.get(f"{name}.replied")
+            if replied is not None and t.count:
+                ratios.append(f"• {name}: {replied / t.count:.1%}")
+        if ratios:
+            lines.append("回复率：")
+            lines.extend(ratios)
+        return "\n".join(lines)
+
+
+def tracked(name):
+    """
+    处理函数（异步生成器）的计时装饰器，指标记录到 self.metrics
+
+    只统计处理函数自身执行的时间，不包含框架在两次 yield 之间发送消息的时间；
+    产生过回复的调用计入 <name>.replied
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            gen = func(self, *args, **kwargs)
+            elapsed = 0.0
+            replied = False
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    try:
+                        item = await gen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        elapsed += time.perf_counter() - t0
+                    replied = True
+                    yield item
+            finally:
+                await gen.aclose()
+                metrics = self.metrics
+                metrics.observe(name, elapsed)
+                if replied:
+                    metrics.incr(f"{name}.replied")
+                else:
+                    metrics.counters.setdefault(f"{name}.replied", 0)
+        return wrapper
+    return decorator
@@ -0,0 +1,57 @@
+"""
+回复缓存模块
+
+负责：
+- 缓存渲染好的回复内容（文字、发送的图片路径），重复的 /qd、热门小偶像的 /xox 直接复用，
+  不再重复查找图片、访问磁盘
+- 按最近使用顺序淘汰（LRU），条目数有上限；条目超过 ttl 秒后视为过期，
+  图片目录中新增 / 删除的图片最多延迟 ttl 秒生效
+- 命中、未命中、淘汰次数记录在运行指标中（reply_cache.hit / miss / evict），通过 /stats 查看
+
+键由调用方组合，应包含数据版本号（idols 变化后版本号改变，旧条目自然不再命中并逐渐被淘汰）
+"""
+import time
+from collections import OrderedDict
+
+
+class ReplyCache:
+    """有界 LRU 回复缓存：键 -> (写入时间, 回复内容)"""
+
+    def __init__(self, max_entries=1024, ttl=60.0, metrics=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.metrics = metrics
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.incr(f"reply_cache.{name}")
+
+    def get(self, key):
+        """返回缓存的回复内容，没有或已过期时返回 None"""
+        if self.max_entries <= 0:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(key)
+            self._count("hit")
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self._count("miss")
+        return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._count("evict")
+
+    def clear(self):
+        self._entries.clear()
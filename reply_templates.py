@@ -0,0 +1,139 @@
+"""
+回复模板模块
+
+负责：
+- 把应援口号响应、"好想宝宝" / "好想XXX" 思念回复等模板预先编译为片段 + 占位槽
+- 渲染时只需填槽并 join，不再每次拼 f-string 列表或做 in / replace
+- 思念回复模板可在配置（reply_templates）或 idols.json 中单个小偶像的 miss_templates 字段里自定义：
+  miss_templates 为列表时同时用于两种思念回复，为字典时按 miss_today / miss_other 分别设置
+
+模板中的 {name} 会被替换为小偶像名字，其余花括号原样保留
+"""
+import re
+import random
+
+# 支持的占位符
+PLACEHOLDER = re.compile(r"\{(name)\}")
+
+# 内置的思念回复模板
+DEFAULT_TEMPLATES = {
+    # "好想宝宝"：对今天签到的宝宝说思念
+    "miss_today": [
+        "{name}正在数着星星，每一颗都是对你的思念~！",
+        "{name}在月光下许愿，希望你能感受到她的想念~",
+        "{name}对着夜空轻声说：好想你呀，每一秒都在想你~",
+        "{name}在梦里遇见了你，醒来后更加思念~",
+        "{name}把对你的思念写成了诗，每一句都是爱意~"
+    ],
+    # "好想XXX"：XXX 今天没有被签到，且没有匹配到应援口号时的默认回复
+    "miss_other": [
+        "{name}也很想你~今天也要加油哦！",
+        "{name}感受到了你的思念，我的心也暖暖的~",
+        "{name}听到你的呼唤，我也在想你呢！",
+        "{name}也想和你见面呢，期待我们的下一次相遇~",
+        "{name}收到你的思念了，每一秒都在想你哦~",
+        "猜猜是谁在天天看你的微博？是{name}啦！！",
+        "{name}正在数着星星，每一颗都是对你的思念~",
+        "{name}在月光下许愿，希望你能感受到她的想念~",
+        "{name}对着夜空轻声说：好想你呀，每一秒都在想你~",
+        "{name}把对你的思念写成了诗，每一句都是爱意~"
+    ]
+}
+
+
+class CompiledTemplate:
+    """编译后的单个模板：固定片段 + 占位槽"""
+    __slots__ = ("parts", "slots")
+
+    def __init__(self, text):
+        parts = []
+        slots = []
+        pos = 0
+        for m in PLACEHOLDER.finditer(text):
+            parts.append(text[pos:m.start()])
+            slots.append((len(parts), m.group(1)))
+            parts.append("")
+            pos = m.end()
+        parts.append(text[pos:])
+        self.parts = parts
+        self.slots = tuple(slots)
+
+    def render(self, values):
+        if not self.slots:
+            return self.parts[0]
+        parts = self.parts[:]
+        for i, key in self.slots:
+            parts[i] = values[key]
+        return "".join(parts)
+
+
+class TemplateSet:
+    """一组模板，渲染时随机取一个"""
+    __slots__ = ("templates",)
+
+    def __init__(self, texts):
+        if isinstance(texts, str):
+            texts = [texts]
+        self.templates = [CompiledTemplate(t) for t in texts if isinstance(t, str)]
+
+    def __bool__(self):
+        return bool(self.templates)
+
+    def render(self, **values):
+        if not self.templates:
+            return ""
+        return random.choice(self.templates).render(values)
+
+
+class ReplyTemplates:
+    """插件全部回复模板的编译缓存"""
+
+    def __init__(self, config_templates=None):
+        config_templates = config_templates or {}
+        # 全局思念回复模板：配置中的非空列表优先，否则使用内置模板
+        self.defaults = {
+            kind: TemplateSet(config_templates.get(kind) or texts)
+            for kind, texts in DEFAULT_TEMPLATES.items()
+        }
+        self._catchphrases = {}  # (小偶像, 触发句) -> TemplateSet
+        self._idol_miss = {}     # (小偶像, 种类) -> TemplateSet 或 None（未自定义）
+
+    def rebuild(self, idols):
+        """加载时一次性编译全部应援口号响应"""
+        self.clear()
+        for idol_name, idol_data in idols.items():
+            for trigger, response in idol_data.get("catchphrases", {}).items():
+                self._catchphrases[(idol_name, trigger)] = TemplateSet(response)
+
+    def catchphrase(self, idol_name, trigger, response):
+        """获取（必要时编译）某条应援口号的响应模板"""
+        key = (idol_name, trigger)
+        compiled = self._catchphrases.get(key)
+        if compiled is None:
+            compiled = self._catchphrases[key] = TemplateSet(response)
+        return compiled
+
+    def miss(self, kind, idol_name, idol_data=None):
+        """获取思念回复模板：小偶像自定义的 miss_templates 优先，否则使用全局模板"""
+        key = (idol_name, kind)
+        custom = self._idol_miss.get(key, False)
+        if custom is False:
+            texts = (idol_data or {}).get("miss_templates")
+            if isinstance(texts, dict):
+                texts = texts.get(kind)
+            custom = self._idol_miss[key] = TemplateSet(texts) if texts else None
+        return custom or self.defaults[kind]
+
+    def invalidate(self, idol_name, trigger=None):
+        """响应内容变化时丢弃已编译的模板（trigger 为空时丢弃该小偶像的全部模板）"""
+        if trigger is not None:
+            self._catchphrases.pop((idol_name, trigger), None)
+            return
+        for key in [k for k in self._catchphrases if k[0] == idol_name]:
+            del self._catchphrases[key]
+        for key in [k for k in self._idol_miss if k[0] == idol_name]:
+            del self._idol_miss[key]
+
+    def clear(self):
+        self._catchphrases.clear()
+        self._idol_miss.clear()
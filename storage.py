@@ -0,0 +1,582 @@
+"""
+存储后端模块
+
+负责：
+- JsonStorage：每个数据集一个 JSON 文件（默认，兼容旧版本）
+- SqliteStorage：所有数据集存放在一个 WAL 模式的 SQLite 数据库中，
+  用户、签到、小偶像、昵称、应援口号各有带索引的表，签到按行写入；
+  保存小偶像和用户时与上一次写入的内容比较，只写入有变化的行
+- 首次启用 SQLite 时从现有 JSON 文件一次性迁移
+
+两种后端对 DataManager 暴露相同的接口：
+load(key) / snapshot(key, data) / write(key, snapshot) / close()
+write 返回写入量（JSON 为字节数，SQLite 为行数），失败返回 0
+其中 snapshot 在事件循环中调用（拷贝当前数据），write 在线程池中调用；
+SQLite 后端（supports_events 为 True）另有按行写入签到的 apply_event(event)，
+以及与按行写入共用同一写入线程的 submit_write
+
+多个进程共用同一个 data 目录时：
+- 每个数据集都有版本戳（JSON 为文件的 inode / mtime / 大小，SQLite 为 kv 表中的计数），
+  version(key) 只需一次 stat 或一次主键查询，用于低成本地发现其他进程的修改
+- write_versioned 在文件锁（SQLite 为写事务）内比较版本戳后再写入，
+  版本不一致时抛出 StaleVersion，由调用方用 merge_changes 三方合并后重试
+"""
+import os
+import json
+import errno
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .checkin_journal import CheckinJournal, checkins_from_users
+
+# 数据集的空结构
+EMPTY = {
+    "idols": dict,
+    "users": dict,
+    "checkins": dict,
+    "groups": dict,
+    "admins": list
+}
+
+
+def atomic_write_text(path, text):
+    """原子写入文本文件（先写临时文件再替换），带异常处理，返回写入的字节数，失败返回 0"""
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        payload = text.encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return len(payload)
+    except (IOError, OSError) as e:
+        # 记录错误但不抛出异常，避免影响主流程
+        logging.error(f"保存文件 {path} 失败: {e}")
+        return 0
+
+
+def json_default(obj):
+    """JSON 序列化非 dict 的映射（如压缩后的签到分区）"""
+    if isinstance(obj, Mapping):
+        return dict(obj.items())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StaleVersion(Exception):
+    """数据集已被其他进程修改：写入时的版本戳与读取时不一致"""
+
+
+class FileLock:
+    """
+    跨进程文件锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）
+
+    同一进程内可重入；加锁失败（如只读目录）时记录警告并退化为进程内互斥
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                logging.warning(f"无法打开锁文件 {self.path}: {e}")
+                return self
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError as e:
+                            # LK_LOCK 重试 10 秒后仍未拿到锁会报 EDEADLK / EACCES，继续等待；其他错误不再重试
+                            if e.errno not in (errno.EDEADLK, errno.EACCES):
+                                raise
+            except OSError as e:
+                logging.warning(f"锁文件 {self.path} 加锁失败: {e}")
+            self._fd = fd
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+def merge_changes(base, ours, theirs):
+    """
+    三方合并：把本进程相对 base 的修改应用到其他进程写入的 theirs 上
+
+    - 字典按键逐层合并，本进程没有改动的键保留 theirs 的值，新增 / 删除的键同样生效
+    - 列表按元素合并（如管理员列表），保留 theirs 的顺序，追加本进程新增的元素
+    - 其余值在双方都修改时以本进程为准
+    base 为 None（未保存读取时的内容）时，本进程的条目覆盖 theirs，但不删除任何条目
+    """
+    if isinstance(ours, list) and isinstance(theirs, list):
+        base_items = base if isinstance(base, list) else []
+        removed = [x for x in base_items if x not in ours]
+        merged = [x for x in theirs if x not in removed]
+        merged.extend(x for x in ours if x not in base_items and x not in merged)
+        return merged
+    if not (isinstance(ours, Mapping) and isinstance(theirs, dict)):
+        return theirs if ours == base else ours
+    base_map = base if isinstance(base, dict) else None
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if base_map is not None and key in base_map and base_map[key] == value:
+            continue  # 本进程没有修改
+        if key in merged:
+            merged[key] = merge_changes(base_map.get(key) if base_map is not None else None,
+                                        value, merged[key])
+        else:
+            merged[key] = value
+    if base_map is not None:
+        for key in base_map:
+            if key not in ours:
+                merged.pop(key, None)  # 本进程删除的键
+    return merged
+
+
+class JsonStorage:
+    """JSON 文件存储后端"""
+    supports_events = False
+
+    def __init__(self, files):
+        self.files = files
+        # 多个进程共用 data 目录时，写入与签到日志都在这把锁内进行
+        data_dir = os.path.dirname(next(iter(files.values())))
+        self.lock = FileLock(os.path.join(data_dir, ".xox.lock"))
+
+    def version(self, key):
+        """数据文件的版本戳（inode、修改时间、大小），文件不存在时为 None"""
+        try:
+            st = os.stat(self.files[key])
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load_versioned(self, key, repair=True):
+        """读取数据集及其版本戳"""
+        with self.lock:
+            return self.load(key, repair), self.version(key)
+
+    def load(self, key, repair=True):
+        """读取数据集，文件不存在或已损坏时返回 None
+
+        repair 为 False 时（热重载手工编辑的文件）不备份也不重置损坏的文件，直接抛出 JSONDecodeError
+        """
+        path = self.files[key]
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            if not repair:
+                raise
+            # 如果文件损坏，先备份原文件，避免数据被静默覆盖
+            logging.error(f"数据文件 {path} 已损坏，已备份为 {path}.corrupt 并重置")
+            try:
+                os.replace(path, path + ".corrupt")
+            except OSError:
+                pass
+            return None
+
+    def snapshot(self, key, data):
+        return json.dumps(data, ensure_ascii=False, indent=2, default=json_default)
+
+    def write(self, key, snapshot):
+        return atomic_write_text(self.files[key], snapshot)
+
+    def write_versioned(self, key, snapshot, expected):
+        """版本戳与 expected 一致时写入，返回 (写入量, 新版本戳)；否则抛出 StaleVersion"""
+        with self.lock:
+            if self.version(key) != expected:
+                raise StaleVersion(key)
+            written = self.write(key, snapshot)
+            return written, self.version(key)
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """SQLite 存储后端（WAL 模式）"""
+    supports_events = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS idols (
+            name TEXT PRIMARY KEY,
+            info TEXT,
+            extra TEXT,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS nicknames (
+            idol TEXT NOT NULL,
+            nickname TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (idol, nickname)
+        );
+        CREATE INDEX IF NOT EXISTS idx_nicknames_nickname ON nicknames(nickname);
+        CREATE TABLE IF NOT EXISTS catchphrases (
+            idol TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            response TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (idol, trigger)
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            uid TEXT PRIMARY KEY,
+            extra TEXT
+        );
+        DROP INDEX IF EXISTS idx_users_last_checkin;
+        CREATE TABLE IF NOT EXISTS checkins (
+            day TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            idol TEXT,
+            PRIMARY KEY (day, uid)
+        );
+        CREATE TABLE IF NOT EXISTS kv (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    # 小偶像记录中由独立列保存的字段，其余字段放进 extra
+    IDOL_FIELDS = ("nicknames", "info", "catchphrases")
+    # 保存时只写入变化行的数据集：数据集 -> 各表的 (表名, 主键列数, 列名)，快照中各表的行以主键列开头
+    DIFF_TABLES = {
+        "idols": (("idols", 1, ("name", "info", "extra", "position")),
+                  ("nicknames", 2, ("idol", "nickname", "position")),
+                  ("catchphrases", 2, ("idol", "trigger", "response", "position"))),
+        "users": (("users", 1, ("uid", "extra")),),
+    }
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # 按行写入的事件在专用线程中按提交顺序执行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xox-sqlite")
+        # DIFF_TABLES 中的数据集在数据库中的内容：数据集 -> (版本号, 各表 主键 -> 行)；
+        # 版本号与数据库一致时保存只写入差异，否则（如其他进程写入过）整表重写
+        self._written = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # 数据库之外的共享文件（如签到归档）在这把跨进程锁内读写
+        self.lock = FileLock(os.path.join(os.path.dirname(db_path), ".xox.lock"))
+        # 签到改为按天分区之前创建的数据库，users 表还有 last_checkin / today_idol 列：
+        # 读取时带上这两列，首次加载签到时由 checkins_from_users 拆分到签到分区
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(users)")}
+        self._legacy_users = "last_checkin" in columns
+
+    # --- 读取 ---
+
+    def load(self, key, repair=True):
+        """读取数据集，从未写入过时返回 None（repair 仅为与 JsonStorage 接口一致）"""
+        with self._lock:
+            return self._load(key)
+
+    def load_versioned(self, key, repair=True):
+        """在同一个读事务中读取数据集及其版本号"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                data, version = self._load(key), self._version(key)
+            finally:
+                self._conn.execute("COMMIT")
+            if data is not None and key in self.DIFF_TABLES:
+                self._written[key] = (version, self._keyed_rows(key, self.snapshot(key, data)))
+            return data, version
+
+    def submit_load(self, key):
+        """在写入线程中执行 load_versioned，返回 Future（排在此前提交的按行写入之后）"""
+        return self._executor.submit(self.load_versioned, key)
+
+    def version(self, key):
+        """数据集的版本号（每次写入递增），从未写入过时为 None"""
+        with self._lock:
+            return self._version(key)
+
+    def _version(self, key):
+        value = self._get_kv(f"version:{key}")
+        return int(value) if value is not None else None
+
+    def _load(self, key):
+        if self._get_kv(f"init:{key}") is None:
+            return None
+        if key == "idols":
+            return self._load_idols()
+        if key == "users":
+            return self._load_users()
+        if key == "checkins":
+            return self._load_checkins()
+        value = self._get_kv(f"data:{key}")
+        return json.loads(value) if value is not None else None
+
+    def has(self, key):
+        """数据集是否已经写入过（不读取数据本身）"""
+        with self._lock:
+            return self._get_kv(f"init:{key}") is not None
+
+    def _get_kv(self, key):
+        row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _load_idols(self):
+        idols = {}
+        for name, info, extra in self._conn.execute(
+                "SELECT name, info, extra FROM idols ORDER BY position"):
+            record = {"nicknames": [], "catchphrases": {}}
+            if info is not None:
+                record["info"] = info
+            if extra:
+                record.update(json.loads(extra))
+            idols[name] = record
+        for idol, nickname in self._conn.execute(
+                "SELECT idol, nickname FROM nicknames ORDER BY idol, position"):
+            if idol in idols:
+                idols[idol]["nicknames"].append(nickname)
+        for idol, trigger, response in self._conn.execute(
+                "SELECT idol, trigger, response FROM catchphrases ORDER BY idol, position"):
+            if idol in idols:
+                idols[idol]["catchphrases"][trigger] = json.loads(response)
+        return idols
+
+    def _load_users(self):
+        if self._legacy_users:
+            return {uid: self._legacy_user_record(*rest) for uid, *rest in self._conn.execute(
+                "SELECT uid, last_checkin, today_idol, extra FROM users")}
+        return {uid: json.loads(extra) if extra else {}
+                for uid, extra in self._conn.execute("SELECT uid, extra FROM users")}
+
+    def _load_checkins(self):
+        checkins = {}
+        for day, uid, idol in self._conn.execute("SELECT day, uid, idol FROM checkins ORDER BY day"):
+            checkins.setdefault(day, {})[uid] = idol
+        return checkins
+
+    @staticmethod
+    def _legacy_user_record(last_checkin, today_idol, extra):
+        record = json.loads(extra) if extra else {}
+        if last_checkin is not None:
+            record["last_checkin"] = last_checkin
+        if today_idol is not None:
+            record["today_idol"] = today_idol
+        return record
+
+    # --- 写入 ---
+
+    def snapshot(self, key, data):
+        """在事件循环中把数据集拷贝为待写入的行"""
+        if key == "idols":
+            idol_rows, nick_rows, phrase_rows = [], [], []
+            for pos, (name, record) in enumerate(data.items()):
+                extra = {k: v for k, v in record.items() if k not in self.IDOL_FIELDS}
+                idol_rows.append((name, record.get("info"),
+                                  json.dumps(extra, ensure_ascii=False) if extra else None, pos))
+                # 重复的昵称只保留第一个（与表的主键一致），写入的行与读回后再生成的行相同
+                for i, nick in enumerate(dict.fromkeys(record.get("nicknames", []))):
+                    nick_rows.append((name, nick, i))
+                for i, (trigger, response) in enumerate(record.get("catchphrases", {}).items()):
+                    phrase_rows.append((name, trigger, json.dumps(response, ensure_ascii=False), i))
+            return idol_rows, nick_rows, phrase_rows
+        if key == "users":
+            return [(uid, json.dumps(record, ensure_ascii=False) if record else None)
+                    for uid, record in data.items()]
+        if key == "checkins":
+            return [(day, uid, idol) for day, part in data.items() for uid, idol in part.items()]
+        return json.dumps(data, ensure_ascii=False)
+
+    def write(self, key, snapshot):
+        """整体替换一个数据集（单个事务），返回写入的行数，失败返回 0"""
+        return self._write_txn(key, snapshot)[0]
+
+    def write_versioned(self, key, snapshot, expected):
+        """版本号与 expected 一致时写入，返回 (写入行数, 新版本号)；否则抛出 StaleVersion"""
+        return self._write_txn(key, snapshot, expected, check=True)
+
+    def _write_txn(self, key, snapshot, expected=None, check=False):
+        try:
+            with self._lock:
+                # IMMEDIATE：开始事务时即取得写锁，其他进程的写入在此期间等待
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    current = self._version(key)
+                    if check and current != expected:
+                        raise StaleVersion(key)
+                    rows, written = self._write_rows(key, snapshot, current)
+                    self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, '1')", (f"init:{key}",))
+                    version = self._bump_version(key)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                if written is not None:
+                    self._written[key] = (version, written)
+            return max(rows, 1), version
+        except sqlite3.Error as e:
+            logging.error(f"写入数据库 {self.db_path} ({key}) 失败: {e}")
+            self._written.pop(key, None)
+            return 0, expected
+
+    def _keyed_rows(self, key, snapshot):
+        """把快照转换为各表的 主键 -> 行（同一主键只保留第一行）"""
+        tables = self.DIFF_TABLES[key]
+        keyed = []
+        for (_, nkey, _), rows in zip(tables, snapshot if len(tables) > 1 else (snapshot,)):
+            table = {}
+            for row in rows:
+                table.setdefault(row[:nkey], row)
+            keyed.append(table)
+        return keyed
+
+    def _write_rows(self, key, snapshot, version):
+        """写入数据集的行，返回 (写入的行数, 写入后各表的内容或 None)"""
+        if key in self.DIFF_TABLES:
+            keyed = self._keyed_rows(key, snapshot)
+            written = self._written.get(key)
+            previous = written[1] if written is not None and written[0] == version else None
+            rows = 0
+            for i, ((table, nkey, columns), new) in enumerate(zip(self.DIFF_TABLES[key], keyed)):
+                rows += self._sync_table(table, nkey, columns, new, previous[i] if previous else None)
+            return rows, keyed
+        if key == "checkins":
+            self._conn.execute("DELETE FROM checkins")
+            self._conn.executemany("INSERT INTO checkins VALUES (?, ?, ?)", snapshot)
+            return len(snapshot), None
+        self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (f"data:{key}", snapshot))
+        return 1, None
+
+    def _sync_table(self, table, nkey, columns, rows, previous):
+        """
+        把表的内容更新为 rows（主键 -> 行），返回写入的行数
+
+        previous 为表中现有的内容时只删除消失的主键、写入新增或变化的行；为 None 时整表重写
+        """
+        insert = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        if previous is None:
+            self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany(insert, rows.values())
+            return len(rows)
+        deleted = [pk for pk in previous if pk not in rows]
+        changed = [row for pk, row in rows.items() if previous.get(pk) != row]
+        where = " AND ".join(f"{column} = ?" for column in columns[:nkey])
+        self._conn.executemany(f"DELETE FROM {table} WHERE {where}", deleted)
+        self._conn.executemany(insert, changed)
+        return len(deleted) + len(changed)
+
+    def _bump_version(self, key):
+        """在当前事务中递增数据集的版本号并返回"""
+        version = (self._version(key) or 0) + 1
+        self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (f"version:{key}", str(version)))
+        return version
+
+    def submit_write(self, key, snapshot, expected):
+        """
+        在写入线程中执行 write_versioned，返回 Future
+
+        与 apply_event 共用同一个线程，保证快照与之后的按行写入不会乱序
+        """
+        return self._executor.submit(self.write_versioned, key, snapshot, expected)
+
+    def apply_event(self, event):
+        """按行写入一条签到 / 重置 / 过期事件，返回 Future（结果为写入后签到数据的版本号）"""
+        return self._executor.submit(self._apply_event, event)
+
+    def _apply_event(self, event):
+        op = event.get("op")
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if op == "checkin":
+                        self._conn.execute("INSERT OR REPLACE INTO checkins VALUES (?, ?, ?)",
+                                           (event["date"], event["uid"], event["idol"]))
+                    elif op == "reset":
+                        self._conn.execute("DELETE FROM checkins WHERE day = ?", (event["date"],))
+                    elif op == "expire":
+                        self._conn.execute("DELETE FROM checkins WHERE day < ?", (event["before"],))
+                    version = self._bump_version("checkins")
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            return version
+        except sqlite3.Error as e:
+            logging.error(f"写入数据库 {self.db_path} 失败: {e}")
+            return None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_storage, sqlite_storage, journal_path=None):
+    """
+    一次性把 JSON 文件中的数据迁移到 SQLite（仅迁移 SQLite 中尚不存在的数据集）
+
+    旧版本保存在用户记录中的签到会拆分为按天分区的签到数据；
+    如果存在未压缩的签到日志，会先重放到签到数据中再迁移
+    """
+    migrated = []
+    legacy_checkins = None
+    for key in EMPTY:
+        if sqlite_storage.has(key):
+            continue
+        data = json_storage.load(key)
+        if key == "users" and data is not None and json_storage.load("checkins") is None:
+            legacy_checkins = checkins_from_users(data)
+        if key == "checkins":
+            if data is None:
+                data = legacy_checkins
+            if data is not None and journal_path:
+                CheckinJournal(journal_path).replay(data)
+        if data is None:
+            continue
+        if sqlite_storage.write(key, sqlite_storage.snapshot(key, data)):
+            migrated.append(key)
+    if migrated:
+        logging.info(f"已从 JSON 文件迁移到 SQLite：{', '.join(migrated)}")
+    return migrated
+
+
+def create_storage(backend, data_dir, files):
+    """根据配置创建存储后端"""
+    if backend == "sqlite":
+        storage = SqliteStorage(os.path.join(data_dir, "xox.sqlite3"))
+        migrate_json_to_sqlite(JsonStorage(files), storage,
+                               os.path.join(data_dir, "users.journal.jsonl"))
+        return storage
+    return JsonStorage(files)
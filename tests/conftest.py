@@ -0,0 +1,17 @@
+"""
+测试公共设置
+
+插件的模块之间使用相对导入，这里把插件目录注册为 astrbot_plugin_xox 包，
+不需要安装 AstrBot 即可导入不依赖 AstrBot 的模块（存储合并、口号匹配、紧凑签到等）
+"""
+import os
+import sys
+import types
+
+PLUGIN_NAME = "astrbot_plugin_xox"
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PLUGIN_NAME not in sys.modules:
+    _pkg = types.ModuleType(PLUGIN_NAME)
+    _pkg.__path__ = [PLUGIN_DIR]
+    sys.modules[PLUGIN_NAME] = _pkg
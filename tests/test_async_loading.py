@@ -0,0 +1,99 @@
+"""事件循环中的代码通过 aload 加载数据集，不在事件循环中同步读取文件"""
+import asyncio
+import json
+import time
+
+from astrbot_plugin_xox.data_manager import DataManager
+
+LOAD_DELAY = 0.2
+
+
+def make_manager(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "checkins.json").write_text(json.dumps({"2024-05-01": {"1": "a"}}), encoding="utf-8")
+    db = DataManager(str(tmp_path), None, {"save_interval": 0, "image_resize_enabled": False})
+    loads = []
+    load_versioned = db.storage.load_versioned
+
+    def slow_load(key, *args, **kwargs):
+        loads.append(key)
+        if key == "checkins":
+            time.sleep(LOAD_DELAY)  # 模拟很大的签到历史
+        return load_versioned(key, *args, **kwargs)
+
+    db.storage.load_versioned = slow_load
+    return db, loads
+
+
+async def max_stall(coro):
+    """运行 coro，返回期间事件循环最长一次没有响应的时间"""
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await coro
+    done = True
+    await task
+    return stall
+
+
+def test_aload_runs_off_the_loop(tmp_path):
+    db, loads = make_manager(tmp_path)
+
+    async def main():
+        stall = await max_stall(db.aload("groups", "checkins"))
+        assert db.data.is_loaded("checkins")
+        assert db.data["checkins"]["2024-05-01"]["1"] == "a"
+        await db.close()
+        return stall
+
+    assert asyncio.run(main()) < LOAD_DELAY / 2
+    assert "load.on_loop" not in db.metrics.counters
+
+
+def test_aload_waits_for_running_preload(tmp_path):
+    db, loads = make_manager(tmp_path)
+
+    async def main():
+        db.start_preload()
+        await asyncio.sleep(0)
+        stall = await max_stall(db.aload("checkins"))
+        await db.close()
+        return stall
+
+    assert asyncio.run(main()) < LOAD_DELAY / 2
+    assert loads.count("checkins") == 1
+
+
+def test_aload_returns_immediately_when_loaded(tmp_path):
+    db, loads = make_manager(tmp_path)
+    db.load_all()
+
+    async def main():
+        await db.aload("checkins", "groups", "admins")
+        await db.close()
+
+    asyncio.run(main())
+    assert loads.count("checkins") == 1
+
+
+def test_sync_load_on_loop_is_reported(tmp_path):
+    db, _ = make_manager(tmp_path)
+
+    async def main():
+        db.data["admins"]
+        await db.close()
+
+    asyncio.run(main())
+    assert db.metrics.counters["load.on_loop"] == 1
@@ -0,0 +1,79 @@
+"""CatchphraseMatcher 的命中顺序与原先的逐个 in 判断一致"""
+import random
+
+from astrbot_plugin_xox.catchphrase_matcher import CatchphraseMatcher
+from astrbot_plugin_xox.text_normalize import normalize
+
+
+def nested_first_match(idols, msg, normalize=None):
+    """原先的实现：按小偶像顺序、再按口号顺序逐个 in 判断"""
+    text = normalize(msg) if normalize else msg
+    for idol_name, idol_data in idols.items():
+        for trigger in idol_data.get("catchphrases", {}):
+            pattern = normalize(trigger) if normalize else trigger
+            if pattern in text if pattern else trigger in msg:
+                return idol_name, trigger
+    return None
+
+
+def random_idols(rng, alphabet="abc", idol_count=6):
+    idols = {}
+    for i in range(idol_count):
+        triggers = {"".join(rng.choices(alphabet, k=rng.randint(1, 3))) for _ in range(rng.randint(0, 4))}
+        idols[f"idol{i}"] = {"catchphrases": {t: "resp" for t in triggers}}
+    return idols
+
+
+def random_messages(rng, alphabet="abcd", count=200):
+    return ["".join(rng.choices(alphabet, k=rng.randint(0, 8))) for _ in range(count)]
+
+
+def test_overlapping_triggers_rank_by_idol_then_trigger_order():
+    idols = {
+        "A": {"catchphrases": {"诗然": "r", "乔": "r"}},
+        "B": {"catchphrases": {"乔诗然": "r"}},
+    }
+    matcher = CatchphraseMatcher(idols)
+    # 后出现在消息中、但小偶像更靠前的触发句优先
+    assert matcher.first_match("乔诗然冲") == ("A", "诗然")
+    assert matcher.first_match("乔") == ("A", "乔")
+    assert matcher.first_match("然") is None
+
+
+def test_matches_nested_loop_on_random_data():
+    rng = random.Random(20240501)
+    for _ in range(30):
+        idols = random_idols(rng)
+        matcher = CatchphraseMatcher(idols)
+        for msg in random_messages(rng):
+            assert matcher.first_match(msg) == nested_first_match(idols, msg), (idols, msg)
+
+
+def test_incremental_updates_match_nested_loop():
+    rng = random.Random(7)
+    for _ in range(10):
+        target = random_idols(rng)
+        idols = {}
+        matcher = CatchphraseMatcher()
+        for idol_name, idol_data in target.items():
+            idols[idol_name] = {"catchphrases": {}}
+            matcher.add_idol(idol_name)
+            for trigger in idol_data["catchphrases"]:
+                idols[idol_name]["catchphrases"][trigger] = "resp"
+                matcher.add(idol_name, trigger)
+        removed = rng.choice(list(idols))
+        del idols[removed]
+        matcher.remove_idol(removed)
+        for msg in random_messages(rng, count=100):
+            assert matcher.first_match(msg) == nested_first_match(idols, msg), (idols, msg)
+
+
+def test_normalized_matching_matches_nested_loop():
+    idols = {
+        "乔诗然": {"catchphrases": {"詩然衝啊": "r", "❤️": "r"}},
+        "林小语": {"catchphrases": {"ＬＯＶＥ 小语": "r", "❤": "r"}},
+    }
+    matcher = CatchphraseMatcher(idols, normalize)
+    for msg in ["诗然冲啊！", "love，小语", "❤", "❤️❤", "LOVE 小语 ❤️", "没有命中", ""]:
+        expected = nested_first_match(idols, msg, normalize)
+        assert matcher.first_match(normalize(msg), msg) == expected, msg
@@ -0,0 +1,107 @@
+"""多个 DataManager 共用 data 目录时，过期分区只归档一次"""
+import asyncio
+import datetime
+import json
+import os
+import threading
+
+import pytest
+
+from astrbot_plugin_xox.data_manager import DataManager
+
+TODAY = datetime.date.today()
+OLD = (TODAY - datetime.timedelta(days=40)).isoformat()
+OLDER = (TODAY - datetime.timedelta(days=41)).isoformat()
+
+
+def make_data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    checkins = {
+        OLDER: {"1": "a"},
+        OLD: {"1": "b", "2": "c"},
+        OLD + "@123": {"3": "a"},
+        TODAY.isoformat(): {"4": "c"},
+    }
+    (data_dir / "checkins.json").write_text(json.dumps(checkins), encoding="utf-8")
+    return str(tmp_path)
+
+
+def open_manager(root, backend):
+    config = {"save_interval": 0, "image_resize_enabled": False, "storage_backend": backend}
+    db = DataManager(root, None, config)
+    db.data["checkins"]  # 两个进程都在对方归档之前读取了签到数据
+    return db
+
+
+def archive_lines(db):
+    with open(db.archive_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_two_managers_archive_once(tmp_path, backend):
+    root = make_data_dir(tmp_path)
+    first, second = open_manager(root, backend), open_manager(root, backend)
+    try:
+        assert first.has_checked_in("4")
+        assert second.has_checked_in("4")
+        lines = archive_lines(first)
+        assert [line["date"] for line in lines] == [OLDER, OLD, OLD + "@123"]
+        assert lines[1]["checkins"] == {"1": "b", "2": "c"}
+        # 两个进程都删除了内存中的过期分区
+        for db in (first, second):
+            assert sorted(db.data["checkins"]) == [TODAY.isoformat()]
+    finally:
+        asyncio.run(first.close())
+        asyncio.run(second.close())
+
+
+def test_concurrent_expiry_archives_once(tmp_path):
+    root = make_data_dir(tmp_path)
+    managers = [open_manager(root, "json") for _ in range(4)]
+    barrier = threading.Barrier(len(managers))
+
+    def roll(db):
+        barrier.wait()
+        db.has_checked_in("4")
+
+    threads = [threading.Thread(target=roll, args=(db,)) for db in managers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert [line["date"] for line in archive_lines(managers[0])] == [OLDER, OLD, OLD + "@123"]
+    finally:
+        for db in managers:
+            asyncio.run(db.close())
+
+
+def test_later_expiry_appends_new_partitions_only(tmp_path):
+    root = make_data_dir(tmp_path)
+    db = open_manager(root, "json")
+    try:
+        db.has_checked_in("4")
+        # 模拟之后的一天：另一个分区也过期了，已归档的分区不会再次写入
+        newer = (TODAY - datetime.timedelta(days=35)).isoformat()
+        db.data["checkins"][newer] = {"9": "a"}
+        db._archive_partitions([(OLD, {"1": "b", "2": "c"}), (newer, {"9": "a"})])
+        assert [line["date"] for line in archive_lines(db)] == [OLDER, OLD, OLD + "@123", newer]
+    finally:
+        asyncio.run(db.close())
+
+
+def test_archived_keys_reads_long_lines(tmp_path):
+    root = make_data_dir(tmp_path)
+    db = open_manager(root, "json")
+    try:
+        big = {str(uid): "idol" for uid in range(20000)}  # 单行远大于读取块
+        db._archive_partitions([(OLDER, {"1": "a"}), (OLD, big)])
+        with open(db.archive_file, "a", encoding="utf-8") as f:
+            f.write("\n")
+        assert db._archived_keys(OLDER) == {OLDER, OLD}
+        assert db._archived_keys(OLD) == {OLD}
+        assert os.path.getsize(db.archive_file) > 1 << 16
+    finally:
+        asyncio.run(db.close())
@@ -0,0 +1,66 @@
+"""FrozenPartition 与原字典的内容一致（包括非纯数字的用户ID）"""
+import json
+
+import pytest
+
+from astrbot_plugin_xox.compact_checkins import FrozenPartition, IdolCodes, compact_checkins
+
+# 不能按数字保存的用户ID：前导零、非 ASCII 数字、空白、下划线、符号、超长数字、字母
+ODD_UIDS = ["0012", "０１２", "１２３", " 12", "12 ", "1_000", "-5", "+5", "12345678901234567890", "abc", "wx_o1a2", ""]
+NUMERIC_UIDS = ["0", "7", "12", "1000", "9999999999999999999", "123456789"]
+
+
+def make_partition(uids):
+    return {uid: f"idol{i % 3}" for i, uid in enumerate(uids)}
+
+
+@pytest.mark.parametrize("uids", [NUMERIC_UIDS, ODD_UIDS, NUMERIC_UIDS + ODD_UIDS, ["12", "012"], []])
+def test_round_trip(uids):
+    part = make_partition(uids)
+    frozen = FrozenPartition(part, IdolCodes())
+    assert len(frozen) == len(part)
+    assert dict(frozen) == part
+    assert dict(frozen.items()) == part
+    for uid, idol in part.items():
+        assert uid in frozen
+        assert frozen[uid] == idol
+    # 序列化后的内容与原字典一致
+    assert json.loads(json.dumps(dict(frozen.items()))) == part
+
+
+def test_numeric_lookalikes_are_distinct_users():
+    frozen = FrozenPartition({"12": "a", "012": "b", "１２": "c"}, IdolCodes())
+    assert frozen["12"] == "a"
+    assert frozen["012"] == "b"
+    assert frozen["１２"] == "c"
+    assert "0012" not in frozen
+
+
+def test_mutation_after_freezing():
+    part = make_partition(NUMERIC_UIDS + ODD_UIDS)
+    frozen = FrozenPartition(part, IdolCodes())
+    for uid in ["7", "0012", "abc"]:
+        del frozen[uid]
+        del part[uid]
+    for uid, idol in [("8", "new"), ("0008", "new"), ("12", "changed"), ("wx_o1a2", "changed")]:
+        frozen[uid] = idol
+        part[uid] = idol
+    assert dict(frozen) == part
+    with pytest.raises(KeyError):
+        del frozen["7"]
+    with pytest.raises(KeyError):
+        frozen["0012"]
+
+
+def test_compact_checkins_only_freezes_past_partitions():
+    checkins = {
+        "2024-05-01": make_partition(ODD_UIDS),
+        "2024-05-01@123": make_partition(NUMERIC_UIDS),
+        "2024-05-02": make_partition(NUMERIC_UIDS),
+    }
+    expected = {date: dict(part) for date, part in checkins.items()}
+    compact_checkins(checkins, "2024-05-02", IdolCodes())
+    assert isinstance(checkins["2024-05-01"], FrozenPartition)
+    assert isinstance(checkins["2024-05-01@123"], FrozenPartition)
+    assert isinstance(checkins["2024-05-02"], dict)
+    assert {date: dict(part) for date, part in checkins.items()} == expected
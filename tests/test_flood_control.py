@@ -0,0 +1,103 @@
+"""刷屏限流：GCRA 令牌桶的突发与补充，按用户、按群两级限流"""
+import pytest
+
+from astrbot_plugin_xox import flood_control
+from astrbot_plugin_xox.flood_control import FloodControl, TokenBucketLimiter
+
+
+def test_burst_then_denied():
+    limiter = TokenBucketLimiter(rate=1.0, burst=3)
+    assert [limiter.allow("u", now=100.0) for _ in range(4)] == [True, True, True, False]
+    # 其他键有各自的桶
+    assert limiter.allow("v", now=100.0)
+
+
+def test_refill_one_token_per_interval():
+    limiter = TokenBucketLimiter(rate=0.5, burst=2)  # 每 2 秒补充一个令牌
+    assert limiter.allow("u", now=0.0)
+    assert limiter.allow("u", now=0.0)
+    assert not limiter.allow("u", now=1.9)
+    assert limiter.allow("u", now=2.0)
+    assert not limiter.allow("u", now=2.0)
+    # 空闲足够久后恢复完整的突发量，而不是更多
+    assert [limiter.allow("u", now=100.0) for _ in range(3)] == [True, True, False]
+
+
+def test_steady_rate_is_allowed():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    assert all(limiter.allow("u", now=float(t)) for t in range(20))
+    assert not limiter.allow("u", now=19.5)
+
+
+def test_check_does_not_consume():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    for _ in range(5):
+        assert limiter.check("u", 0.0)
+    limiter.consume("u", 0.0)
+    assert not limiter.check("u", 0.0)
+    assert limiter.check("u", 1.0)
+
+
+def test_full_buckets_expire():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2)
+    limiter.allow("a", now=0.0)
+    limiter.allow("b", now=0.5)
+    assert len(limiter) == 2
+    limiter.allow("c", now=1.2)  # a 的桶已在 1.0 装满，被删除
+    assert len(limiter) == 2
+    limiter.allow("d", now=10.0)
+    assert len(limiter) == 1
+
+
+def test_max_keys_evicts_least_recently_used():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_keys=3)
+    for key in "abcd":
+        limiter.allow(key, now=0.0)
+    assert len(limiter) == 3
+    # 被淘汰的 a 重新获得满桶，仍在表中的 d 没有令牌
+    assert limiter.allow("a", now=0.0)
+    assert not limiter.allow("d", now=0.0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(flood_control.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_disabled_by_default(clock):
+    control = FloodControl({})
+    assert not control.enabled
+    assert all(control.allow("u", "g") for _ in range(100))
+
+
+def test_user_and_group_levels(clock):
+    control = FloodControl({"flood_control": True, "flood_user_per_minute": 6, "flood_user_burst": 2,
+                            "flood_group_per_minute": 60, "flood_group_burst": 3})
+    assert control.allow("u1", "g")
+    assert control.allow("u1", "g")
+    assert not control.allow("u1", "g")   # 用户的突发量用完
+    assert control.allow("u2", "g")
+    assert not control.allow("u3", "g")   # 群的突发量用完
+    assert control.allow("u3", "other")   # 其他群不受影响
+    assert control.allow("u4")            # 私聊只按用户限流
+    clock[0] += 1.0                       # 群每秒补充一个令牌
+    assert control.allow("u3", "g")
+
+
+def test_denied_user_does_not_consume_group_tokens(clock):
+    control = FloodControl({"flood_control": True, "flood_user_per_minute": 6, "flood_user_burst": 1,
+                            "flood_group_per_minute": 60, "flood_group_burst": 2})
+    assert control.allow("u1", "g")
+    for _ in range(5):
+        assert not control.allow("u1", "g")
+    assert control.allow("u2", "g")
+
+
+def test_zero_per_minute_disables_level(clock):
+    control = FloodControl({"flood_control": True, "flood_user_per_minute": 0,
+                            "flood_group_per_minute": 60, "flood_group_burst": 2})
+    assert control.users is None
+    assert [control.allow("u", "g") for _ in range(3)] == [True, True, False]
+    assert all(control.allow("u") for _ in range(10))
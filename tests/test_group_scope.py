@@ -0,0 +1,106 @@
+"""群组作用域：群的小偶像名单、应援口号开关和独立的签到分区"""
+import asyncio
+import json
+
+import pytest
+
+from astrbot_plugin_xox.data_manager import DataManager
+from astrbot_plugin_xox.group_scope import GroupScope, partition_key, validate_group
+from astrbot_plugin_xox.idol_index import IdolIndex
+
+IDOLS = {
+    "a": {"nicknames": [], "info": "", "catchphrases": {"冲鸭": "r"}},
+    "b": {"nicknames": [], "info": "", "catchphrases": {"冲": "r", "加油": "r"}},
+    "c": {"nicknames": [], "info": "", "catchphrases": {}, "weight": 0},
+}
+
+
+def test_partition_key():
+    assert partition_key("2024-05-01") == "2024-05-01"
+    assert partition_key("2024-05-01", "") == "2024-05-01"
+    assert partition_key("2024-05-01", "123") == "2024-05-01@123"
+    # 按字符串排序时群分区紧跟在同一天的全局分区之后
+    keys = ["2024-05-02", "2024-05-01@9", "2024-05-01", "2024-05-02@1"]
+    assert sorted(keys) == ["2024-05-01", "2024-05-01@9", "2024-05-02", "2024-05-02@1"]
+
+
+@pytest.mark.parametrize("conf", [{}, {"idols": []}, {"idols": ["a"], "catchphrase": False}, {"catchphrase": True}])
+def test_valid_group(conf):
+    validate_group(conf)
+
+
+@pytest.mark.parametrize("conf", [[], "a", {"idols": "a"}, {"idols": ["a", 1]}, {"catchphrase": "no"}, {"catchphrase": 0}])
+def test_invalid_group(conf):
+    with pytest.raises(ValueError):
+        validate_group(conf)
+
+
+def test_scope_without_pool_shares_global_structures():
+    index = IdolIndex(IDOLS)
+    scope = GroupScope("1", {}, index)
+    assert scope.names is None
+    assert scope.matcher is index.matcher
+    assert scope.sampler is index.sampler
+    assert scope.catchphrase
+    assert scope.contains("anyone")
+
+
+def test_restricted_pool():
+    index = IdolIndex(IDOLS)
+    scope = GroupScope("1", {"idols": ["b", "missing"], "catchphrase": False}, index)
+    assert scope.names == {"b"}
+    assert not scope.catchphrase
+    assert scope.contains("b") and not scope.contains("a")
+    # 只匹配名单内小偶像的触发句，全局匹配时 a 优先
+    assert index.matcher.first_match("冲鸭") == ("a", "冲鸭")
+    assert scope.matcher.first_match("冲鸭") == ("b", "冲")
+    assert {scope.sampler.draw() for _ in range(50)} == {"b"}
+
+
+def test_pool_keeps_global_order():
+    index = IdolIndex(IDOLS)
+    scope = GroupScope("1", {"idols": ["b", "a"]}, index)
+    assert scope.matcher.first_match("冲鸭") == ("a", "冲鸭")
+
+
+def make_manager(tmp_path, groups):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "idols.json").write_text(json.dumps(IDOLS), encoding="utf-8")
+    (data_dir / "groups.json").write_text(json.dumps(groups), encoding="utf-8")
+    return DataManager(str(tmp_path), None, {"save_interval": 0, "image_resize_enabled": False})
+
+
+def test_configured_group_has_own_partition(tmp_path):
+    db = make_manager(tmp_path, {"100": {"idols": ["a"]}})
+    try:
+        assert db.group_scope(None) is None
+        assert db.group_scope("200") is None
+        assert db.group_scope("100").names == {"a"}
+        assert db.today_partition("100") == db.today_partition() + "@100"
+        assert db.today_partition("200") == db.today_partition()
+        assert {db.get_random_idol("100") for _ in range(30)} == {"a"}
+        db.checkin("1", "a", "100")
+        db.checkin("1", "b", "200")
+        # 配置过的群的签到与全局分区互不影响；没有配置的群使用全局分区
+        assert db.get_today_idol("1", "100") == "a"
+        assert db.get_today_idol("1", "200") == "b"
+        assert db.get_today_idol("1") == "b"
+        assert db.group_checkin_count("100") == 1
+    finally:
+        asyncio.run(db.close())
+
+
+def test_scope_rebuilt_after_group_change(tmp_path):
+    db = make_manager(tmp_path, {})
+    try:
+        assert db.group_scope("100") is None
+        assert db.set_group("100", {"idols": ["b"]})
+        assert db.group_scope("100").names == {"b"}
+        with pytest.raises(ValueError):
+            db.set_group("100", {"idols": "b"})
+        assert db.set_group("100", None)
+        assert not db.set_group("100", None)
+        assert db.group_scope("100") is None
+    finally:
+        asyncio.run(db.close())
@@ -0,0 +1,109 @@
+"""小偶像数据包：JSON / CSV 解析与校验、合并进副本、导出后再导入内容不变"""
+import json
+
+import pytest
+
+from astrbot_plugin_xox.idol_bundle import detect_format, export_bundle, merge_bundle, parse_bundle
+
+CSV_BUNDLE = """name,field,key,value
+诗然,nickname,,然然
+诗然,nickname,,然然
+诗然,info,,会唱歌
+诗然,weight,,2.5
+诗然,catchphrase,冲鸭,{name}冲鸭！
+诗然,catchphrase,冲鸭,"一起冲,鸭"
+诗然,catchphrase,加油,加油~
+诗然,miss_today,,{name}想你
+新人,,,
+"""
+
+IDOLS = {
+    "诗然": {
+        "nicknames": ["然然", "乔乔"],
+        "info": "会唱歌",
+        "catchphrases": {"冲鸭": ["{name}冲鸭！", "一起冲,鸭"], "加油": "加油~"},
+        "weight": 2.5,
+        "miss_templates": {"miss_today": ["{name}想你"], "miss_other": ["在呢"]},
+    },
+    "小美": {"nicknames": [], "info": "", "catchphrases": {}, "miss_templates": ["想{name}"]},
+}
+
+
+def test_detect_format():
+    assert detect_format("{}") == "json"
+    assert detect_format("  \n{\"a\": {}}") == "json"
+    assert detect_format("name,field,key,value") == "csv"
+    assert detect_format("{}", "idols.CSV") == "csv"
+    assert detect_format("name", "idols.txt") == "csv"
+
+
+def test_parse_csv():
+    bundle = parse_bundle(CSV_BUNDLE)
+    assert bundle == {
+        "诗然": {
+            "nicknames": ["然然"],
+            "info": "会唱歌",
+            "weight": 2.5,
+            "catchphrases": {"冲鸭": ["{name}冲鸭！", "一起冲,鸭"], "加油": "加油~"},
+            "miss_templates": {"miss_today": ["{name}想你"]},
+        },
+        "新人": {},
+    }
+
+
+def test_parse_json():
+    assert parse_bundle(json.dumps(IDOLS, ensure_ascii=False)) == IDOLS
+
+
+@pytest.mark.parametrize("text", [
+    "名字,类型\na,b\n",                                 # 表头不对
+    "name,field,key,value\n,nickname,,x\n",             # 缺少名字
+    "name,field,key,value\na,nickname,k,x\n",           # 只有 catchphrase 需要 key
+    "name,field,key,value\na,nickname,,\n",             # 缺少 value
+    "name,field,key,value\na,weight,,重\n",             # 权重不是数字
+    "name,field,key,value\na,catchphrase,,x\n",         # 缺少触发句
+    "name,field,key,value\na,miss,,x\na,miss_today,,y\n",  # miss 与 miss_today 混用
+    "name,field,key,value\na,height,,1\n",              # 未知类型
+    "name,field,key,value\n",                           # 没有小偶像
+    '{"a": {"nicknames": "x"}}',                        # JSON 结构不合法
+    "{}",
+])
+def test_invalid_bundles(text):
+    with pytest.raises(ValueError):
+        parse_bundle(text)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        parse_bundle("{}", "xml")
+    with pytest.raises(ValueError):
+        export_bundle({}, "xml")
+
+
+def test_merge_into_copy():
+    idols = {"诗然": {"nicknames": ["然然"], "info": "旧简介", "catchphrases": {"冲鸭": "旧", "晚安": "晚安"}}}
+    before = json.loads(json.dumps(idols))
+    merged, summary = merge_bundle(idols, parse_bundle(CSV_BUNDLE))
+    assert idols == before  # 不修改传入的 idols
+    assert summary == {"added": ["新人"], "nicknames": 0, "catchphrases": 2}
+    shiran = merged["诗然"]
+    assert shiran["nicknames"] == ["然然"]
+    assert shiran["info"] == "会唱歌"
+    assert shiran["weight"] == 2.5
+    # 按触发句覆盖，数据包中没有的触发句保留
+    assert shiran["catchphrases"] == {"冲鸭": ["{name}冲鸭！", "一起冲,鸭"], "晚安": "晚安", "加油": "加油~"}
+    assert shiran["miss_templates"] == {"miss_today": ["{name}想你"]}
+    assert merged["新人"]["catchphrases"] == {}
+
+
+@pytest.mark.parametrize("fmt", ["json", "csv"])
+def test_export_round_trip(fmt):
+    text = export_bundle(IDOLS, fmt)
+    assert detect_format(text) == fmt
+    bundle = parse_bundle(text, fmt)
+    merged, summary = merge_bundle({}, bundle)
+    assert summary["added"] == list(IDOLS)
+    for name, info in IDOLS.items():
+        for field in ("nicknames", "catchphrases", "miss_templates", "weight"):
+            assert merged[name].get(field) == info.get(field)
+    assert merged["诗然"]["info"] == "会唱歌"
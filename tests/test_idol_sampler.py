@@ -0,0 +1,130 @@
+"""按权重抽取签到小偶像：别名表的分布、排除已分配的小偶像、同群不重复分完后的处理"""
+import asyncio
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from astrbot_plugin_xox.data_manager import DataManager
+from astrbot_plugin_xox.idol_sampler import AliasTable, IdolSampler
+
+DRAWS = 40000
+
+
+def frequencies(draw, n=DRAWS):
+    counts = Counter(draw() for _ in range(n))
+    return {key: count / n for key, count in counts.items()}
+
+
+@pytest.mark.parametrize("weights", [[1, 1, 1, 1], [1, 2, 3, 4], [10, 0.5, 0.5], [0, 3, 1], [0.1] * 7 + [5]])
+def test_alias_table_matches_weights(weights):
+    rng = random.Random(1)
+    table = AliasTable(weights)
+    freq = frequencies(lambda: table.sample(rng))
+    total = sum(weights)
+    for i, w in enumerate(weights):
+        assert freq.get(i, 0.0) == pytest.approx(w / total, abs=0.01)
+
+
+def test_zero_weight_never_drawn():
+    rng = random.Random(2)
+    table = AliasTable([0, 1, 0, 1])
+    assert {table.sample(rng) for _ in range(2000)} == {1, 3}
+
+
+def test_all_zero_weights_are_uniform():
+    rng = random.Random(3)
+    table = AliasTable([0, 0, 0])
+    freq = frequencies(lambda: table.sample(rng))
+    for i in range(3):
+        assert freq[i] == pytest.approx(1 / 3, abs=0.01)
+
+
+def test_sampler_follows_idol_weights():
+    idols = {"a": {"weight": 3}, "b": {}, "c": {"weight": 0}}
+    sampler = IdolSampler(idols, rng=random.Random(4))
+    freq = frequencies(sampler.draw)
+    assert freq["a"] == pytest.approx(0.75, abs=0.01)
+    assert freq["b"] == pytest.approx(0.25, abs=0.01)
+    assert "c" not in freq
+
+
+def test_empty_sampler():
+    assert IdolSampler().draw() is None
+    assert IdolSampler().draw(exclude={"a"}) is None
+
+
+def test_add_remove_and_reweight():
+    sampler = IdolSampler({name: {} for name in "abcd"}, rng=random.Random(5))
+    sampler.remove("a")  # 最后一个移到被删除的位置
+    sampler.remove("missing")
+    assert len(sampler) == 3
+    assert {sampler.draw() for _ in range(500)} == {"b", "c", "d"}
+    sampler.add("b", 0)
+    sampler.add("e", 1)
+    assert {sampler.draw() for _ in range(500)} == {"c", "d", "e"}
+    sampler.remove("d")
+    sampler.remove("e")
+    assert {sampler.draw() for _ in range(100)} == {"c"}
+
+
+def test_draw_excludes_taken_idols():
+    idols = {name: {"weight": 100 if name == "a" else 1} for name in "abcdef"}
+    sampler = IdolSampler(idols, rng=random.Random(6))
+    # 权重最大的小偶像被排除后退化为在剩余小偶像中按权重抽取
+    freq = frequencies(lambda: sampler.draw(exclude={"a", "b"}), n=8000)
+    assert set(freq) == {"c", "d", "e", "f"}
+    for name in "cdef":
+        assert freq[name] == pytest.approx(0.25, abs=0.03)
+
+
+def test_draw_returns_none_when_all_excluded():
+    sampler = IdolSampler({"a": {}, "b": {}, "z": {"weight": 0}}, rng=random.Random(7))
+    assert sampler.draw(exclude={"a"}) == "b"
+    # 权重为 0 的小偶像不会因为其余小偶像都被排除而被抽到
+    assert sampler.draw(exclude={"a", "b"}) is None
+    zero = IdolSampler({"a": {"weight": 0}, "b": {"weight": 0}}, rng=random.Random(8))
+    assert zero.draw(exclude={"a"}) == "b"
+    assert zero.draw(exclude={"a", "b"}) is None
+
+
+def make_manager(tmp_path, distinct):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    idols = {name: {"nicknames": [], "info": "", "catchphrases": {}} for name in ("a", "b", "c")}
+    (data_dir / "idols.json").write_text(json.dumps(idols), encoding="utf-8")
+    config = {"save_interval": 0, "image_resize_enabled": False, "checkin_distinct_idols": distinct}
+    return DataManager(str(tmp_path), None, config)
+
+
+@pytest.mark.parametrize("group_id", [None, "100"])
+def test_distinct_checkins_until_exhausted(tmp_path, group_id):
+    db = make_manager(tmp_path, True)
+    try:
+        drawn = []
+        for uid in range(3):
+            idol = db.get_random_idol(group_id)
+            db.checkin(str(uid), idol, group_id)
+            drawn.append(idol)
+        assert sorted(drawn) == ["a", "b", "c"]
+        # 全部分完后仍然可以签到（允许重复）
+        assert db.get_random_idol(group_id) in {"a", "b", "c"}
+    finally:
+        asyncio.run(db.close())
+
+
+def test_unconfigured_group_starts_new_round(tmp_path):
+    db = make_manager(tmp_path, True)
+    try:
+        for uid in range(3):
+            db.checkin(str(uid), db.get_random_idol("100"), "100")
+        # 本群已分完：开始新一轮，新一轮内仍不重复
+        second_round = []
+        for uid in range(3, 6):
+            idol = db.get_random_idol("100")
+            db.checkin(str(uid), idol, "100")
+            second_round.append(idol)
+        assert sorted(second_round) == ["a", "b", "c"]
+    finally:
+        asyncio.run(db.close())
@@ -0,0 +1,72 @@
+"""回复缓存：按最近使用淘汰、按 ttl 过期，命中情况计入运行指标"""
+import pytest
+
+from astrbot_plugin_xox import reply_cache
+from astrbot_plugin_xox.metrics import Metrics
+from astrbot_plugin_xox.reply_cache import ReplyCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(reply_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hit_and_miss(clock):
+    metrics = Metrics()
+    cache = ReplyCache(max_entries=4, ttl=60, metrics=metrics)
+    assert cache.get("k") is None
+    cache.put("k", ("文字", "图片.jpg"))
+    assert cache.get("k") == ("文字", "图片.jpg")
+    assert cache.get("k") == ("文字", "图片.jpg")
+    assert metrics.counters["reply_cache.hit"] == 2
+    assert metrics.counters["reply_cache.miss"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    metrics = Metrics()
+    cache = ReplyCache(max_entries=4, ttl=10, metrics=metrics)
+    cache.put("k", "v")
+    clock[0] += 9.9
+    assert cache.get("k") == "v"
+    clock[0] += 0.1
+    assert cache.get("k") is None
+    assert len(cache) == 0  # 过期条目在读取时删除
+    # 重新写入后重新计时
+    cache.put("k", "v2")
+    clock[0] += 5
+    assert cache.get("k") == "v2"
+
+
+def test_lru_eviction(clock):
+    metrics = Metrics()
+    cache = ReplyCache(max_entries=2, ttl=60, metrics=metrics)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 成为最近使用
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    cache.put("a", 10)  # 覆盖已有键不淘汰其他条目
+    assert cache.get("c") == 3
+    assert metrics.counters["reply_cache.evict"] == 1
+
+
+def test_disabled_cache(clock):
+    metrics = Metrics()
+    cache = ReplyCache(max_entries=0, metrics=metrics)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+    assert len(cache) == 0
+    assert not metrics.counters
+
+
+def test_without_metrics_and_clear(clock):
+    cache = ReplyCache(max_entries=2)
+    cache.put("k", "v")
+    assert cache.get("k") == "v"
+    cache.clear()
+    assert cache.get("k") is None
@@ -0,0 +1,65 @@
+"""回复模板：预编译的片段与占位槽渲染结果与直接替换一致，自定义思念回复优先"""
+import pytest
+
+from astrbot_plugin_xox.reply_templates import DEFAULT_TEMPLATES, CompiledTemplate, ReplyTemplates, TemplateSet
+
+
+@pytest.mark.parametrize("text", [
+    "{name}冲鸭！",
+    "没有占位符",
+    "{name}和{name}",
+    "前{name}后",
+    "{other}与{{name}}和{name}",
+    "",
+])
+def test_compiled_template_matches_replace(text):
+    assert CompiledTemplate(text).render({"name": "诗然"}) == text.replace("{name}", "诗然")
+
+
+def test_template_set_ignores_non_strings():
+    assert not TemplateSet([])
+    assert not TemplateSet([1, None])
+    assert TemplateSet([1, "{name}"]).render(name="a") == "a"
+    assert TemplateSet("单条{name}").render(name="a") == "单条a"
+    assert TemplateSet([]).render(name="a") == ""
+
+
+def test_config_overrides_defaults():
+    templates = ReplyTemplates({"miss_today": ["想{name}"], "miss_other": []})
+    assert templates.miss("miss_today", "a").render(name="a") == "想a"
+    # 空列表使用内置模板
+    expected = {t.replace("{name}", "a") for t in DEFAULT_TEMPLATES["miss_other"]}
+    assert templates.miss("miss_other", "a").render(name="a") in expected
+
+
+def test_idol_miss_templates():
+    templates = ReplyTemplates({"miss_today": ["全局{name}"], "miss_other": ["全局{name}"]})
+    both = {"miss_templates": ["{name}专属"]}
+    split = {"miss_templates": {"miss_today": ["{name}今天"]}}
+    assert templates.miss("miss_today", "a", both).render(name="a") == "a专属"
+    assert templates.miss("miss_other", "a", both).render(name="a") == "a专属"
+    assert templates.miss("miss_today", "b", split).render(name="b") == "b今天"
+    assert templates.miss("miss_other", "b", split).render(name="b") == "全局b"
+    assert templates.miss("miss_today", "c", {}).render(name="c") == "全局c"
+
+
+def test_catchphrase_cache_and_invalidate():
+    templates = ReplyTemplates()
+    templates.rebuild({"a": {"catchphrases": {"冲": "{name}冲鸭", "多": ["一", "二"]}}})
+    first = templates.catchphrase("a", "冲", "{name}冲鸭")
+    assert first.render(name="a") == "a冲鸭"
+    assert templates.catchphrase("a", "冲", "改过的") is first
+    assert templates.catchphrase("a", "多", None).render() in {"一", "二"}
+    templates.invalidate("a", "冲")
+    assert templates.catchphrase("a", "冲", "改过的").render(name="a") == "改过的"
+
+
+def test_invalidate_idol_drops_miss_templates():
+    templates = ReplyTemplates({"miss_today": ["全局"]})
+    assert templates.miss("miss_today", "a", {"miss_templates": ["旧"]}).render(name="a") == "旧"
+    # 已缓存：传入新的数据不会重新编译
+    assert templates.miss("miss_today", "a", {"miss_templates": ["新"]}).render(name="a") == "旧"
+    templates.invalidate("a")
+    assert templates.miss("miss_today", "a", {"miss_templates": ["新"]}).render(name="a") == "新"
+    templates.invalidate("a")
+    assert templates.miss("miss_today", "a", {}).render(name="a") == "全局"
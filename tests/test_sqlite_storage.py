@@ -0,0 +1,105 @@
+"""SqliteStorage 保存小偶像 / 用户时只写入有变化的行"""
+import copy
+
+import pytest
+
+from astrbot_plugin_xox.storage import SqliteStorage
+
+
+def make_idols(count):
+    return {
+        f"idol{i}": {
+            "nicknames": [f"nick{i}", f"alias{i}"],
+            "info": f"info{i}",
+            "catchphrases": {f"trigger{i}": [f"resp{i}"], f"hello{i}": "hi"},
+        }
+        for i in range(count)
+    }
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "xox.sqlite3"))
+    yield storage
+    storage.close()
+
+
+def save(storage, key, data):
+    written, version = storage.write_versioned(key, storage.snapshot(key, data), storage.version(key))
+    assert written
+    return written
+
+
+def test_first_write_then_only_changes(storage):
+    idols = make_idols(50)
+    assert save(storage, "idols", idols) == 50 + 100 + 100
+
+    idols["idol3"]["nicknames"].append("new")
+    idols["idol7"]["catchphrases"]["trigger7"] = "changed"
+    idols["idol9"]["info"] = "changed"
+    assert save(storage, "idols", idols) == 3
+    assert storage.load("idols") == idols
+
+    idols["idol50"] = {"nicknames": ["n"], "info": "i", "catchphrases": {}}
+    assert save(storage, "idols", idols) == 2
+    assert storage.load("idols") == idols
+
+
+def test_removal_deletes_rows_and_keeps_order(storage):
+    idols = make_idols(5)
+    save(storage, "idols", idols)
+    del idols["idol4"]
+    idols["idol0"]["nicknames"].remove("nick0")
+    # 删除最后一个小偶像：1 个小偶像 + 2 个昵称 + 2 条口号，另有 idol0 的 1 个昵称被删除、1 个昵称移位
+    assert save(storage, "idols", idols) == 5 + 2
+    loaded = storage.load("idols")
+    assert loaded == idols
+    assert list(loaded) == list(idols)
+    assert loaded["idol0"]["nicknames"] == ["alias0"]
+
+
+def test_duplicate_nicknames_round_trip(storage):
+    idols = {"a": {"nicknames": ["x", "x", "y"], "catchphrases": {}}}
+    save(storage, "idols", idols)
+    assert storage.load("idols")["a"]["nicknames"] == ["x", "y"]
+    assert save(storage, "idols", {"a": {"nicknames": ["x", "y"], "catchphrases": {}}}) == 1
+
+
+def test_users_diff(storage):
+    users = {str(uid): {"note": uid} for uid in range(100)}
+    assert save(storage, "users", users) == 100
+    users["5"] = {"note": "changed"}
+    del users["6"]
+    users["100"] = {}
+    assert save(storage, "users", users) == 3
+    assert storage.load("users") == users
+
+
+def test_external_write_forces_full_rewrite(tmp_path, storage):
+    idols = make_idols(10)
+    save(storage, "idols", idols)
+    other = SqliteStorage(str(tmp_path / "xox.sqlite3"))
+    try:
+        theirs = copy.deepcopy(idols)
+        theirs["idol1"]["info"] = "theirs"
+        save(other, "idols", theirs)
+    finally:
+        other.close()
+    # 本进程记录的内容已过期：整表重写，结果与快照完全一致
+    idols["idol2"]["info"] = "ours"
+    assert storage.write("idols", storage.snapshot("idols", idols)) == 10 + 20 + 20
+    assert storage.load("idols") == idols
+
+
+def test_load_versioned_seeds_diff(tmp_path, storage):
+    idols = make_idols(10)
+    save(storage, "idols", idols)
+    storage.close()
+    reopened = SqliteStorage(str(tmp_path / "xox.sqlite3"))
+    try:
+        loaded, _ = reopened.load_versioned("idols")
+        loaded["idol0"]["info"] = "changed"
+        assert save(reopened, "idols", loaded) == 1
+        assert reopened.load("idols") == loaded
+    finally:
+        reopened.close()
@@ -0,0 +1,82 @@
+"""merge_changes 三方合并"""
+from astrbot_plugin_xox.storage import merge_changes
+
+
+def test_dict_untouched_keys_keep_theirs():
+    base = {"a": 1, "b": 2}
+    ours = {"a": 1, "b": 3}
+    theirs = {"a": 10, "b": 2}
+    assert merge_changes(base, ours, theirs) == {"a": 10, "b": 3}
+
+
+def test_dict_added_keys_from_both_sides():
+    base = {"a": 1}
+    ours = {"a": 1, "b": 2}
+    theirs = {"a": 1, "c": 3}
+    assert merge_changes(base, ours, theirs) == {"a": 1, "b": 2, "c": 3}
+
+
+def test_dict_key_deleted_by_us_is_removed():
+    base = {"a": 1, "b": 2}
+    ours = {"a": 1}
+    theirs = {"a": 1, "b": 2, "c": 3}
+    assert merge_changes(base, ours, theirs) == {"a": 1, "c": 3}
+
+
+def test_dict_key_deleted_by_them_stays_deleted():
+    base = {"a": 1, "b": 2}
+    ours = {"a": 1, "b": 2}
+    theirs = {"a": 1}
+    assert merge_changes(base, ours, theirs) == {"a": 1}
+
+
+def test_nested_dicts_merge_per_key():
+    base = {"乔诗然": {"nicknames": [], "catchphrases": {"冲": "冲冲冲"}}}
+    ours = {"乔诗然": {"nicknames": [], "catchphrases": {"冲": "冲冲冲", "好": "好好好"}}}
+    theirs = {"乔诗然": {"nicknames": ["小乔"], "catchphrases": {}}}
+    assert merge_changes(base, ours, theirs) == {
+        "乔诗然": {"nicknames": ["小乔"], "catchphrases": {"好": "好好好"}},
+    }
+
+
+def test_list_add_and_remove():
+    base = ["1", "2", "3"]
+    ours = ["1", "3", "4"]      # 删除 2，新增 4
+    theirs = ["3", "1", "5"]    # 删除 2，调整顺序，新增 5
+    assert merge_changes(base, ours, theirs) == ["3", "1", "5", "4"]
+
+
+def test_list_remove_applies_to_theirs():
+    base = ["1", "2"]
+    ours = ["1"]
+    theirs = ["1", "2", "3"]
+    assert merge_changes(base, ours, theirs) == ["1", "3"]
+
+
+def test_list_does_not_duplicate_items_added_on_both_sides():
+    assert merge_changes([], ["1"], ["1"]) == ["1"]
+
+
+def test_scalar_conflict_prefers_ours():
+    assert merge_changes(1, 2, 3) == 2
+    assert merge_changes(1, 1, 3) == 3
+
+
+def test_base_none_overlays_ours_without_deleting():
+    ours = {"a": {"x": 1}, "b": 2}
+    theirs = {"a": {"y": 1}, "c": 3}
+    assert merge_changes(None, ours, theirs) == {"a": {"x": 1, "y": 1}, "b": 2, "c": 3}
+
+
+def test_base_none_list_keeps_theirs_and_appends_ours():
+    assert merge_changes(None, ["1", "2"], ["2", "3"]) == ["2", "3", "1"]
+
+
+def test_inputs_are_not_modified():
+    base = {"a": {"x": 1}}
+    ours = {"a": {"x": 2}}
+    theirs = {"a": {"x": 1, "y": 1}}
+    merge_changes(base, ours, theirs)
+    assert base == {"a": {"x": 1}}
+    assert ours == {"a": {"x": 2}}
+    assert theirs == {"a": {"x": 1, "y": 1}}
@@ -0,0 +1,50 @@
+"""文本归一化：全角、大小写、繁体、标点和表情；拼音索引在未安装 pypinyin 时不生效"""
+import pytest
+
+from astrbot_plugin_xox import text_normalize
+from astrbot_plugin_xox.text_normalize import normalize, pinyin_keys, to_simplified
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("诗然冲鸭", "诗然冲鸭"),
+    ("詩然衝啊", "诗然冲啊"),
+    ("ＳＨＩＲＡＮ１２３", "shiran123"),
+    ("Hello World", "helloworld"),
+    ("诗然，冲鸭！！😀😀", "诗然冲鸭"),
+    ("  诗 然\n", "诗然"),
+    ("~_~", ""),
+    ("！？。😀", ""),
+    ("", ""),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+def test_normalize_is_idempotent():
+    for text in ("詩然衝啊！", "ＡＢＣ　ｄｅｆ", "宝宝🥰"):
+        once = normalize(text)
+        assert normalize(once) == once
+
+
+def test_builtin_table_leaves_simplified_text():
+    if text_normalize._T2S_CONVERTER is not None:
+        pytest.skip("已安装 opencc，使用其转换表")
+    assert to_simplified("今天也要加油") == "今天也要加油"
+    assert to_simplified("寶貝們") == "宝贝们"
+
+
+def test_pinyin_keys_without_chinese():
+    assert pinyin_keys("Alice") == []
+    assert pinyin_keys("！！") == []
+
+
+@pytest.mark.skipif(text_normalize.lazy_pinyin is not None, reason="已安装 pypinyin")
+def test_pinyin_keys_without_pypinyin():
+    assert pinyin_keys("乔诗然") == []
+
+
+@pytest.mark.skipif(text_normalize.lazy_pinyin is None, reason="未安装 pypinyin")
+def test_pinyin_keys():
+    assert pinyin_keys("乔诗然") == ["qiaoshiran", "qsr"]
+    assert pinyin_keys("喬詩然") == ["qiaoshiran", "qsr"]
+    assert pinyin_keys("然") == ["ran"]
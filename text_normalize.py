@@ -0,0 +1,99 @@
+"""
+文本归一化模块
+
+负责：
+- 把小偶像名字、昵称、应援口号触发句和群消息转换为统一的匹配形式：
+  全角转半角（NFKC）、英文统一小写、常用繁体字转简体、去掉空白、标点和表情符号
+- 为名字和昵称生成拼音全拼与首字母缩写（如 "乔诗然" -> "qiaoshiran" / "qsr"），
+  供 "好想XXX"、/xox 等按名字查找时使用
+
+存储的名字、昵称和触发句只在建立索引时归一化一次，每条消息也只归一化一次
+
+可选依赖：安装 opencc 时使用其完整的繁简转换表，否则使用内置的常用字表；
+安装 pypinyin 时才生成拼音索引，未安装时拼音缩写不生效
+"""
+import re
+import unicodedata
+
+try:
+    from opencc import OpenCC
+    _T2S_CONVERTER = OpenCC("t2s")
+except Exception:
+    _T2S_CONVERTER = None
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 匹配时忽略的字符：空白、标点、符号（含表情）、下划线等非文字字符
+_IGNORED = re.compile(r"[\W_]+")
+
+# 内置的常用繁体字 -> 简体字对照（名字、昵称和应援用语中常见的字）
+_TRADITIONAL = (
+    "愛們個來對說話時會為這還與見樂詩語麗華國張陳劉楊黃趙吳孫鄭馮蔣韓許鄧蕭葉呂蘇盧錢"
+    "賈謝譚陸顧龍萬嚴齊閻湯傑偉軍濤鵬輝紅藝靜雲鳳嬌嫻瑩倫曉穎婭綺潔純夢寶貝親歡隊團飛"
+    "風聲號氣學員長開關門問間頭兒媽爺東車書買賣讓給聽覺點體發髮後裡裏邊過進運達遠鍾鐘"
+    "錦銀鐵陽陰隨難雙雞鳥魚馬驚黨優傳價儀劇動勝務區協單嗎嘆報場壞夠奪奮妝實寫將專尋層"
+    "島帥師帶幫廣彈復憶應戀戰戲擁換數斷無舊暢業極樣橋機歲歷歸漢滿溫灣燈營獨獎環現產畢"
+    "當盡盤眾碼禮稱穩筆節簡紀約級紙細終組結絕絲經綠網線緣練總織繼續義習聖聯職腦興舉莊"
+    "蓮藍處蟲補裝製觀計認討記設訪證評詞試誠誰課調談請諾讀變讚豐貓負財質賞賽贏趕躍軟輕"
+    "載輸轉辦農連週遊適選遺鄉醫釋鏡閃閱陣險雖電靈韻響頁頂項順須預領頻題顏願類顯飯館騎"
+    "鬧鬥魯鮮麥齡憐瀟灑麼臉淚聰遙憂慶戶嬰蘭萊瑤瓊鈺銘錫鎮闆韋贊鷺鶴鸞丟並亂亞佔係倆側"
+    "偵備傷僅僑億儘兩冊凈劃劍勁勞勢匯卻厲參叢啟喚嗚嘗嚮圍圓圖執堅塊塵墊壓壯壺夥奧婦孃"
+    "寧審寬導屆屬幣幹幾庫廳彎彥徑從恆惡惱態慘慣憑懶懷挾掃掛揚擔據擠擬擴擺攝敗敵斂於晝"
+    "暈曆條檔檢權歐殘漁潛濃災烏熱燒爭爾牆狀狹猶獅獻瑪畫異瘋療盃矯確祕禍積窮競筍範築籃"
+    "糾紛縣縱繞繪罰羅聞膚膽臨艙蘋虛蝦衛衝襪規視覽訂誇誌誼謎護豬貼費賀資賴贈趨跡踐蹤軌"
+    "輔輩辭邁郵鄰醜採鈴銷鋒錯鍋鏈闊隱雜離霧靂頌頗顆颱飄餅餘饞駕驅骯鬆鹽麵黴鼕龐喬鄒鄺"
+    "龔儲藺鄔閔聶嶽瀋蕓薈縈綾緹嬋鶯鵑瑋璣煒燁暉鈞鋼銳鏘韜頎顥驍鑽擊"
+)
+_SIMPLIFIED = (
+    "爱们个来对说话时会为这还与见乐诗语丽华国张陈刘杨黄赵吴孙郑冯蒋韩许邓萧叶吕苏卢钱"
+    "贾谢谭陆顾龙万严齐阎汤杰伟军涛鹏辉红艺静云凤娇娴莹伦晓颖娅绮洁纯梦宝贝亲欢队团飞"
+    "风声号气学员长开关门问间头儿妈爷东车书买卖让给听觉点体发发后里里边过进运达远钟钟"
+    "锦银铁阳阴随难双鸡鸟鱼马惊党优传价仪剧动胜务区协单吗叹报场坏够夺奋妆实写将专寻层"
+    "岛帅师带帮广弹复忆应恋战戏拥换数断无旧畅业极样桥机岁历归汉满温湾灯营独奖环现产毕"
+    "当尽盘众码礼称稳笔节简纪约级纸细终组结绝丝经绿网线缘练总织继续义习圣联职脑兴举庄"
+    "莲蓝处虫补装制观计认讨记设访证评词试诚谁课调谈请诺读变赞丰猫负财质赏赛赢赶跃软轻"
+    "载输转办农连周游适选遗乡医释镜闪阅阵险虽电灵韵响页顶项顺须预领频题颜愿类显饭馆骑"
+    "闹斗鲁鲜麦龄怜潇洒么脸泪聪遥忧庆户婴兰莱瑶琼钰铭锡镇板韦赞鹭鹤鸾丢并乱亚占系俩侧"
+    "侦备伤仅侨亿尽两册净划剑劲劳势汇却厉参丛启唤呜尝向围圆图执坚块尘垫压壮壶伙奥妇娘"
+    "宁审宽导届属币干几库厅弯彦径从恒恶恼态惨惯凭懒怀挟扫挂扬担据挤拟扩摆摄败敌敛于昼"
+    "晕历条档检权欧残渔潜浓灾乌热烧争尔墙状狭犹狮献玛画异疯疗杯矫确秘祸积穷竞笋范筑篮"
+    "纠纷县纵绕绘罚罗闻肤胆临舱苹虚虾卫冲袜规视览订夸志谊谜护猪贴费贺资赖赠趋迹践踪轨"
+    "辅辈辞迈邮邻丑采铃销锋错锅链阔隐杂离雾雳颂颇颗台飘饼余馋驾驱肮松盐面霉冬庞乔邹邝"
+    "龚储蔺邬闵聂岳沈芸荟萦绫缇婵莺鹃玮玑炜烨晖钧钢锐锵韬颀颢骁钻击"
+)
+_T2S = str.maketrans(_TRADITIONAL, _SIMPLIFIED)
+_HAS_TRADITIONAL = re.compile(f"[{_TRADITIONAL}]")
+
+
+def to_simplified(text):
+    """繁体转简体"""
+    if _T2S_CONVERTER is not None:
+        return _T2S_CONVERTER.convert(text)
+    # 绝大多数消息不含繁体字，先用正则检查，避免逐字查表
+    if _HAS_TRADITIONAL.search(text) is None:
+        return text
+    return text.translate(_T2S)
+
+
+def normalize(text):
+    """转换为匹配形式；只含标点、表情等字符时返回空字符串"""
+    text = _IGNORED.sub("", text)
+    # NFKC 的快速检查比转换本身便宜得多，已是规范形式（大多数中文消息）时跳过转换
+    if not unicodedata.is_normalized("NFKC", text):
+        text = _IGNORED.sub("", unicodedata.normalize("NFKC", text))
+    return to_simplified(text.casefold())
+
+
+def pinyin_keys(text):
+    """名字的拼音全拼和首字母缩写（已归一化）；未安装 pypinyin 或不含汉字时返回空列表"""
+    name = normalize(text)
+    if lazy_pinyin is None or not name or name.isascii():
+        return []
+    syllables = [s for s in lazy_pinyin(name) if s]
+    keys = ["".join(syllables).casefold()]
+    if len(syllables) > 1:
+        keys.append("".join(s[0] for s in syllables).casefold())
+    return [key for key in keys if key != name]